@@ -0,0 +1,53 @@
+from collections import defaultdict
+from typing import Dict, Iterable, List, Optional
+import pandas as pd
+
+
+class ProductCatalog:
+    """
+    Catalogue sản phẩm load 1 lần lúc start API.
+    - records đã được chuyển sẵn sang dict (NaN -> None) nên trả về thẳng được cho client
+    - sku -> record (hash index) và brand (lowercase) -> list sku (inverted index)
+    Mọi lookup là O(1) mỗi sản phẩm thay vì quét cả DataFrame mỗi request.
+    """
+
+    def __init__(self, dataframe: pd.DataFrame):
+        records = dataframe.astype(object).where(pd.notna(dataframe), None).to_dict(orient="records")
+
+        self._by_sku: Dict[int, dict] = {}
+        self._by_brand: Dict[str, List[int]] = defaultdict(list)
+        for record in records:
+            sku = int(record["sku"])
+            if sku in self._by_sku:
+                continue  # giữ dòng đầu tiên giống df[df["sku"] == sku].iloc[0]
+            self._by_sku[sku] = record
+            brand = record.get("brand")
+            if brand:
+                self._by_brand[str(brand).lower()].append(sku)
+
+    def __len__(self):
+        return len(self._by_sku)
+
+    def __contains__(self, sku) -> bool:
+        return sku in self._by_sku
+
+    def get(self, sku: int) -> Optional[dict]:
+        return self._by_sku.get(sku)
+
+    def take(self, skus: Iterable[int]) -> List[dict]:
+        """Lấy record theo đúng thứ tự skus (thứ tự Qdrant đã xếp hạng), bỏ qua sku trùng/không tồn tại"""
+        seen = set()
+        results = []
+        for sku in skus:
+            record = self._by_sku.get(sku)
+            if record is not None and sku not in seen:
+                seen.add(sku)
+                results.append(record)
+        return results
+
+    def skus_by_brand(self, brand: str) -> List[int]:
+        return self._by_brand.get(brand.lower(), [])
+
+    def by_brand(self, brand: str, limit: Optional[int] = None) -> List[dict]:
+        skus = self.skus_by_brand(brand)
+        return self.take(skus[:limit] if limit is not None else skus)
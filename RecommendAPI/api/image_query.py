@@ -0,0 +1,147 @@
+import io
+import os
+from collections import OrderedDict
+from typing import Dict
+from fastapi import HTTPException, UploadFile
+from PIL import Image
+from embedding.encoder import CLIP_IMAGE_SIZE
+
+# Giới hạn kích thước ảnh upload (MB), vượt quá thì trả 413 trước khi decode
+MAX_UPLOAD_BYTES = int(float(os.getenv("MAX_UPLOAD_MB", "10")) * 1024 * 1024)
+UPLOAD_CHUNK_SIZE = 64 * 1024
+
+# dHash 16x16 = 256 bit; 2 ảnh cách nhau <= 8 bit coi là cùng 1 ảnh (resize, nén lại, screenshot lại...)
+HASH_SIZE = 16
+MAX_HASH_DISTANCE = 8
+
+
+async def read_upload(file: UploadFile, max_bytes: int = MAX_UPLOAD_BYTES) -> bytes:
+    """Đọc file upload theo từng chunk, dừng và trả 413 ngay khi vượt max_bytes"""
+    if file.size is not None and file.size > max_bytes:
+        raise HTTPException(status_code=413, detail=f"Image is too large (max {max_bytes // (1024 * 1024)} MB).")
+    chunks, total = [], 0
+    while True:
+        chunk = await file.read(UPLOAD_CHUNK_SIZE)
+        if not chunk:
+            break
+        total += len(chunk)
+        if total > max_bytes:
+            raise HTTPException(status_code=413, detail=f"Image is too large (max {max_bytes // (1024 * 1024)} MB).")
+        chunks.append(chunk)
+    return b"".join(chunks)
+
+
+def perceptual_hash(image: Image.Image, hash_size: int = HASH_SIZE) -> int:
+    """dHash: so sánh độ sáng các pixel kề nhau trên ảnh xám thu nhỏ, ra 1 số nguyên hash_size^2 bit"""
+    pixels = list(image.convert("L").resize((hash_size + 1, hash_size), Image.BILINEAR).getdata())
+    value = 0
+    for row in range(hash_size):
+        offset = row * (hash_size + 1)
+        for col in range(hash_size):
+            value = (value << 1) | (pixels[offset + col] > pixels[offset + col + 1])
+    return value
+
+
+def decode_query_image(image_data: bytes):
+    """
+    Decode ảnh query thẳng về cỡ input của CLIP (draft() của JPEG decoder + resize cạnh ngắn về 224),
+    trả về (ảnh, perceptual hash). Chạy trên thread pool.
+    """
+    try:
+        img = Image.open(io.BytesIO(image_data))
+        img.draft("RGB", (CLIP_IMAGE_SIZE, CLIP_IMAGE_SIZE))
+        img = img.convert("RGB")
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid image file. Please upload a valid image.")
+    scale = CLIP_IMAGE_SIZE / min(img.size)
+    if scale < 1:
+        new_size = (max(CLIP_IMAGE_SIZE, round(img.width * scale)), max(CLIP_IMAGE_SIZE, round(img.height * scale)))
+        img = img.resize(new_size, Image.BICUBIC)
+    return img, perceptual_hash(img)
+
+
+class ImageHashCache:
+    """
+    LRU perceptual hash -> embedding cho ảnh query. Ảnh gần trùng (Hamming <= max_distance) được quy về
+    cùng 1 hash đại diện, nên dùng chung embedding và chung key cache kết quả search.
+
+    Hash được chia thành max_distance + 1 dải bit: 2 hash cách nhau <= max_distance bit thì trùng hẳn ít nhất
+    1 dải, nên canonical() chỉ so Hamming với các hash trùng dải (index theo dải) thay vì quét cả cache.
+    """
+
+    def __init__(self, max_size: int = 4096, max_distance: int = MAX_HASH_DISTANCE, hash_bits: int = HASH_SIZE * HASH_SIZE):
+        self.max_size = max_size
+        self.max_distance = max_distance
+        self._data = OrderedDict()
+        # (shift, mask) của từng dải; dải i: giá trị dải -> các hash đã lưu
+        width, extra = divmod(hash_bits, max_distance + 1)
+        self._bands = []
+        shift = 0
+        for i in range(max_distance + 1):
+            bits = width + (1 if i < extra else 0)
+            self._bands.append((shift, (1 << bits) - 1))
+            shift += bits
+        self._band_index = [{} for _ in self._bands]
+        self.exact_hits = 0
+        self.near_hits = 0
+        self.misses = 0
+
+    def _index(self, phash: int):
+        for (shift, mask), index in zip(self._bands, self._band_index):
+            index.setdefault((phash >> shift) & mask, set()).add(phash)
+
+    def _unindex(self, phash: int):
+        for (shift, mask), index in zip(self._bands, self._band_index):
+            key = (phash >> shift) & mask
+            bucket = index.get(key)
+            if bucket is not None:
+                bucket.discard(phash)
+                if not bucket:
+                    del index[key]
+
+    def canonical(self, phash: int) -> int:
+        """Hash đã lưu gần phash nhất (trong ngưỡng), không có thì chính phash"""
+        if phash in self._data:
+            self.exact_hits += 1
+            return phash
+        candidates = set()
+        for (shift, mask), index in zip(self._bands, self._band_index):
+            candidates.update(index.get((phash >> shift) & mask, ()))
+        best, best_distance = None, self.max_distance + 1
+        for stored in candidates:
+            distance = (stored ^ phash).bit_count()
+            if distance < best_distance:
+                best, best_distance = stored, distance
+        if best is None:
+            self.misses += 1
+            return phash
+        self.near_hits += 1
+        return best
+
+    def get(self, phash: int):
+        vector = self._data.get(phash)
+        if vector is not None:
+            self._data.move_to_end(phash)
+        return vector
+
+    def put(self, phash: int, vector):
+        if phash not in self._data:
+            self._index(phash)
+        self._data[phash] = vector
+        self._data.move_to_end(phash)
+        if len(self._data) > self.max_size:
+            evicted, _ = self._data.popitem(last=False)
+            self._unindex(evicted)
+
+    def clear(self):
+        self._data.clear()
+        for index in self._band_index:
+            index.clear()
+
+    def stats(self) -> Dict:
+        return {
+            "size": len(self._data),
+            "exact_hits": self.exact_hits,
+            "near_hits": self.near_hits,
+            "misses": self.misses,
+        }
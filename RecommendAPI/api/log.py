@@ -0,0 +1,57 @@
+import json
+import logging
+import os
+import sys
+import time
+
+# LOG_LEVEL: DEBUG / INFO / WARNING / ERROR; LOG_FORMAT: "text" (dễ đọc) hoặc "json" (1 dòng JSON / log, cho log collector)
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+LOG_FORMAT = os.getenv("LOG_FORMAT", "text").lower()
+
+# Thuộc tính có sẵn của LogRecord, phần còn lại là field truyền qua extra=
+_RESERVED = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime"}
+
+
+def _fields(record: logging.LogRecord) -> dict:
+    return {k: v for k, v in vars(record).items() if k not in _RESERVED}
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record):
+        entry = {
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(record.created)) + f".{int(record.msecs):03d}Z",
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+            **_fields(record),
+        }
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class TextFormatter(logging.Formatter):
+    def __init__(self):
+        super().__init__("%(asctime)s %(levelname)s [%(name)s] %(message)s")
+
+    def format(self, record):
+        line = super().format(record)
+        fields = _fields(record)
+        if fields:
+            extra = " ".join(f"{k}={v!r}" for k, v in fields.items())
+            # Traceback (nếu có) nằm sau dòng đầu
+            head, sep, tail = line.partition("\n")
+            line = f"{head} {extra}{sep}{tail}"
+        return line
+
+
+def get_logger(name: str) -> logging.Logger:
+    """Logger của API, handler ra stdout được gắn 1 lần cho cả nhánh "recsys" (không đụng tới root logger)"""
+    parent = logging.getLogger("recsys")
+    if not parent.handlers:
+        handler = logging.StreamHandler(sys.stdout)
+        handler.setFormatter(JsonFormatter() if LOG_FORMAT == "json" else TextFormatter())
+        parent.addHandler(handler)
+        parent.setLevel(LOG_LEVEL)
+        parent.propagate = False
+    return logging.getLogger(f"recsys.{name}")
@@ -1,17 +1,87 @@
 from fastapi import FastAPI, HTTPException, UploadFile, File, Form
 from pydantic import BaseModel
 from typing import List, Optional
-from sentence_transformers import SentenceTransformer
-from vectordb.qdrant_client_handler import QdrantHandler
+from contextlib import asynccontextmanager
 from PIL import Image
+from vectordb.qdrant_client_handler import (
+    create_async_handler, close_async_clients,
+    QDRANT_LAYOUT, PRODUCTS_COLLECTION, PRODUCT_VECTORS, PRODUCT_PAYLOAD_INDEXES
+)
+from vectordb.fusion import fuse, FUSION_METHODS
+from vectordb.neighbor_table import NeighborTable
+from embedding.cache import EmbeddingCache
+from embedding.encoder import LazyClipEncoder, CLIP_IMAGE_SIZE, TOWERS
+from embedding.preprocess import load_catalog
+from api.catalog import ProductCatalog
+from api.scheduler import InferenceScheduler
+from api.query_cache import QueryCache
+from api.personalization import ProfileStore
+from api.image_query import ImageHashCache, decode_query_image, read_upload, MAX_UPLOAD_BYTES
+from api.startup import StartupState
+from api.metrics import REGISTRY, REQUESTS, REQUEST_SECONDS, RESULT_CACHE, start_request_timer, stage
+from api.log import get_logger
 from fastapi.middleware.cors import CORSMiddleware
-import ast
-import pandas as pd
-import io
+from fastapi.responses import JSONResponse, Response
+import asyncio
 import uvicorn
-import traceback
+import time
+import os
+
+logger = get_logger("api")
+# Trả thêm header Server-Timing (thời gian từng stage) cho mỗi request, để debug latency từ client
+API_TIMING_HEADERS = os.getenv("API_TIMING_HEADERS", "false").lower() in ("1", "true", "yes")
+
+@asynccontextmanager
+async def lifespan(app):
+    # Server nhận kết nối ngay, catalogue / vector store / model được load ở nền (xem /ready)
+    startup.start(load_components())
+    yield
+    await startup.stop()
+    for task in list(background_tasks):
+        task.cancel()
+    await inference_scheduler.close()
+    await close_async_clients()
+
+app = FastAPI(title="ASOS Multimodal API", lifespan=lifespan)
 
-app = FastAPI(title="ASOS Multimodal API")
+@app.middleware("http")
+async def limit_upload_size(request, call_next):
+    # Chặn sớm upload quá lớn theo Content-Length, trước khi FastAPI đọc + parse toàn bộ multipart body
+    # (request không có Content-Length vẫn bị giới hạn khi đọc file trong handler)
+    content_length = request.headers.get("content-length")
+    if request.url.path.startswith("/search") and content_length and content_length.isdigit():
+        # Cộng thêm 64KB cho các form field + boundary của multipart
+        if int(content_length) > MAX_UPLOAD_BYTES + 64 * 1024:
+            return JSONResponse(status_code=413, content={"detail": "Image is too large."})
+    return await call_next(request)
+
+@app.middleware("http")
+async def wait_until_ready(request, call_next):
+    # Request đến trong lúc đang khởi động thì chờ khởi động xong (trừ /ready, /metrics), khởi động lỗi thì trả 503
+    if not startup.ready and request.url.path not in ("/ready", "/metrics"):
+        await startup.wait()
+        if not startup.ready:
+            return JSONResponse(status_code=503, content={"detail": "Service is not ready."})
+    return await call_next(request)
+
+@app.middleware("http")
+async def observe_request(request, call_next):
+    # Latency + số request theo route (template path, không phải URL thật -> số label có giới hạn);
+    # handler ghi thời gian từng stage vào timer của request qua stage(...)
+    timer = start_request_timer(request.url.path)
+    start = time.perf_counter()
+    status = "500"
+    try:
+        response = await call_next(request)
+        status = str(response.status_code)
+    finally:
+        route = request.scope.get("route")
+        path = route.path if route is not None else "unmatched"
+        REQUEST_SECONDS.observe(time.perf_counter() - start, method=request.method, path=path)
+        REQUESTS.inc(method=request.method, path=path, status=status)
+    if API_TIMING_HEADERS:
+        response.headers["Server-Timing"] = timer.server_timing()
+    return response
 
 app.add_middleware(
     CORSMiddleware,
@@ -23,36 +93,102 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-df = pd.read_csv(r"./data/asos_products.csv")
-def clean_stringified_list(val):
-    try:
-        # Nếu nó là chuỗi và nhìn giống list "['a', 'b']" -> chuyển thành list thật
-        if isinstance(val, str) and val.startswith("[") and val.endswith("]"):
-            return ast.literal_eval(val)
-        return val
-    except:
-        return val
+# Các thành phần nặng được load ở nền lúc startup (load_components), import module không làm gì nặng
+startup = StartupState()
+CATALOG_PATH = r"./data/asos_products.csv"
+catalog = None
+embedding_cache = None
+text_db = None
+image_db = None
+neighbor_table = None
 
-def take_product_by_skus(dataframe, skus):
-    df_filtered = df[df["sku"].isin(skus)]
-    return df_filtered.to_dict(orient="records")
+# --- Load Models & DB ---
+CLIP_MODEL_NAME = 'clip-ViT-B-32'
+# Text tower và vision tower của CLIP load riêng: tower trong API_WARMUP_TOWERS được load + chạy thử trước khi
+# /ready báo sẵn sàng, tower còn lại load lần đầu có request cần nó (hoặc ở nền ngay sau khi ready).
+# Backend torch / onnx chọn qua env CLIP_BACKEND (xem embedding/encoder.py), nên giống lúc ingest
+API_WARMUP_TOWERS = [t.strip() for t in os.getenv("API_WARMUP_TOWERS", "text").split(",") if t.strip() in TOWERS]
+API_BACKGROUND_LOAD = os.getenv("API_BACKGROUND_LOAD", "true").lower() in ("1", "true", "yes")
+# Chu kỳ (giây) đọc thêm các record ingest mới ghi vào cache embedding trên đĩa (chạy trên thread nền)
+EMBEDDING_CACHE_REFRESH_SECONDS = float(os.getenv("EMBEDDING_CACHE_REFRESH_SECONDS", "30"))
+clip_model = LazyClipEncoder(CLIP_MODEL_NAME)
 
+# Gom các request encode đồng thời thành batch, chạy trên worker thread (không block event loop)
+inference_scheduler = InferenceScheduler(clip_model, max_batch_size=32, max_wait_ms=5)
 
-# Áp dụng cho các cột bị dính lỗi này
-for col in ['in_stock_size', 'out_stock_size', 'description', 'images']:
-    if col in df.columns:
-        df[col] = df[col].apply(clean_stringified_list)
+# Cache query text -> embedding và (query, filter, top_k) -> product_id cho các query lặp lại,
+# cache kết quả tự xoá khi ingest cập nhật index
+query_cache = QueryCache(embedding_size=10000, embedding_ttl=3600, result_size=10000, result_ttl=60)
 
+# Ảnh query: perceptual hash -> embedding, ảnh upload lại / gần trùng không phải chạy CLIP
+image_hashes = ImageHashCache(max_size=4096)
 
+async def ensure_tower(kind: str):
+    """Load tower trên thread pool, không chặn thread inference đang phục vụ tower còn lại"""
+    if not clip_model.is_loaded(kind):
+        await asyncio.to_thread(clip_model.load, kind)
 
-# --- Load Models & DB ---
-print("[API] Loading CLIP Model...")
-# Dùng chung 1 model cho cả Text và Image
-clip_model = SentenceTransformer('clip-ViT-B-32') 
+async def encode_text(text: str):
+    text = QueryCache.normalize_query(text)
+    vector = query_cache.get_embedding(text)
+    if vector is not None:
+        return vector
+    key = embedding_cache.text_key(text)
+    vector = embedding_cache.get(key)
+    if vector is None:
+        await ensure_tower("text")
+        vector = await inference_scheduler.encode_text(text)
+    query_cache.put_embedding(text, vector)
+    return vector
+
+async def decode_image_query(image_data: bytes):
+    """Decode ảnh query (thread pool), trả về (ảnh, hash đại diện cho nhóm ảnh gần trùng)"""
+    image, phash = await asyncio.to_thread(decode_query_image, image_data)
+    return image, image_hashes.canonical(phash)
+
+async def encode_image_query(image_data: bytes, image, phash: int):
+    """Embed ảnh đã decode: dùng lại embedding của ảnh gần trùng, rồi tới cache trên đĩa, cuối cùng mới chạy CLIP"""
+    vector = image_hashes.get(phash)
+    if vector is not None:
+        return vector
+    key = embedding_cache.image_key(image_data)
+    vector = embedding_cache.get(key)
+    if vector is None:
+        await ensure_tower("image")
+        vector = await inference_scheduler.encode_image(image)
+    image_hashes.put(phash, vector)
+    return vector
+
+def create_vector_handlers():
+    # Cả 2 DB bây giờ đều dùng vector size 512
+    # Async client (gRPC nếu có), cấu hình qua env QDRANT_URL / QDRANT_PREFER_GRPC, dùng chung 1 connection pool
+    if QDRANT_LAYOUT == "named":
+        # 1 collection "products", text_db / image_db chỉ khác nhau ở named vector dùng để search
+        return (
+            create_async_handler(
+                collection_name=PRODUCTS_COLLECTION, vector_size=512, vector_names=PRODUCT_VECTORS,
+                vector_name="text", payload_indexes=PRODUCT_PAYLOAD_INDEXES
+            ),
+            create_async_handler(
+                collection_name=PRODUCTS_COLLECTION, vector_size=512, vector_names=PRODUCT_VECTORS,
+                vector_name="image", payload_indexes=PRODUCT_PAYLOAD_INDEXES
+            ),
+        )
+    return (
+        create_async_handler(
+            collection_name="products_text", vector_size=512, payload_indexes=PRODUCT_PAYLOAD_INDEXES
+        ),
+        create_async_handler(
+            collection_name="products_image", vector_size=512, payload_indexes=PRODUCT_PAYLOAD_INDEXES
+        ),
+    )
+
+# /preference: "ann" = 2 query ANN mỗi request, "table" = đọc bảng neighbor tính sẵn (build_neighbors.py),
+# SKU chưa có trong bảng thì vẫn quay về ANN
+PREFERENCE_SOURCE = os.getenv("PREFERENCE_SOURCE", "ann").lower()
 
-# Cả 2 DB bây giờ đều dùng vector size 512
-text_db = QdrantHandler(collection_name="products_text", vector_size=512)
-image_db = QdrantHandler(collection_name="products_image", vector_size=512)
+# Profile vector theo user, cập nhật dần khi có event mới
+profile_store = ProfileStore()
 
 # --- Output Model ---
 class SearchResponse(BaseModel):
@@ -61,22 +197,67 @@ class SearchResponse(BaseModel):
 class BrandRequest(BaseModel):
     brand: str
 
+class InteractionEvent(BaseModel):
+    sku: int
+    timestamp: Optional[float] = None  # epoch giây, mặc định là lúc nhận request
+    weight: float = 1.0  # vd. xem = 1, thêm giỏ = 3, mua = 5
+
+class PersonalizeRequest(BaseModel):
+    user_id: Optional[str] = None  # không có thì tính profile tạm từ events, không cache
+    events: List[InteractionEvent] = []
+    kind: str = "image"  # không gian vector dùng để gợi ý: "image" hoặc "text"
+    top_k: int = 12
+    brand: Optional[str] = None
+    color: Optional[str] = None
+    min_price: Optional[float] = None
+    max_price: Optional[float] = None
+    size: Optional[str] = None
+
+def _split_values(value: Optional[str]):
+    """'Nike, Adidas' -> ['Nike', 'Adidas'] (khớp 1 trong các giá trị); 1 giá trị thì giữ nguyên"""
+    if not value or "," not in value:
+        return value
+    return [v.strip() for v in value.split(",") if v.strip()]
+
+def build_search_filters(brand=None, color=None, min_price=None, max_price=None, size=None):
+    filters = {}
+    if brand: filters["brand"] = _split_values(brand)
+    if color: filters["color"] = _split_values(color)
+    if min_price is not None or max_price is not None:
+        filters["price"] = {"gte": min_price, "lte": max_price}
+    if size:
+        # in_stock_size là mảng: luôn dùng any-of
+        filters["in_stock_size"] = [v.strip() for v in size.split(",") if v.strip()]
+    return filters
+
+def hydrate(result_ids):
+    with stage("hydrate"):
+        return catalog.take(result_ids)
+
+def hydrate_preference(image_result_ids, text_result_ids):
+    with stage("hydrate"):
+        return {'image': catalog.take(image_result_ids), 'text': catalog.take(text_result_ids)}
+
+def serialize(content):
+    # Tự tạo JSONResponse để đo được thời gian serialize (bình thường FastAPI làm sau khi handler return)
+    with stage("serialize"):
+        return JSONResponse(content=content)
+
 # GET product by sku
 @app.get("/")
 def get_product_by_sku(sku: int):
-    product = df[df["sku"] == sku]
+    product = catalog.get(sku)
 
-    if product.empty:
+    if product is None:
         return {"error": "Product not found"}
 
-    return product.to_dict(orient="records")[0]
+    return product
 
 
 # POST products by brand
 @app.post("/products-by-brand")
 def get_products_by_brand(req: BrandRequest):
-    products = df[df["brand"].str.lower() == req.brand.lower()]
-    return products.head(4).to_dict(orient="records")
+    return catalog.by_brand(req.brand, limit=4)
 
 # POST Recommend products by image/text
 @app.post("/search")
@@ -84,54 +265,71 @@ async def search_products(
     file: Optional[UploadFile] = File(None),
     query_text: Optional[str] = Form(None),
     brand: Optional[str] = Form(None),
-    color: Optional[str] = Form(None)
+    color: Optional[str] = Form(None),
+    min_price: Optional[float] = Form(None),
+    max_price: Optional[float] = Form(None),
+    size: Optional[str] = Form(None)
 ):
     """
     Tìm kiếm sử dụng CLIP Model.
     - Nếu gửi Ảnh (file) -> Embed ảnh -> Tìm trong products_image.
     - Nếu gửi Text (query_text) -> Embed text -> Tìm trong products_text (hoặc products_image tùy bài toán, ở đây ta tìm trong products_text cho đúng ngữ nghĩa mô tả).
+    - Lọc: brand / color (không phân biệt hoa thường, nhiều giá trị cách nhau dấu phẩy), min_price / max_price, size còn hàng.
     """
-    
-    print(f"--> Input: Text='{query_text}', File={file.filename if file else 'None'}, Brand='{brand}', Color='{color}'")
+    logger.debug("search request", extra={
+        "query_text": query_text, "file": file.filename if file else None, "brand": brand, "color": color
+    })
 
-    filters = {}
-    if brand: filters["brand"] = brand
-    if color: filters["color"] = color
+    filters = build_search_filters(brand, color, min_price, max_price, size)
 
     search_results = []
+    result_ids = []
     top_k = 12
 
     try:
         # CASE 1: Tìm bằng Ảnh
         if file:
-            print("[LOG] Processing Image Search...")
-            image_data = await file.read()
-            try:
-                image = Image.open(io.BytesIO(image_data)).convert("RGB")
-            except Exception:
-                raise HTTPException(status_code=400, detail="Invalid image file. Please upload a valid image.")
-            
-            # Embed ảnh query bằng CLIP
-            query_vector = clip_model.encode(image).tolist()
+            with stage("upload_read"):
+                image_data = await read_upload(file)
+            with stage("decode"):
+                image, phash = await decode_image_query(image_data)
+            # Ảnh gần trùng có chung phash đại diện -> dùng chung kết quả
+            cache_key = QueryCache.result_key("image", phash, filters, top_k)
+            cached_ids = query_cache.get_results(cache_key)
+            RESULT_CACHE.inc(endpoint="/search", result="miss" if cached_ids is None else "hit")
+            if cached_ids is not None:
+                return serialize(hydrate(cached_ids))
+
+            # Embed ảnh query bằng CLIP (qua cache)
+            with stage("encode"):
+                query_vector = (await encode_image_query(image_data, image, phash)).tolist()
             
             # Tìm sản phẩm có ẢNH giống ẢNH query
-            search_results = image_db.search(
-                query_vector=query_vector, limit=top_k, filter_criteria=filters
-            )
+            with stage("vector_search"):
+                search_results = await image_db.search(
+                    query_vector=query_vector, limit=top_k, filter_criteria=filters
+                )
 
         # CASE 2: Tìm bằng Text
         elif query_text:
-            print("[LOG] Processing Text Search...")
-            # Embed text query bằng CLIP
-            query_vector = clip_model.encode(query_text).tolist()
+            cache_key = QueryCache.result_key("text", QueryCache.normalize_query(query_text), filters, top_k)
+            cached_ids = query_cache.get_results(cache_key)
+            RESULT_CACHE.inc(endpoint="/search", result="miss" if cached_ids is None else "hit")
+            if cached_ids is not None:
+                return serialize(hydrate(cached_ids))
+
+            # Embed text query bằng CLIP (qua cache)
+            with stage("encode"):
+                query_vector = (await encode_text(query_text)).tolist()
             
             # Có 2 chiến lược ở đây:
             # a) Tìm sản phẩm có MÔ TẢ (Text) khớp với Text Query -> Search vào products_text
             # b) Tìm sản phẩm có ẢNH khớp với Text Query (Text-to-Image) -> Search vào products_image
             # Theo yêu cầu là tách biệt, ta sẽ search vào products_text
-            search_results = text_db.search(
-                query_vector=query_vector, limit=top_k, filter_criteria=filters
-            )
+            with stage("vector_search"):
+                search_results = await text_db.search(
+                    query_vector=query_vector, limit=top_k, filter_criteria=filters
+                )
         
         else:
             raise HTTPException(status_code=400, detail="Please provide 'file' or 'query_text'.")
@@ -142,14 +340,97 @@ async def search_products(
             if hit.payload and 'product_id' in hit.payload:
                 result_ids.append(hit.payload['product_id'])
         
-        print(f"<-- Found: {len(result_ids)} items.")
-        return take_product_by_skus(df, list(result_ids))
+        query_cache.put_results(cache_key, result_ids)
+        logger.debug("search results", extra={"found": len(result_ids)})
+        return serialize(hydrate(result_ids))
+
+    except HTTPException:
+        # Lỗi từ phía client (400 / 413) giữ nguyên status code
+        raise
+    except Exception as e:
+        # Log kèm traceback đầy đủ để debug
+        logger.exception("search failed", extra={"query_text": query_text, "result_ids": result_ids})
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+# POST Hybrid search: query vector(s) chạy trên CẢ 2 collection rồi gộp thành 1 danh sách
+@app.post("/search/hybrid")
+async def hybrid_search_products(
+    file: Optional[UploadFile] = File(None),
+    query_text: Optional[str] = Form(None),
+    brand: Optional[str] = Form(None),
+    color: Optional[str] = Form(None),
+    min_price: Optional[float] = Form(None),
+    max_price: Optional[float] = Form(None),
+    size: Optional[str] = Form(None),
+    fusion: str = Form("rrf"),
+    text_weight: float = Form(1.0),
+    image_weight: float = Form(1.0),
+    top_k: int = Form(12)
+):
+    """
+    Hybrid search đa phương thức.
+    - Gửi Text, Ảnh hoặc cả hai: mỗi query vector được search song song trên products_text và products_image.
+    - Kết quả gộp bằng RRF (fusion="rrf") hoặc tổng điểm có trọng số (fusion="weighted").
+    - text_weight / image_weight: trọng số cho kết quả từ products_text / products_image.
+    """
+    if fusion not in FUSION_METHODS:
+        raise HTTPException(status_code=400, detail=f"'fusion' must be one of {list(FUSION_METHODS)}.")
+    if not file and not query_text:
+        raise HTTPException(status_code=400, detail="Please provide 'file' and/or 'query_text'.")
 
+    filters = build_search_filters(brand, color, min_price, max_price, size)
+    result_ids = []
+
+    try:
+        image_data, image, phash = None, None, None
+        if file:
+            with stage("upload_read"):
+                image_data = await read_upload(file)
+            with stage("decode"):
+                image, phash = await decode_image_query(image_data)
+
+        cache_key = QueryCache.result_key(
+            "hybrid",
+            (QueryCache.normalize_query(query_text) if query_text else None, phash),
+            filters, top_k, fusion, text_weight, image_weight
+        )
+        cached_ids = query_cache.get_results(cache_key)
+        RESULT_CACHE.inc(endpoint="/search/hybrid", result="miss" if cached_ids is None else "hit")
+        if cached_ids is not None:
+            return serialize(hydrate(cached_ids))
+
+        # Embed các query (text và ảnh) đồng thời
+        encodes = []
+        if query_text:
+            encodes.append(encode_text(query_text))
+        if image_data is not None:
+            encodes.append(encode_image_query(image_data, image, phash))
+        with stage("encode"):
+            query_vectors = [v.tolist() for v in await asyncio.gather(*encodes)]
+
+        # Lấy dư ứng viên ở mỗi danh sách để sau khi gộp vẫn đủ top_k
+        candidates = top_k * 2
+        searches, weights = [], []
+        for query_vector in query_vectors:
+            searches.append(text_db.search(query_vector=query_vector, limit=candidates, filter_criteria=filters))
+            weights.append(text_weight)
+            searches.append(image_db.search(query_vector=query_vector, limit=candidates, filter_criteria=filters))
+            weights.append(image_weight)
+        with stage("vector_search"):
+            result_lists = await asyncio.gather(*searches)
+
+        with stage("fusion"):
+            fused = fuse(result_lists, method=fusion, weights=weights, limit=top_k)
+        result_ids = [product_id for product_id, _ in fused]
+        query_cache.put_results(cache_key, result_ids)
+        logger.debug("hybrid search results", extra={"fusion": fusion, "found": len(fused)})
+        return serialize(hydrate(result_ids))
+
+    except HTTPException:
+        raise
     except Exception as e:
-        # In ra traceback đầy đủ để debug
-        print(take_product_by_skus(df, result_ids))
-        traceback.print_exc()
-        print(f"[ERR] API Error: {e}")
+        logger.exception("hybrid search failed", extra={"query_text": query_text, "fusion": fusion})
         raise HTTPException(status_code=500, detail=str(e))
 
 
@@ -157,48 +438,225 @@ async def search_products(
 async def get_preference(sku: int):
     top_k = 12
 
+    if neighbor_table is not None:
+        with stage("neighbor_table"):
+            image_result_ids = neighbor_table.neighbors(sku, "image", top_k)
+            text_result_ids = neighbor_table.neighbors(sku, "text", top_k) if image_result_ids else None
+        if image_result_ids is not None:
+            if not image_result_ids:
+                raise HTTPException(status_code=400, detail="Product image is not indexed.")
+            return serialize(hydrate_preference(image_result_ids, text_result_ids))
+
+    # Dùng luôn vector đã lưu của sản phẩm trong products_image / products_text (id = sku),
+    # không cần đọc ảnh từ đĩa hay chạy CLIP lại. 2 query chạy song song.
+    logger.debug("preference request", extra={"sku": sku})
+    with stage("vector_search"):
+        image_search_results, text_search_results = await asyncio.gather(
+            image_db.recommend_by_id(sku, limit=top_k),
+            text_db.recommend_by_id(sku, limit=top_k),
+        )
+
     # Suggest 1: thông qua Ảnh
-    print("[LOG] Processing Image Search...")
-    try:
-        # Mở trực tiếp file từ đường dẫn (không dùng BytesIO cho file local)
-        # Đường dẫn dựa trên thư mục chạy (root) giống như cách đọc file CSV
-        image = Image.open(f"./data/images/{sku}.jpg").convert("RGB")
-    except Exception:
-        traceback.print_exc() # In lỗi chi tiết ra terminal (ví dụ: FileNotFoundError)
-        raise HTTPException(status_code=400, detail="Invalid image file. Please upload a valid image.")
-    
-    # Embed ảnh query bằng CLIP
-    query_vector = clip_model.encode(image).tolist()
-    
-    # Tìm sản phẩm có ẢNH giống ẢNH query
-    image_search_results = image_db.search(
-        query_vector=query_vector, limit=top_k
-    )
+    if image_search_results is None:
+        raise HTTPException(status_code=400, detail="Product image is not indexed.")
     image_result_ids = []
     for hit in image_search_results:
             if hit.payload and 'product_id' in hit.payload:
                 image_result_ids.append(hit.payload['product_id'])
 
-    
-    print("[LOG] Processing Text Search...")
-    query_text = f"{df[df['sku'] == sku]['name']}. {df[df['sku'] == sku]['description']}"
-    # Embed text query bằng CLIP
-    query_vector = clip_model.encode(query_text).tolist()
-        
-    # Có 2 chiến lược ở đây:
-    # a) Tìm sản phẩm có MÔ TẢ (Text) khớp với Text Query -> Search vào products_text
-    # b) Tìm sản phẩm có ẢNH khớp với Text Query (Text-to-Image) -> Search vào products_image
-    # Theo yêu cầu là tách biệt, ta sẽ search vào products_text
-    text_search_results = text_db.search(
-        query_vector=query_vector, limit=top_k
-    )
+    # Suggest 2: thông qua Text (mô tả)
     text_result_ids = []
-    for hit in text_search_results:
+    for hit in text_search_results or []:
             if hit.payload and 'product_id' in hit.payload:
                 text_result_ids.append(hit.payload['product_id'])
 
-    return {'image' : take_product_by_skus(df, image_result_ids), 'text' : take_product_by_skus(df, text_result_ids)}
+    return serialize(hydrate_preference(image_result_ids, text_result_ids))
+
+
+@app.post("/preference/hybrid")
+async def get_hybrid_preference(sku: int, fusion: str = "rrf", text_weight: float = 1.0,
+                                image_weight: float = 1.0, top_k: int = 12):
+    """Giống /preference nhưng gộp gợi ý theo Ảnh và theo Text thành 1 danh sách đã bỏ trùng"""
+    if fusion not in FUSION_METHODS:
+        raise HTTPException(status_code=400, detail=f"'fusion' must be one of {list(FUSION_METHODS)}.")
+
+    try:
+        # Bảng tính sẵn chỉ có RRF trọng số 1 với top_k * 2 ứng viên mỗi danh sách
+        if (neighbor_table is not None and fusion == "rrf" and text_weight == image_weight == 1.0
+                and top_k * 2 == neighbor_table.k):
+            with stage("neighbor_table"):
+                fused_ids = neighbor_table.neighbors(sku, "fused", top_k)
+            if fused_ids is not None:
+                return serialize(hydrate(fused_ids))
+
+        cache_key = QueryCache.result_key("preference_hybrid", sku, None, top_k, fusion, text_weight, image_weight)
+        cached_ids = query_cache.get_results(cache_key)
+        RESULT_CACHE.inc(endpoint="/preference/hybrid", result="miss" if cached_ids is None else "hit")
+        if cached_ids is not None:
+            return serialize(hydrate(cached_ids))
+
+        with stage("vector_search"):
+            image_search_results, text_search_results = await asyncio.gather(
+                image_db.recommend_by_id(sku, limit=top_k * 2),
+                text_db.recommend_by_id(sku, limit=top_k * 2),
+            )
+        if image_search_results is None and text_search_results is None:
+            raise HTTPException(status_code=404, detail="Product is not indexed.")
+
+        with stage("fusion"):
+            fused = fuse(
+                [image_search_results or [], text_search_results or []],
+                method=fusion, weights=[image_weight, text_weight], limit=top_k
+            )
+        result_ids = [product_id for product_id, _ in fused]
+        query_cache.put_results(cache_key, result_ids)
+        return serialize(hydrate(result_ids))
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.exception("hybrid preference failed", extra={"sku": sku, "fusion": fusion})
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.post("/personalize")
+async def personalize(req: PersonalizeRequest):
+    """
+    Gợi ý theo lịch sử nhiều sản phẩm của user: vector sở thích = trung bình có trọng số (giảm dần theo thời gian)
+    các vector sản phẩm đã tương tác, rồi 1 query ANN (có filter) loại các sản phẩm đã xem.
+    Profile được cache theo user_id, mỗi request chỉ cần lấy vector của các event mới.
+    """
+    if req.kind not in ("image", "text"):
+        raise HTTPException(status_code=400, detail="'kind' must be 'image' or 'text'.")
+    db = image_db if req.kind == "image" else text_db
+
+    result_ids = []
+    try:
+        profile = profile_store.get(req.user_id, req.kind)
+        pending = profile_store.pending_events(profile, [(e.sku, e.timestamp, e.weight) for e in req.events])
+        if pending:
+            try:
+                with stage("retrieve"):
+                    vectors = await db.retrieve_vectors(list({sku for sku, _, _, _ in pending}))
+            except Exception:
+                # Chưa cộng được -> bỏ đánh dấu để request sau thử lại, không mất event
+                profile_store.release(profile, pending)
+                raise
+            profile_store.apply(profile, pending, vectors)
+
+        query_vector = profile.query_vector()
+        if query_vector is None:
+            raise HTTPException(status_code=400, detail="No indexed products in user history.")
+
+        filters = build_search_filters(req.brand, req.color, req.min_price, req.max_price, req.size)
+        with stage("vector_search"):
+            search_results = await db.search(
+                query_vector=query_vector, limit=req.top_k, filter_criteria=filters, exclude_ids=list(profile.seen)
+            )
+        result_ids = [hit.payload['product_id'] for hit in search_results
+                      if hit.payload and 'product_id' in hit.payload]
+        return serialize(hydrate(result_ids))
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.exception("personalize failed", extra={"user_id": req.user_id, "kind": req.kind,
+                                                      "events": len(req.events), "result_ids": result_ids})
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.get("/stats/cache")
+def get_cache_stats():
+    """Hit / miss của các tầng cache: query cache (embedding, kết quả), embedding cache trên đĩa, batch encode"""
+    return {
+        "query": query_cache.stats(),
+        "embedding": embedding_cache.stats(),
+        "image_hashes": image_hashes.stats(),
+        "profiles": profile_store.stats(),
+        "scheduler": inference_scheduler.stats(),
+    }
+
+
+@app.get("/metrics")
+def metrics():
+    """Metrics cho Prometheus: số request / latency theo route, latency từng stage của /search, /preference"""
+    return Response(REGISTRY.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+
+@app.get("/ready")
+def readiness():
+    """Readiness probe: 200 khi đã load xong catalogue, vector store và warm-up model, trước đó 503"""
+    content = startup.status()
+    content["towers"] = {kind: clip_model.is_loaded(kind) for kind in TOWERS}
+    return JSONResponse(status_code=200 if startup.ready else 503, content=content)
+
+
+# --- Startup ---
+def load_catalog_index():
+    global catalog
+    # Catalogue đã parse sẵn các cột list (dùng chung artifact với ingest, CSV đổi thì tự build lại),
+    # index 1 lần: sku -> record, brand -> skus
+    catalog = ProductCatalog(load_catalog(CATALOG_PATH))
+
+def open_embedding_cache():
+    global embedding_cache
+    # Cache embedding do ingest ghi (key = model + hash nội dung input), API chỉ đọc: embedding của query
+    # chỉ nằm trong các LRU (query_cache / image_hashes), query tuỳ ý của user không làm file lớn dần.
+    # Miss không quét lại file trên event loop, record mới được đọc định kỳ bởi refresh_embedding_cache
+    embedding_cache = EmbeddingCache(model_name=clip_model.cache_name, dim=512, refresh_on_miss=False)
+
+async def refresh_embedding_cache():
+    while True:
+        await asyncio.sleep(EMBEDDING_CACHE_REFRESH_SECONDS)
+        try:
+            await asyncio.to_thread(embedding_cache.refresh)
+        except Exception:
+            logger.exception("embedding cache refresh failed")
+
+async def ensure_collections():
+    # Layout "named": text_db và image_db cùng 1 collection -> chỉ tạo 1 lần
+    handlers = {db.collection_name: db for db in (text_db, image_db)}
+    await asyncio.gather(*(db.ensure_collection() for db in handlers.values()))
+
+async def open_vector_store():
+    global text_db, image_db
+    # VECTOR_BACKEND=numpy đọc index từ đĩa lúc tạo handler -> chạy trên thread pool
+    text_db, image_db = await asyncio.to_thread(create_vector_handlers)
+    await ensure_collections()
+
+def load_neighbor_table():
+    global neighbor_table
+    neighbor_table = NeighborTable()
+
+def warm_up(kind: str):
+    # Forward pass đầu tiên của torch chậm hơn hẳn các lần sau -> chạy thử trước khi nhận traffic
+    clip_model.load(kind)
+    clip_model.encode(["warm up"] if kind == "text" else [Image.new("RGB", (CLIP_IMAGE_SIZE, CLIP_IMAGE_SIZE))])
+
+background_tasks = set()
+
+async def load_components():
+    phases = [
+        startup.phase("catalog", load_catalog_index),
+        startup.phase("embedding_cache", open_embedding_cache),
+        startup.phase("vector_store", open_vector_store),
+    ]
+    if PREFERENCE_SOURCE == "table":
+        phases.append(startup.phase("neighbor_table", load_neighbor_table))
+    phases += [startup.phase(f"warmup_{kind}", warm_up, kind) for kind in API_WARMUP_TOWERS]
+    await asyncio.gather(*phases)
+
+    task = asyncio.create_task(refresh_embedding_cache())
+    background_tasks.add(task)
+    task.add_done_callback(background_tasks.discard)
 
+    if API_BACKGROUND_LOAD:
+        # Tower chưa warm-up: load ở nền ngay sau khi ready, request cần nó đến trước thì tự chờ
+        for kind in TOWERS:
+            if kind not in API_WARMUP_TOWERS:
+                task = asyncio.create_task(ensure_tower(kind))
+                background_tasks.add(task)
+                task.add_done_callback(background_tasks.discard)
 
     
 if __name__ == '__main__':
@@ -0,0 +1,119 @@
+import math
+import time
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Optional, Tuple
+import numpy as np
+from api.query_cache import TTLCache
+
+# Tương tác cũ hơn 1 half-life chỉ còn 1/2 trọng số
+PROFILE_HALF_LIFE_SECONDS = 3 * 24 * 3600
+# Số SKU đã xem giữ lại để loại khỏi kết quả / số event đã cộng giữ lại để bỏ trùng
+MAX_SEEN_ITEMS = 500
+MAX_APPLIED_EVENTS = 2000
+
+
+class UserProfile:
+    """
+    Vector sở thích của 1 user = tổng có trọng số các vector sản phẩm đã tương tác, giảm dần theo thời gian:
+    profile(t) = sum(w_i * 2^(-(t - t_i) / half_life) * v_i). Lưu ở mốc ref_time (tương tác mới nhất),
+    thêm event mới chỉ cần nhân decay cho phần cũ rồi cộng vector mới.
+    """
+
+    __slots__ = ("vector", "ref_time", "seen", "applied")
+
+    def __init__(self):
+        self.vector = None
+        self.ref_time = None
+        self.seen = OrderedDict()
+        self.applied = OrderedDict()
+
+    def add(self, vector: np.ndarray, weight: float, timestamp: float, half_life: float):
+        vector = np.asarray(vector, dtype=np.float32)
+        if self.vector is None:
+            self.vector = np.zeros_like(vector)
+            self.ref_time = timestamp
+        if timestamp > self.ref_time:
+            self.vector *= math.pow(2.0, -(timestamp - self.ref_time) / half_life)
+            self.ref_time = timestamp
+        else:
+            # Event đến trễ (cũ hơn mốc hiện tại): decay riêng phần của nó
+            weight *= math.pow(2.0, -(self.ref_time - timestamp) / half_life)
+        self.vector += weight * vector
+
+    def mark_applied(self, event_key) -> bool:
+        """False nếu event đã được cộng trước đó"""
+        if event_key in self.applied:
+            return False
+        self.applied[event_key] = None
+        if len(self.applied) > MAX_APPLIED_EVENTS:
+            self.applied.popitem(last=False)
+        return True
+
+    def unmark_applied(self, event_keys):
+        for event_key in event_keys:
+            self.applied.pop(event_key, None)
+
+    def mark_seen(self, sku: int):
+        self.seen[sku] = None
+        self.seen.move_to_end(sku)
+        if len(self.seen) > MAX_SEEN_ITEMS:
+            self.seen.popitem(last=False)
+
+    def query_vector(self) -> Optional[List[float]]:
+        if self.vector is None:
+            return None
+        norm = float(np.linalg.norm(self.vector))
+        if norm == 0:
+            return None
+        return (self.vector / norm).tolist()
+
+
+class ProfileStore:
+    """Cache profile theo (user_id, loại vector), LRU + TTL; user ẩn danh thì dùng profile tạm"""
+
+    def __init__(self, half_life: float = PROFILE_HALF_LIFE_SECONDS, max_users: int = 100000,
+                 ttl_seconds: float = 7 * 24 * 3600):
+        self.half_life = half_life
+        self._profiles = TTLCache(max_users, ttl_seconds)
+
+    def get(self, user_id: Optional[str], kind: str) -> UserProfile:
+        if user_id is None:
+            return UserProfile()
+        key = (user_id, kind)
+        profile = self._profiles.get(key)
+        if profile is None:
+            profile = UserProfile()
+        # put lại để gia hạn TTL mỗi lần user hoạt động
+        self._profiles.put(key, profile)
+        return profile
+
+    @staticmethod
+    def pending_events(profile: UserProfile, events: Iterable[Tuple[int, Optional[float], float]]):
+        """
+        Các event (sku, timestamp, weight) chưa được cộng vào profile (client thường gửi lại cả lịch sử gần đây),
+        trả về (sku, timestamp, weight, key). Đánh dấu luôn là đã nhận, để 2 request đồng thời của cùng user
+        không cộng 1 event 2 lần; cộng lỗi thì gọi release() để request sau thử lại.
+        Event không có timestamp được tính là lúc nhận, key = (sku, None): gửi lại không bị cộng thêm lần nữa.
+        """
+        now = time.time()
+        pending = []
+        for sku, timestamp, weight in events:
+            key = (sku, timestamp)
+            if profile.mark_applied(key):
+                pending.append((sku, now if timestamp is None else timestamp, weight, key))
+        return pending
+
+    @staticmethod
+    def release(profile: UserProfile, pending: List[Tuple[int, float, float, tuple]]):
+        """Bỏ đánh dấu các event chưa cộng được (vd. lấy vector lỗi)"""
+        profile.unmark_applied(key for _, _, _, key in pending)
+
+    def apply(self, profile: UserProfile, events: List[Tuple[int, float, float, tuple]], vectors: Dict[int, np.ndarray]):
+        for sku, timestamp, weight, _ in sorted(events, key=lambda e: e[1]):
+            profile.mark_seen(sku)
+            vector = vectors.get(sku)
+            if vector is not None:
+                profile.add(vector, weight, timestamp, self.half_life)
+
+    def stats(self) -> Dict:
+        return self._profiles.stats()
@@ -0,0 +1,117 @@
+import json
+import time
+from collections import OrderedDict
+from typing import Dict, Optional
+from embedding.cache import INDEX_VERSION_PATH, read_index_version
+
+
+class TTLCache:
+    """LRU có hạn sống: entry quá ttl_seconds bị coi như miss, vượt max_size thì bỏ entry dùng lâu nhất"""
+
+    def __init__(self, max_size: int = 10000, ttl_seconds: float = 300.0):
+        self.max_size = max_size
+        self.ttl = ttl_seconds
+        self._data = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key):
+        entry = self._data.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        expires_at, value = entry
+        if expires_at < time.monotonic():
+            del self._data[key]
+            self.misses += 1
+            return None
+        self._data.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def put(self, key, value):
+        self._data[key] = (time.monotonic() + self.ttl, value)
+        self._data.move_to_end(key)
+        if len(self._data) > self.max_size:
+            self._data.popitem(last=False)
+            self.evictions += 1
+
+    def clear(self):
+        self._data.clear()
+
+    def stats(self) -> Dict:
+        total = self.hits + self.misses
+        return {
+            "size": len(self._data),
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": round(self.hits / total, 4) if total else 0.0,
+        }
+
+
+class QueryCache:
+    """
+    Cache 2 tầng cho /search (dùng trong event loop của API, không cần lock):
+    - embeddings: query text đã chuẩn hoá -> vector CLIP (bỏ qua forward pass)
+    - results: (phạm vi, key của query, filter, top_k, ...) -> danh sách product_id đã xếp hạng (bỏ qua Qdrant)
+    Tầng results bị xoá khi ingest ghi index mới (file INDEX_VERSION_PATH đổi), kiểm tra tối đa 1 lần / check_interval;
+    embedding của query chỉ phụ thuộc model, không phụ thuộc index, nên được giữ lại.
+    """
+
+    def __init__(self, embedding_size: int = 10000, embedding_ttl: float = 3600.0,
+                 result_size: int = 10000, result_ttl: float = 60.0,
+                 version_path: str = INDEX_VERSION_PATH, check_interval: float = 1.0):
+        self.embeddings = TTLCache(embedding_size, embedding_ttl)
+        self.results = TTLCache(result_size, result_ttl)
+        self.version_path = version_path
+        self.check_interval = check_interval
+        self.invalidations = 0
+        self._version = read_index_version(version_path)
+        self._next_check = time.monotonic() + check_interval
+
+    @staticmethod
+    def normalize_query(text: str) -> str:
+        """Tokenizer CLIP vốn đã lowercase + gộp khoảng trắng, nên chuẩn hoá trước không đổi embedding"""
+        return " ".join(text.lower().split())
+
+    @staticmethod
+    def result_key(scope: str, query_key, filters: Optional[Dict], top_k: int, *extra):
+        return (scope, query_key, json.dumps(filters or {}, sort_keys=True, default=str), top_k, extra)
+
+    def _check_version(self):
+        now = time.monotonic()
+        if now < self._next_check:
+            return
+        self._next_check = now + self.check_interval
+        version = read_index_version(self.version_path)
+        if version != self._version:
+            self._version = version
+            self.invalidate()
+
+    def invalidate(self):
+        self.results.clear()
+        self.invalidations += 1
+
+    def get_embedding(self, text: str):
+        self._check_version()
+        return self.embeddings.get(text)
+
+    def put_embedding(self, text: str, vector):
+        self.embeddings.put(text, vector)
+
+    def get_results(self, key):
+        self._check_version()
+        return self.results.get(key)
+
+    def put_results(self, key, product_ids):
+        self.results.put(key, list(product_ids))
+
+    def stats(self) -> Dict:
+        return {
+            "embeddings": self.embeddings.stats(),
+            "results": self.results.stats(),
+            "invalidations": self.invalidations,
+            "index_version": self._version,
+        }
@@ -0,0 +1,90 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+
+class InferenceScheduler:
+    """
+    Đứng trước clip_model: gom các request encode (text / ảnh) đến cùng lúc từ nhiều handler
+    thành 1 batch, chạy 1 forward pass trên worker thread để không block event loop.
+    Một batch được chạy khi đủ max_batch_size hoặc sau max_wait_ms kể từ request đầu tiên.
+    """
+
+    KINDS = ("text", "image")
+
+    def __init__(self, model, max_batch_size: int = 32, max_wait_ms: float = 5.0):
+        self.model = model
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        # 1 worker thread: mỗi lúc chỉ 1 forward pass, bản thân torch đã dùng nhiều core cho 1 batch
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="clip-infer")
+        self._loop = None
+        self._queues = {}
+        self._workers = []
+        self.batches = 0
+        self.items = 0
+
+    def _ensure_started(self):
+        loop = asyncio.get_running_loop()
+        if self._loop is loop:
+            return
+        # Tạo queue + worker task trên event loop hiện tại
+        self._loop = loop
+        self._queues = {kind: asyncio.Queue() for kind in self.KINDS}
+        self._workers = [loop.create_task(self._run(self._queues[kind])) for kind in self.KINDS]
+
+    async def _submit(self, kind, item):
+        self._ensure_started()
+        future = self._loop.create_future()
+        self._queues[kind].put_nowait((item, future))
+        return await future
+
+    async def encode_text(self, text: str):
+        return await self._submit("text", text)
+
+    async def encode_image(self, image):
+        return await self._submit("image", image)
+
+    async def _collect(self, queue):
+        batch = [await queue.get()]
+        # Đợi thêm 1 khoảng ngắn để gom các request đến sau, trừ khi đã đủ batch
+        if self.max_wait > 0 and queue.qsize() < self.max_batch_size - 1:
+            await asyncio.sleep(self.max_wait)
+        while len(batch) < self.max_batch_size and not queue.empty():
+            batch.append(queue.get_nowait())
+        return batch
+
+    def _encode(self, inputs):
+        return self.model.encode(inputs, batch_size=len(inputs))
+
+    async def _run(self, queue):
+        while True:
+            batch = await self._collect(queue)
+            inputs = [item for item, _ in batch]
+            try:
+                vectors = await self._loop.run_in_executor(self._executor, self._encode, inputs)
+            except Exception as e:
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+
+            self.batches += 1
+            self.items += len(batch)
+            for (_, future), vector in zip(batch, vectors):
+                # future có thể đã bị huỷ nếu client ngắt kết nối
+                if not future.done():
+                    future.set_result(vector)
+
+    async def close(self):
+        for worker in self._workers:
+            worker.cancel()
+        self._workers = []
+        self._loop = None
+        self._executor.shutdown(wait=False)
+
+    def stats(self):
+        return {
+            "batches": self.batches,
+            "items": self.items,
+            "avg_batch_size": round(self.items / self.batches, 2) if self.batches else 0.0,
+        }
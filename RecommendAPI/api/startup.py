@@ -0,0 +1,61 @@
+import asyncio
+import time
+from typing import Dict
+from api.log import get_logger
+
+logger = get_logger("startup")
+
+
+class StartupState:
+    """
+    Khởi động API ở nền (sau khi server đã nhận kết nối): các phase chạy đồng thời, phase đồng bộ (đọc file,
+    load model) chạy trên thread pool. /ready dựa vào state này, thời gian từng phase được ghi lại để theo dõi.
+    """
+
+    def __init__(self):
+        self.timings: Dict[str, float] = {}
+        self.ready = False
+        self.error = None
+        self._started_at = None
+        self._task = None
+
+    async def phase(self, name: str, fn, *args):
+        start = time.perf_counter()
+        if asyncio.iscoroutinefunction(fn):
+            result = await fn(*args)
+        else:
+            result = await asyncio.to_thread(fn, *args)
+        self.timings[name] = round(time.perf_counter() - start, 3)
+        return result
+
+    def start(self, coro):
+        self._started_at = time.perf_counter()
+        self._task = asyncio.create_task(self._run(coro))
+
+    async def _run(self, coro):
+        try:
+            await coro
+        except Exception as e:
+            self.error = repr(e)
+            logger.exception("API startup failed")
+            return
+        self.timings["total"] = round(time.perf_counter() - self._started_at, 3)
+        self.ready = True
+        logger.info("API ready in %ss", self.timings["total"], extra={"timings": dict(self.timings)})
+
+    async def wait(self):
+        """Chờ khởi động xong (thành công hoặc lỗi)"""
+        if self._task is not None:
+            await asyncio.shield(self._task)
+
+    async def stop(self):
+        if self._task is not None and not self._task.done():
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+
+    def status(self) -> Dict:
+        state = "ready" if self.ready else ("failed" if self.error else "starting")
+        return {"status": state, "timings": dict(self.timings), "error": self.error}
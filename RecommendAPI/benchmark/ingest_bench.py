@@ -0,0 +1,38 @@
+import time
+from vectordb.qdrant_client_handler import close_sync_clients
+
+INGEST_MODES = ("batched", "streaming")
+
+
+def bench_ingest(csv_path: str, images_dir: str, modes=("batched",), batch_size: int = 64, num_workers: int = 4,
+                 chunk_size: int = 1000):
+    """
+    Thông lượng ingest (product/s, ảnh/s) trên catalogue cho trước, vào vector store đang cấu hình
+    (benchmark dùng Qdrant local). Không dùng embedding cache để lần nào cũng encode thật.
+    """
+    from embedding.ingest import DataIngestion
+    results = {}
+    for mode in modes:
+        if mode not in INGEST_MODES:
+            raise ValueError(f"Unknown ingest mode: {mode} (expected one of {INGEST_MODES})")
+        start = time.perf_counter()
+        ingestor = DataIngestion(csv_path=csv_path, images_folder=images_dir, use_cache=False,
+                                 streaming=mode == "streaming", dead_letter_path=None)
+        setup_seconds = time.perf_counter() - start
+        if mode == "streaming":
+            stats = ingestor.process_and_ingest_streaming(batch_size=batch_size, num_workers=num_workers,
+                                                          chunk_size=chunk_size)
+        else:
+            stats = ingestor.process_and_ingest_batched(batch_size=batch_size, num_workers=num_workers)
+        results[mode] = {
+            "setup_seconds": round(setup_seconds, 3),
+            "batch_size": batch_size,
+            "num_workers": num_workers,
+            **{k: stats[k] for k in ("products", "images", "seconds", "products_per_sec", "images_per_sec") if k in stats},
+        }
+        print(f"[BENCH] ingest {mode}: {results[mode].get('products_per_sec')} products/s, "
+              f"{results[mode].get('images_per_sec')} images/s")
+        del ingestor
+    # Qdrant local: nhả thư mục collection cho API mở ở bước load test
+    close_sync_clients()
+    return results
@@ -0,0 +1,101 @@
+import asyncio
+import random
+import time
+from collections import Counter
+from typing import Callable, Dict, List
+from benchmark.timing import summarize
+from benchmark.synthetic import query_texts, query_images
+
+SCENARIOS = ("search_text", "search_image", "preference", "products_by_brand")
+
+
+def build_scenarios(skus: List[int], brands: List[str], seed: int = 0) -> Dict[str, Callable[[], Dict]]:
+    """Mỗi scenario: hàm trả về tham số của 1 request ngẫu nhiên (method, url, ...) cho httpx"""
+    rng = random.Random(seed)
+    texts = query_texts(500, seed=seed + 1)
+    images = query_images(20, seed=seed + 2)
+    return {
+        "search_text": lambda: {"method": "POST", "url": "/search", "data": {"query_text": rng.choice(texts)}},
+        "search_image": lambda: {"method": "POST", "url": "/search",
+                                 "files": {"file": ("query.jpg", rng.choice(images), "image/jpeg")}},
+        "preference": lambda: {"method": "POST", "url": "/preference", "params": {"sku": rng.choice(skus)}},
+        "products_by_brand": lambda: {"method": "POST", "url": "/products-by-brand",
+                                      "json": {"brand": rng.choice(brands)}},
+    }
+
+
+async def run_scenario(client, make_request: Callable[[], Dict], concurrency: int, num_requests: int,
+                       warmup: int = 5) -> Dict:
+    """
+    Gửi num_requests request với `concurrency` request đồng thời (closed loop: mỗi worker gửi request kế tiếp
+    ngay khi nhận response). Trả về p50/p95/p99 (ms), RPS và số request theo status code.
+    """
+    for _ in range(warmup):
+        await client.request(**make_request())
+
+    latencies = []
+    statuses = Counter()
+    remaining = num_requests
+
+    async def worker():
+        nonlocal remaining
+        while remaining > 0:
+            remaining -= 1
+            request = make_request()
+            start = time.perf_counter()
+            try:
+                response = await client.request(**request)
+                statuses[str(response.status_code)] += 1
+            except Exception as e:
+                statuses[type(e).__name__] += 1
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+
+    result = summarize(latencies)
+    result["concurrency"] = concurrency
+    result["rps"] = round(len(latencies) / max(elapsed, 1e-9), 2)
+    result["status"] = dict(statuses)
+    result["errors"] = sum(n for status, n in statuses.items() if not status.startswith("2"))
+    return result
+
+
+async def run_load_test(client, skus: List[int], brands: List[str], scenarios=SCENARIOS, concurrency=(1, 16),
+                        num_requests: int = 200) -> Dict:
+    makers = build_scenarios(skus, brands)
+    results = {}
+    for name in scenarios:
+        results[name] = {}
+        for level in concurrency:
+            stats = await run_scenario(client, makers[name], level, num_requests)
+            results[name][str(level)] = stats
+            print(f"[BENCH] {name} c={level}: p50 {stats['p50_ms']} ms, p95 {stats['p95_ms']} ms, "
+                  f"p99 {stats['p99_ms']} ms, {stats['rps']} req/s, errors {stats['errors']}")
+    return results
+
+
+async def load_test_in_process(skus: List[int], brands: List[str], **kwargs) -> Dict:
+    """Chạy API ngay trong process (ASGI, không qua mạng), chờ /ready rồi mới đo"""
+    import httpx
+    from api.main import app, startup
+
+    async with app.router.lifespan_context(app):
+        await startup.wait()
+        if not startup.ready:
+            raise RuntimeError(f"API startup failed: {startup.error}")
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench",
+                                     timeout=60) as client:
+            ready = (await client.get("/ready")).json()
+            results = await run_load_test(client, skus, brands, **kwargs)
+    return {"startup": ready, "scenarios": results}
+
+
+async def load_test_remote(url: str, skus: List[int], brands: List[str], **kwargs) -> Dict:
+    """Đo API đang chạy ở url (uvicorn / deploy thật, có cả network)"""
+    import httpx
+    async with httpx.AsyncClient(base_url=url, timeout=60) as client:
+        ready = await client.get("/ready")
+        results = await run_load_test(client, skus, brands, **kwargs)
+    return {"startup": ready.json() if ready.status_code in (200, 503) else None, "scenarios": results}
@@ -0,0 +1,78 @@
+import ast
+import io
+import random
+import time
+import pandas as pd
+from PIL import Image
+from benchmark.timing import measure
+from benchmark.synthetic import query_texts, query_images
+from embedding.preprocess import parse_literal, load_catalog
+
+
+def bench_encoder(batch_sizes=(1, 8, 32, 64), repeat: int = 5):
+    """Encode text / ảnh qua encoder đang cấu hình (CLIP_BACKEND) ở nhiều batch size: ms/batch và item/s"""
+    from embedding.encoder import LazyClipEncoder
+    encoder = LazyClipEncoder()
+    results = {"backend": encoder.backend, "load_seconds": {}, "text": {}, "image": {}}
+    for kind in ("text", "image"):
+        start = time.perf_counter()
+        encoder.load(kind)
+        results["load_seconds"][kind] = round(time.perf_counter() - start, 3)
+
+    texts = query_texts(max(batch_sizes))
+    images = [Image.open(io.BytesIO(data)).convert("RGB") for data in query_images(max(batch_sizes))]
+    for batch_size in batch_sizes:
+        for kind, inputs in (("text", texts[:batch_size]), ("image", images[:batch_size])):
+            stats = measure(lambda: encoder.encode(inputs, batch_size=batch_size), repeat=repeat, warmup=1)
+            stats["items_per_sec"] = round(batch_size / max(stats["mean_ms"] / 1000, 1e-9), 2)
+            results[kind][str(batch_size)] = stats
+            print(f"[BENCH] encode {kind} batch={batch_size}: {stats['mean_ms']} ms/batch, "
+                  f"{stats['items_per_sec']} items/s")
+    return results
+
+
+def bench_parsing(csv_path: str, max_cells: int = 2000, repeat: int = 5):
+    """Parse cột description (chuỗi literal): parser của preprocess so với ast.literal_eval"""
+    cells = pd.read_csv(csv_path, usecols=["description"], nrows=max_cells)["description"].dropna().tolist()
+    results = {"cells": len(cells)}
+    for name, parse in (("parse_literal", parse_literal), ("ast_literal_eval", ast.literal_eval)):
+        stats = measure(lambda: [parse(c) for c in cells], repeat=repeat, warmup=1)
+        stats["cells_per_sec"] = round(len(cells) / max(stats["mean_ms"] / 1000, 1e-9), 1)
+        results[name] = stats
+        print(f"[BENCH] parse {name}: {stats['cells_per_sec']} cells/s")
+
+    start = time.perf_counter()
+    load_catalog(csv_path)
+    results["load_catalog_csv_seconds"] = round(time.perf_counter() - start, 3)
+    # Lần 2 đọc artifact đã parse sẵn
+    start = time.perf_counter()
+    load_catalog(csv_path)
+    results["load_catalog_artifact_seconds"] = round(time.perf_counter() - start, 3)
+    return results
+
+
+def bench_catalog(csv_path: str, lookups: int = 10000, seed: int = 0):
+    """Lookup trên ProductCatalog của API: get(sku), take(12 sku), by_brand"""
+    from api.catalog import ProductCatalog
+    df = load_catalog(csv_path)
+    start = time.perf_counter()
+    catalog = ProductCatalog(df)
+    results = {"products": len(catalog), "build_seconds": round(time.perf_counter() - start, 3)}
+
+    rng = random.Random(seed)
+    skus = [int(s) for s in df["sku"]]
+    brands = df["brand"].dropna().unique().tolist()
+    sku_samples = [rng.choice(skus) for _ in range(lookups)]
+    take_samples = [rng.sample(skus, 12) for _ in range(lookups // 12)]
+    brand_samples = [rng.choice(brands) for _ in range(lookups // 12)]
+
+    for name, run, count in (
+        ("get", lambda: [catalog.get(s) for s in sku_samples], len(sku_samples)),
+        ("take_12", lambda: [catalog.take(s) for s in take_samples], len(take_samples)),
+        ("by_brand_4", lambda: [catalog.by_brand(b, limit=4) for b in brand_samples], len(brand_samples)),
+    ):
+        stats = measure(run, repeat=5, warmup=1)
+        results[name] = {"ops_per_sec": round(count / max(stats["mean_ms"] / 1000, 1e-9), 1),
+                         "us_per_op": round(stats["mean_ms"] * 1000 / count, 3)}
+        print(f"[BENCH] catalog {name}: {results[name]['us_per_op']} us/op")
+    return results
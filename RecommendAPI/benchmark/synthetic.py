@@ -0,0 +1,83 @@
+import csv
+import io
+import os
+import random
+import numpy as np
+from PIL import Image
+
+BRANDS = ["ASOS DESIGN", "Nike", "Adidas Originals", "Topshop", "Miss Selfridge", "New Look", "Collusion",
+          "Reclaimed Vintage", "The North Face", "Weekday", "Bershka", "River Island"]
+COLORS = ["BLACK", "WHITE", "RED", "NAVY", "KHAKI", "BEIGE", "PINK", "BROWN", "GREEN", "GREY"]
+GARMENTS = ["dress", "jacket", "jeans", "t-shirt", "hoodie", "skirt", "coat", "trainers", "shirt", "jumper",
+            "trousers", "shorts"]
+DETAILS = ["oversized fit", "slim fit", "ribbed texture", "zip fastening", "side pockets", "cropped length",
+           "high rise", "relaxed fit", "button placket", "elasticated waist", "puff sleeves", "faux fur trim"]
+SIZES = ["XS", "S", "M", "L", "XL", "UK 6", "UK 8", "UK 10", "UK 12"]
+IMAGE_SIZE = (600, 765)  # cỡ ảnh sản phẩm của ASOS
+
+
+def _description(rng: random.Random, brand: str, garment: str) -> str:
+    # Giống cột description gốc: chuỗi literal Python của list dict
+    details = "".join(d.capitalize() for d in rng.sample(DETAILS, 4))
+    sections = [
+        {"Product Details": f"{garment.capitalize()} by {brand}{details}Product Code: {rng.randint(10**8, 10**9)}"},
+        {"Brand": f"{brand} is all about {rng.choice(DETAILS)} and everyday essentials. " * rng.randint(2, 6)},
+        {"Size & Fit": f"Model's height: {rng.randint(165, 190)}cm/5'{rng.randint(5, 11)}\"Model is wearing: UK S"},
+        {"Look After Me": "Machine wash according to instructions on care label"},
+        {"About Me": f"Soft-touch fabricMain: {rng.randint(50, 100)}% Cotton."},
+    ]
+    return repr(sections)
+
+
+def _image(rng: np.random.Generator, color_index: int) -> Image.Image:
+    # Nền màu + nhiễu: JPEG có kích thước / độ khó decode gần với ảnh thật hơn ảnh màu trơn
+    base = np.array([(color_index * 53) % 256, (color_index * 97) % 256, (color_index * 151) % 256], dtype=np.int16)
+    noise = rng.integers(-40, 40, (IMAGE_SIZE[1] // 8, IMAGE_SIZE[0] // 8, 3), dtype=np.int16)
+    small = np.clip(base + noise, 0, 255).astype(np.uint8)
+    return Image.fromarray(small).resize(IMAGE_SIZE, Image.BILINEAR)
+
+
+def generate_catalog(output_dir: str, num_products: int = 2000, image_ratio: float = 1.0, seed: int = 0):
+    """
+    Tạo catalogue giả cùng định dạng data/asos_products.csv + ảnh {sku}.jpg, dùng cho benchmark.
+    Trả về (đường dẫn CSV, thư mục ảnh).
+    """
+    rng = random.Random(seed)
+    np_rng = np.random.default_rng(seed)
+    images_dir = os.path.join(output_dir, "images")
+    os.makedirs(images_dir, exist_ok=True)
+    csv_path = os.path.join(output_dir, "asos_products.csv")
+
+    print(f"[INFO] Generating synthetic catalogue: {num_products} products, {image_ratio:.0%} with images...")
+    with open(csv_path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(["sku", "brand", "name", "color", "price", "in_stock_size", "out_stock_size", "description", "images"])
+        for i in range(num_products):
+            sku = 100000000 + i
+            brand, color, garment = rng.choice(BRANDS), rng.choice(COLORS), rng.choice(GARMENTS)
+            sizes = rng.sample(SIZES, rng.randint(1, 5))
+            writer.writerow([
+                sku, brand, f"{brand} {rng.choice(DETAILS)} {garment} in {color.lower()}", color,
+                round(rng.uniform(5, 250), 2), repr(sizes[1:]), repr(sizes[:1]),
+                _description(rng, brand, garment), repr([f"https://images.example.com/{sku}-1.jpg"]),
+            ])
+            if rng.random() < image_ratio:
+                _image(np_rng, COLORS.index(color)).save(os.path.join(images_dir, f"{sku}.jpg"), quality=85)
+    return csv_path, images_dir
+
+
+def query_texts(count: int = 500, seed: int = 1):
+    """Query text kiểu người dùng gõ (có lặp lại, giống traffic thật)"""
+    rng = random.Random(seed)
+    return [f"{rng.choice(COLORS).lower()} {rng.choice(DETAILS)} {rng.choice(GARMENTS)}" for _ in range(count)]
+
+
+def query_images(count: int = 20, seed: int = 2):
+    """Ảnh query (JPEG bytes) cho /search"""
+    np_rng = np.random.default_rng(seed)
+    images = []
+    for i in range(count):
+        buffer = io.BytesIO()
+        _image(np_rng, i).save(buffer, format="JPEG", quality=85)
+        images.append(buffer.getvalue())
+    return images
@@ -0,0 +1,31 @@
+import time
+from typing import Callable, Dict, List
+import numpy as np
+
+
+def summarize(samples: List[float]) -> Dict:
+    """Thời gian (giây) của từng lần đo -> thống kê theo ms"""
+    if not samples:
+        return {"count": 0}
+    ms = np.asarray(samples, dtype=np.float64) * 1000
+    return {
+        "count": int(ms.size),
+        "mean_ms": round(float(ms.mean()), 3),
+        "p50_ms": round(float(np.percentile(ms, 50)), 3),
+        "p95_ms": round(float(np.percentile(ms, 95)), 3),
+        "p99_ms": round(float(np.percentile(ms, 99)), 3),
+        "min_ms": round(float(ms.min()), 3),
+        "max_ms": round(float(ms.max()), 3),
+    }
+
+
+def measure(fn: Callable[[], object], repeat: int = 20, warmup: int = 2) -> Dict:
+    """Gọi fn() warmup lần (không tính) rồi repeat lần, trả về thống kê thời gian mỗi lần gọi"""
+    for _ in range(warmup):
+        fn()
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    return summarize(samples)
@@ -0,0 +1,13 @@
+from vectordb.neighbor_table import build_neighbor_table, DEFAULT_NEIGHBORS_DIR, DEFAULT_NEIGHBOR_K
+import argparse
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Tính sẵn bảng neighbor (ảnh / text / fused) cho /preference")
+    parser.add_argument("--output", default=DEFAULT_NEIGHBORS_DIR)
+    parser.add_argument("-k", type=int, default=DEFAULT_NEIGHBOR_K, help="Số neighbor lưu cho mỗi SKU")
+    parser.add_argument("--block-size", type=int, default=None,
+                        help="Số SKU mỗi block nhân ma trận (mặc định tự chọn theo RAM)")
+    args = parser.parse_args()
+
+    # Đọc vector từ vector store hiện tại (QDRANT_URL / VECTOR_BACKEND / QDRANT_LAYOUT như lúc ingest)
+    build_neighbor_table(path=args.output, k=args.k, block_size=args.block_size)
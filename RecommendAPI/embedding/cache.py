@@ -0,0 +1,190 @@
+import hashlib
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+import numpy as np
+
+DEFAULT_CACHE_DIR = os.path.join("data", "embedding_cache")
+KEY_SIZE = 20  # sha1 digest
+# Ingest ghi lại file này mỗi khi index thay đổi, các cache kết quả phía API dựa vào nó để tự xoá
+INDEX_VERSION_PATH = os.path.join("data", "index_version")
+
+
+def mark_index_updated(path: str = INDEX_VERSION_PATH):
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(str(time.time_ns()))
+    os.replace(tmp_path, path)
+
+
+def read_index_version(path: str = INDEX_VERSION_PATH):
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return f.read().strip()
+    except FileNotFoundError:
+        return None
+
+
+class EmbeddingCache:
+    """
+    Cache embedding trên đĩa, key = (tên model, hash nội dung input).
+    Mỗi model có 1 file append-only gồm các record (key 20 byte + vector float32), đọc bằng np.memmap.
+    Phía trước có 1 LRU trong RAM cho các key hay dùng. Dùng chung được giữa ingest và API (nhiều process).
+    refresh_on_miss=False: miss không đọc lại file (tránh quét record mới trên đường request),
+    record do process khác ghi thêm chỉ thấy được sau khi gọi refresh() (vd. định kỳ trên thread nền).
+    """
+
+    def __init__(self, model_name: str, dim: int = 512, cache_dir: str = DEFAULT_CACHE_DIR, lru_size: int = 4096,
+                 refresh_on_miss: bool = True):
+        self.model_name = model_name
+        self.dim = dim
+        self.lru_size = lru_size
+        self.refresh_on_miss = refresh_on_miss
+        self._dtype = np.dtype([("key", f"V{KEY_SIZE}"), ("vector", "<f4", (dim,))])
+
+        model_dir = os.path.join(cache_dir, re.sub(r"[^A-Za-z0-9_.-]", "_", model_name))
+        os.makedirs(model_dir, exist_ok=True)
+        self.path = os.path.join(model_dir, f"vectors_{dim}.bin")
+
+        self._lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+        self._lru = OrderedDict()
+        self._index = {}
+        self._mmap = None
+        self._rows = 0
+        self.hits = 0
+        self.misses = 0
+        self.refresh()
+
+    # --- Key ---
+    @staticmethod
+    def text_key(text: str) -> bytes:
+        return hashlib.sha1(b"text:" + text.encode("utf-8")).digest()
+
+    @staticmethod
+    def image_key(data: bytes) -> bytes:
+        return hashlib.sha1(b"image:" + data).digest()
+
+    # --- Đọc / ghi ---
+    def _scan(self, start: int):
+        """Đọc các record từ dòng start tới cuối file -> (mmap, số dòng, {key: row} của các record mới)"""
+        size = os.path.getsize(self.path) if os.path.exists(self.path) else 0
+        rows = size // self._dtype.itemsize
+        if rows <= start:
+            return None, start, {}
+        mmap = np.memmap(self.path, dtype=self._dtype, mode="r", shape=(rows,))
+        raw = mmap["key"][start:rows].tobytes()
+        return mmap, rows, {raw[i:i + KEY_SIZE]: start + j for j, i in enumerate(range(0, len(raw), KEY_SIZE))}
+
+    def _apply_scan(self, start, mmap, rows, new_index):
+        # Process này vừa tự ghi thêm (put_many) trong lúc quét -> phần đó đã được index rồi
+        if mmap is None or self._rows != start:
+            return
+        self._index.update(new_index)
+        self._mmap = mmap
+        self._rows = rows
+
+    def _refresh(self):
+        """Map lại file nếu có record mới (do process này hoặc process khác ghi thêm); gọi khi đang giữ _lock"""
+        start = self._rows
+        self._apply_scan(start, *self._scan(start))
+
+    def refresh(self):
+        """Như _refresh nhưng quét file ngoài _lock: get() ở thread khác không bị chặn trong lúc quét"""
+        with self._refresh_lock:
+            start = self._rows
+            scanned = self._scan(start)
+            with self._lock:
+                self._apply_scan(start, *scanned)
+
+    def _remember(self, key, vector):
+        self._lru[key] = vector
+        self._lru.move_to_end(key)
+        if len(self._lru) > self.lru_size:
+            self._lru.popitem(last=False)
+
+    def _lookup(self, key):
+        vector = self._lru.get(key)
+        if vector is not None:
+            self._lru.move_to_end(key)
+            return vector
+        row = self._index.get(key)
+        if row is None and self.refresh_on_miss:
+            self._refresh()
+            row = self._index.get(key)
+        if row is None:
+            return None
+        vector = np.array(self._mmap[row]["vector"], dtype=np.float32)
+        self._remember(key, vector)
+        return vector
+
+    def contains(self, key: bytes) -> bool:
+        with self._lock:
+            if key in self._lru or key in self._index:
+                return True
+            if self.refresh_on_miss:
+                self._refresh()
+            return key in self._index
+
+    def get(self, key: bytes):
+        with self._lock:
+            vector = self._lookup(key)
+            if vector is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+            return vector
+
+    def put_many(self, keys, vectors):
+        vectors = np.asarray(vectors, dtype="<f4").reshape(len(keys), self.dim)
+        with self._lock:
+            records = np.zeros(len(keys), dtype=self._dtype)
+            new_rows = []
+            # _index chỉ được cập nhật sau khi ghi -> key lặp lại trong cùng 1 lần gọi chỉ ghi 1 record
+            added = set()
+            for i, key in enumerate(keys):
+                self._remember(key, vectors[i].copy())
+                if key not in self._index and key not in added:
+                    added.add(key)
+                    records["key"][i] = np.frombuffer(key, dtype=f"V{KEY_SIZE}")[0]
+                    records["vector"][i] = vectors[i]
+                    new_rows.append(i)
+            if not new_rows:
+                return
+            # 1 lần write với O_APPEND -> các process ghi đồng thời không chèn lẫn vào record của nhau
+            fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+            try:
+                os.write(fd, records[new_rows].tobytes())
+            finally:
+                os.close(fd)
+            self._refresh()
+
+    def put(self, key: bytes, vector):
+        self.put_many([key], [vector])
+
+    def get_or_encode_many(self, keys, encode_missing):
+        """
+        Lấy vector cho từng key, các key chưa có thì gọi encode_missing(list index) 1 lần duy nhất
+        cho cả nhóm rồi ghi vào cache.
+        """
+        out = np.empty((len(keys), self.dim), dtype=np.float32)
+        missing = []
+        for i, key in enumerate(keys):
+            vector = self.get(key)
+            if vector is None:
+                missing.append(i)
+            else:
+                out[i] = vector
+        if missing:
+            vectors = np.asarray(encode_missing(missing), dtype=np.float32).reshape(len(missing), self.dim)
+            out[missing] = vectors
+            self.put_many([keys[i] for i in missing], vectors)
+        return out
+
+    def get_or_encode(self, key: bytes, encode):
+        return self.get_or_encode_many([key], lambda _: [encode()])[0]
+
+    def stats(self):
+        return {"rows": self._rows, "lru": len(self._lru), "hits": self.hits, "misses": self.misses}
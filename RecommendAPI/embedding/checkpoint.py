@@ -0,0 +1,142 @@
+import json
+import os
+import threading
+import time
+
+# Checkpoint của ingest song song (mỗi shard 1 file) và file dead-letter (JSON Lines) ghi các dòng / ảnh lỗi
+DEFAULT_CHECKPOINT_DIR = os.path.join("data", "ingest_checkpoints")
+DEFAULT_DEAD_LETTER_PATH = os.path.join("data", "ingest_dead_letter.jsonl")
+
+
+def _write_json(path, data):
+    # Ghi ra file tạm rồi replace để process chết giữa chừng không làm hỏng file cũ
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(data, f)
+    os.replace(tmp_path, path)
+
+
+def _read_json(path):
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return None
+
+
+class ShardCheckpoint:
+    """
+    Tiến độ của 1 shard = các dòng [start, stop) của catalogue. next_row là dòng đầu tiên chưa được upsert xong,
+    chỉ được ghi lại sau khi cả batch đã upsert thành công -> chạy lại thì tiếp tục từ next_row.
+    """
+
+    def __init__(self, path: str, start: int, stop: int):
+        self.path = path
+        self.start = start
+        self.stop = stop
+        state = _read_json(path) or {}
+        if state.get("start") == start and state.get("stop") == stop:
+            self.next_row = state["next_row"]
+            self.products = state.get("products", 0)
+            self.images = state.get("images", 0)
+        else:
+            self.next_row, self.products, self.images = start, 0, 0
+
+    @property
+    def done(self) -> bool:
+        return self.next_row >= self.stop
+
+    def commit(self, next_row: int, products: int = 0, images: int = 0):
+        self.next_row = max(self.next_row, next_row)
+        self.products += products
+        self.images += images
+        _write_json(self.path, {
+            "start": self.start, "stop": self.stop, "next_row": self.next_row,
+            "products": self.products, "images": self.images, "updated_at": time.time(),
+        })
+
+
+class IngestCheckpoint:
+    """
+    Thư mục checkpoint của 1 lần rebuild: run.json ghi nguồn + cách chia shard, shard_<i>.json ghi tiến độ.
+    Catalogue hoặc số shard thay đổi thì checkpoint cũ không còn đúng -> bắt đầu lại từ đầu.
+    """
+
+    def __init__(self, directory: str, source: str, total_rows: int, num_shards: int, layout: str):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        st = os.stat(source)
+        self.run = {
+            "source": os.path.abspath(source), "source_mtime": st.st_mtime, "source_size": st.st_size,
+            "rows": total_rows, "num_shards": num_shards, "layout": layout,
+        }
+        run_path = os.path.join(directory, "run.json")
+        self.resumed = _read_json(run_path) == self.run
+        if not self.resumed:
+            self.clear()
+            _write_json(run_path, self.run)
+        self.shards = []
+        per_shard = -(-total_rows // num_shards) if total_rows else 0
+        for i in range(num_shards):
+            start, stop = min(i * per_shard, total_rows), min((i + 1) * per_shard, total_rows)
+            self.shards.append((i, start, stop))
+
+    def shard_path(self, index: int) -> str:
+        return os.path.join(self.directory, f"shard_{index}.json")
+
+    def shard(self, index: int) -> ShardCheckpoint:
+        _, start, stop = self.shards[index]
+        return ShardCheckpoint(self.shard_path(index), start, stop)
+
+    def pending_shards(self):
+        return [i for i, _, _ in self.shards if not self.shard(i).done]
+
+    def totals(self):
+        shards = [self.shard(i) for i, _, _ in self.shards]
+        return {"products": sum(s.products for s in shards), "images": sum(s.images for s in shards)}
+
+    def clear(self):
+        for name in os.listdir(self.directory):
+            if name.endswith((".json", ".tmp")):
+                os.remove(os.path.join(self.directory, name))
+
+
+class DeadLetterLog:
+    """
+    Ghi dòng catalogue / ảnh bị lỗi ra file JSON Lines (1 object/dòng: stage, row, sku, error...).
+    Record được giữ lại đến khi dòng của nó nằm trong phần đã checkpoint (flush), nên chạy lại từ checkpoint
+    không ghi trùng. Mỗi lần flush là 1 write với O_APPEND -> nhiều process ghi chung 1 file không chèn lẫn nhau.
+    """
+
+    def __init__(self, path: str = DEFAULT_DEAD_LETTER_PATH, shard: int = None):
+        self.path = path
+        self.shard = shard
+        self.count = 0
+        self._pending = []
+        self._lock = threading.Lock()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    def write(self, stage: str, error, row: int = None, **info):
+        record = {"stage": stage, "error": str(error), "row": row, "shard": self.shard, "time": time.time(), **info}
+        with self._lock:
+            self._pending.append(record)
+
+    def flush(self, upto_row: int = None):
+        """Ghi các record của dòng < upto_row (None: ghi hết)"""
+        ready, kept = [], []
+        with self._lock:
+            for record in self._pending:
+                row = record["row"]
+                (ready if upto_row is None or row is None or row < upto_row else kept).append(record)
+            self._pending = kept
+        if not ready:
+            return
+        data = "".join(json.dumps(r, ensure_ascii=False, default=str) + "\n" for r in ready).encode("utf-8")
+        fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        try:
+            os.write(fd, data)
+        finally:
+            os.close(fd)
+        self.count += len(ready)
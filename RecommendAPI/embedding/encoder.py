@@ -0,0 +1,213 @@
+import os
+import threading
+import time
+import numpy as np
+
+CLIP_MODEL_NAME = 'clip-ViT-B-32'
+# Model 'clip-ViT-B-32' của sentence-transformers trên HF Hub, weight CLIP gốc (cả 2 tower) nằm trong 0_CLIPModel
+CLIP_HF_REPO = "sentence-transformers/clip-ViT-B-32"
+CLIP_HF_SUBFOLDER = "0_CLIPModel"
+CLIP_MAX_TOKENS = 77
+CLIP_DIM = 512
+# CLIP ViT-B/32 nhận ảnh 224x224, resize sẵn trên worker để model không phải xử lý ảnh full-size
+CLIP_IMAGE_SIZE = 224
+TOWERS = ("text", "image")
+
+# Backend inference: "torch" (mặc định) hoặc "onnx" (ONNX Runtime, model export bằng export_onnx.py)
+CLIP_BACKEND = os.getenv("CLIP_BACKEND", "torch").lower()
+CLIP_ONNX_DIR = os.getenv("CLIP_ONNX_DIR", os.path.join("data", "clip_onnx"))
+# "int8" = weight quantize dynamic (nhỏ hơn ~4 lần, nhanh hơn trên CPU), "fp32" = giữ nguyên độ chính xác
+CLIP_ONNX_PRECISION = os.getenv("CLIP_ONNX_PRECISION", "int8").lower()
+# Số thread intra-op của ONNX Runtime cho 1 forward pass, 0 = để ORT tự chọn (số core vật lý)
+ORT_INTRA_OP_THREADS = int(os.getenv("ORT_INTRA_OP_THREADS", "0"))
+
+
+def onnx_model_path(onnx_dir: str, kind: str, precision: str) -> str:
+    return os.path.join(onnx_dir, f"{kind}_{precision}.onnx")
+
+
+def _device():
+    import torch
+    return "cuda" if torch.cuda.is_available() else "cpu"
+
+
+class _TextTower:
+    """Chỉ text encoder + projection của CLIP (không load vision tower)"""
+
+    def __init__(self, repo: str, subfolder: str):
+        import torch
+        from transformers import CLIPTextModelWithProjection, CLIPTokenizer
+        self._torch = torch
+        self.device = _device()
+        self.tokenizer = CLIPTokenizer.from_pretrained(repo, subfolder=subfolder)
+        self.model = CLIPTextModelWithProjection.from_pretrained(repo, subfolder=subfolder).to(self.device).eval()
+
+    def encode(self, texts):
+        inputs = self.tokenizer(
+            list(texts), padding=True, truncation=True, max_length=CLIP_MAX_TOKENS, return_tensors="pt"
+        ).to(self.device)
+        with self._torch.inference_mode():
+            return self.model(**inputs).text_embeds.float().cpu().numpy()
+
+
+class _ImageTower:
+    """Chỉ vision encoder + projection của CLIP (không load text tower)"""
+
+    def __init__(self, repo: str, subfolder: str):
+        import torch
+        from transformers import CLIPImageProcessor, CLIPVisionModelWithProjection
+        self._torch = torch
+        self.device = _device()
+        self.processor = CLIPImageProcessor.from_pretrained(repo, subfolder=subfolder)
+        self.model = CLIPVisionModelWithProjection.from_pretrained(repo, subfolder=subfolder).to(self.device).eval()
+
+    def encode(self, images):
+        pixel_values = self.processor(images=list(images), return_tensors="pt")["pixel_values"].to(self.device)
+        with self._torch.inference_mode():
+            return self.model(pixel_values=pixel_values).image_embeds.float().cpu().numpy()
+
+
+class _OnnxTower:
+    """1 tower CLIP đã export ra ONNX, chạy trên ONNX Runtime (CPU)"""
+
+    def __init__(self, onnx_dir: str, kind: str, precision: str, intra_op_threads: int):
+        import onnxruntime as ort
+        path = onnx_model_path(onnx_dir, kind, precision)
+        if not os.path.exists(path):
+            raise FileNotFoundError(f"{path} not found, run export_onnx.py first")
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if intra_op_threads > 0:
+            options.intra_op_num_threads = intra_op_threads
+        self.session = ort.InferenceSession(path, options, providers=["CPUExecutionProvider"])
+
+
+class _OnnxTextTower(_OnnxTower):
+    def __init__(self, onnx_dir: str, precision: str, intra_op_threads: int):
+        super().__init__(onnx_dir, "text", precision, intra_op_threads)
+        from transformers import CLIPTokenizer
+        # Tokenizer được lưu cùng model lúc export, không cần tải từ Hub
+        self.tokenizer = CLIPTokenizer.from_pretrained(onnx_dir)
+
+    def encode(self, texts):
+        inputs = self.tokenizer(
+            list(texts), padding=True, truncation=True, max_length=CLIP_MAX_TOKENS, return_tensors="np"
+        )
+        feed = {"input_ids": inputs["input_ids"].astype(np.int64),
+                "attention_mask": inputs["attention_mask"].astype(np.int64)}
+        return self.session.run(None, feed)[0].astype(np.float32)
+
+
+class _OnnxImageTower(_OnnxTower):
+    def __init__(self, onnx_dir: str, precision: str, intra_op_threads: int):
+        super().__init__(onnx_dir, "image", precision, intra_op_threads)
+        from transformers import CLIPImageProcessor
+        self.processor = CLIPImageProcessor.from_pretrained(onnx_dir)
+
+    def encode(self, images):
+        pixel_values = self.processor(images=list(images), return_tensors="np")["pixel_values"]
+        return self.session.run(None, {"pixel_values": pixel_values.astype(np.float32)})[0].astype(np.float32)
+
+
+class _FullModelTower:
+    """Không tách được tower (vd. thiếu transformers, không tải được từ Hub) -> dùng cả SentenceTransformer"""
+
+    def __init__(self, model):
+        self.model = model
+
+    def encode(self, inputs):
+        return np.asarray(self.model.encode(list(inputs), batch_size=len(inputs)), dtype=np.float32)
+
+    @property
+    def tokenizer(self):
+        # Module CLIP của sentence-transformers trả về CLIPProcessor, tokenizer nằm bên trong
+        tokenizer = getattr(self.model, "tokenizer", None)
+        return getattr(tokenizer, "tokenizer", tokenizer)
+
+
+class LazyClipEncoder:
+    """
+    Thay cho SentenceTransformer(CLIP_MODEL_NAME) ở API và ingest: encode() giống SentenceTransformer.encode, nhưng
+    text tower và vision tower được load riêng, mỗi tower chỉ load lần đầu có input loại đó (hoặc khi gọi load()).
+    Vector ra giống hệt SentenceTransformer (text_embeds / image_embeds của CLIP, chưa chuẩn hoá).
+
+    backend="onnx": chạy model đã export (export_onnx.py) trên ONNX Runtime, vector lệch so với torch trong
+    ngưỡng cosine đã kiểm tra lúc export (int8 lệch nhiều hơn fp32).
+    """
+
+    def __init__(self, model_name: str = CLIP_MODEL_NAME, hf_repo: str = CLIP_HF_REPO,
+                 hf_subfolder: str = CLIP_HF_SUBFOLDER, backend: str = CLIP_BACKEND, onnx_dir: str = CLIP_ONNX_DIR,
+                 onnx_precision: str = CLIP_ONNX_PRECISION, intra_op_threads: int = ORT_INTRA_OP_THREADS):
+        if backend not in ("torch", "onnx"):
+            raise ValueError(f"Unknown CLIP backend: {backend} (expected 'torch' or 'onnx')")
+        self.model_name = model_name
+        self.hf_repo = hf_repo
+        self.hf_subfolder = hf_subfolder
+        self.backend = backend
+        self.onnx_dir = onnx_dir
+        self.onnx_precision = onnx_precision
+        self.intra_op_threads = intra_op_threads
+        self._towers = {}
+        self._locks = {kind: threading.Lock() for kind in TOWERS}
+        self._full_model = None
+        self._full_lock = threading.Lock()
+        self.load_seconds = {}
+
+    def _load_full_model(self):
+        with self._full_lock:
+            if self._full_model is None:
+                from sentence_transformers import SentenceTransformer
+                self._full_model = SentenceTransformer(self.model_name)
+            return self._full_model
+
+    @property
+    def cache_name(self) -> str:
+        """Tên dùng cho EmbeddingCache: vector int8 không dùng lẫn cache với vector fp32"""
+        if self.backend == "onnx" and self.onnx_precision != "fp32":
+            return f"{self.model_name}-onnx-{self.onnx_precision}"
+        return self.model_name
+
+    def is_loaded(self, kind: str) -> bool:
+        return kind in self._towers
+
+    def load(self, kind: str):
+        """Load tower `kind` ("text" / "image") nếu chưa có. Thread-safe, nhiều thread gọi cùng lúc chỉ load 1 lần"""
+        tower = self._towers.get(kind)
+        if tower is not None:
+            return tower
+        with self._locks[kind]:
+            if kind in self._towers:
+                return self._towers[kind]
+            start = time.perf_counter()
+            if self.backend == "onnx":
+                # Không quay về torch: backend đã chọn mà thiếu model thì báo lỗi luôn
+                tower_cls = _OnnxTextTower if kind == "text" else _OnnxImageTower
+                tower = tower_cls(self.onnx_dir, self.onnx_precision, self.intra_op_threads)
+            else:
+                try:
+                    tower_cls = _TextTower if kind == "text" else _ImageTower
+                    tower = tower_cls(self.hf_repo, self.hf_subfolder)
+                except (ImportError, OSError, ValueError) as e:
+                    print(f"[WARN] Could not load CLIP {kind} tower on its own ({e}), using the full model")
+                    tower = _FullModelTower(self._load_full_model())
+            self.load_seconds[kind] = round(time.perf_counter() - start, 3)
+            print(f"[INFO] Loaded CLIP {kind} tower ({self.backend}) in {self.load_seconds[kind]}s")
+            self._towers[kind] = tower
+            return tower
+
+    @property
+    def tokenizer(self):
+        """Tokenizer của text tower (load text tower nếu chưa có), None nếu backend không có"""
+        return getattr(self.load("text"), "tokenizer", None)
+
+    def encode(self, inputs, batch_size: int = 32, **_):
+        """1 input -> 1 vector, list input (toàn text hoặc toàn ảnh) -> ma trận"""
+        single = isinstance(inputs, str) or not isinstance(inputs, (list, tuple))
+        items = [inputs] if single else list(inputs)
+        if not items:
+            return np.zeros((0, CLIP_DIM), dtype=np.float32)
+        tower = self.load("text" if isinstance(items[0], str) else "image")
+        vectors = np.concatenate([
+            tower.encode(items[i:i + batch_size]) for i in range(0, len(items), max(batch_size, 1))
+        ])
+        return vectors[0] if single else vectors
@@ -1,114 +1,585 @@
 import pandas as pd
 import os
+import time
+import json
+import hashlib
+import io
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from PIL import Image
-from sentence_transformers import SentenceTransformer
-from vectordb.qdrant_client_handler import QdrantHandler
+from vectordb.qdrant_client_handler import (
+    create_handler, QDRANT_LAYOUT, PRODUCTS_COLLECTION, PRODUCT_VECTORS, PRODUCT_PAYLOAD_INDEXES, normalize_keyword
+)
+from vectordb.bulk_upload import BulkUploader
+from embedding.cache import EmbeddingCache, mark_index_updated
+from embedding.checkpoint import DeadLetterLog, DEFAULT_DEAD_LETTER_PATH
+from embedding.encoder import LazyClipEncoder, CLIP_IMAGE_SIZE, CLIP_BACKEND, ORT_INTRA_OP_THREADS
+from embedding.preprocess import description_text, load_catalog, parse_list_cell
+from embedding.text_prep import TextPreparer, product_text
 from qdrant_client.http import models
-import ast
+
+CLIP_MODEL_NAME = 'clip-ViT-B-32'
+
+
+# Manifest lưu fingerprint (text + ảnh) của từng SKU đã ingest, dùng cho incremental ingest
+DEFAULT_MANIFEST_PATH = os.path.join("data", "ingest_manifest.json")
+
+
+def open_collections(layout: str = QDRANT_LAYOUT):
+    """Tạo (nếu chưa có) và mở các collection của layout -> {tên thuộc tính: handler}"""
+    if layout == "named":
+        # 1 collection, mỗi point có 2 named vector text/image + payload dùng chung -> upsert 1 lần/sản phẩm
+        return {"products_db": create_handler(
+            collection_name=PRODUCTS_COLLECTION, vector_size=512,
+            vector_names=PRODUCT_VECTORS, payload_indexes=PRODUCT_PAYLOAD_INDEXES
+        )}
+    return {
+        "text_db": create_handler(
+            collection_name="products_text", vector_size=512, payload_indexes=PRODUCT_PAYLOAD_INDEXES
+        ),
+        "image_db": create_handler(
+            collection_name="products_image", vector_size=512, payload_indexes=PRODUCT_PAYLOAD_INDEXES
+        ),
+    }
+
 
 class DataIngestion:
-    def __init__(self, csv_path: str, images_folder: str):
-        print(f"[INFO] Reading CSV from {csv_path}...")
-        self.df = pd.read_csv(csv_path)
-        self.df['sku'] = self.df['sku'].astype(str)
+    def __init__(self, csv_path: str, images_folder: str, use_cache: bool = True, layout: str = QDRANT_LAYOUT,
+                 streaming: bool = False, encoder_backend: str = CLIP_BACKEND,
+                 intra_op_threads: int = ORT_INTRA_OP_THREADS, dead_letter_path: str = DEFAULT_DEAD_LETTER_PATH):
+        self.csv_path = csv_path
+        if streaming:
+            # Không load cả file, process_and_ingest_streaming đọc dần từng chunk
+            self.df = None
+        else:
+            print(f"[INFO] Reading catalogue from {csv_path}...")
+            self.df = load_catalog(csv_path)
+            self.df['sku'] = self.df['sku'].astype(str)
         self.images_folder = images_folder
         
         # --- CHỈ DÙNG 1 MODEL CLIP ---
-        # CLIP embed ra vector 512 chiều cho cả Text và Ảnh
-        print("[INFO] Loading CLIP Model (clip-ViT-B-32)...")
-        self.model = SentenceTransformer('clip-ViT-B-32')
+        # CLIP embed ra vector 512 chiều cho cả Text và Ảnh; backend "torch" hoặc "onnx" (CLIP_BACKEND)
+        print(f"[INFO] Loading CLIP Model ({CLIP_MODEL_NAME}, {encoder_backend})...")
+        self.model = LazyClipEncoder(CLIP_MODEL_NAME, backend=encoder_backend, intra_op_threads=intra_op_threads)
+        for kind in ("text", "image"):
+            self.model.load(kind)
+        # Text sản phẩm được chia theo token CLIP (TEXT_MAX_CHUNKS đoạn), vector các đoạn pool lại
+        self.text_prep = TextPreparer(self.model)
+
+        # Cache embedding trên đĩa (dùng chung với API): rebuild lại không phải encode lại input cũ
+        if use_cache and streaming:
+            # Index key -> dòng của cache nằm trong RAM (~127 MB / 1M key), tăng theo catalogue -> streaming không dùng cache
+            print("[INFO] Embedding cache disabled in streaming mode (RAM stays flat regardless of catalogue size)")
+            use_cache = False
+        self.cache = EmbeddingCache(model_name=self.model.cache_name, dim=512) if use_cache else None
         
         # Init DB (Cả 2 đều size 512)
-        self.text_db = QdrantHandler(collection_name="products_text", vector_size=512)
-        self.image_db = QdrantHandler(collection_name="products_image", vector_size=512)
+        self.layout = layout
+        for attr, handler in open_collections(layout).items():
+            setattr(self, attr, handler)
+
+        # Dòng / ảnh lỗi được ghi ra file JSON Lines (embedding/checkpoint.py) ở mọi chế độ ingest; None -> chỉ print
+        self.dead_letter = DeadLetterLog(dead_letter_path) if dead_letter_path else None
+        # BulkUploader của pipeline đang chạy: upsert được đẩy sang thread nền thay vì chờ trên thread encode
+        self.uploader = None
 
     def extract_clean_description(self, desc_col_data):
-        """Parse chuỗi json/list trong description thành text thuần"""
+        """Description (list dict đã parse sẵn, hoặc chuỗi literal khi đọc thẳng CSV) thành text thuần"""
+        return description_text(desc_col_data)
+
+    def extract_sizes(self, size_col_data):
+        """Parse chuỗi "[4, 6, 8]" / "['S', 'M']" thành list string (keyword index của Qdrant)"""
         try:
-            if pd.isna(desc_col_data): return ""
-            data_list = ast.literal_eval(str(desc_col_data))
-            text_parts = []
-            if isinstance(data_list, list):
-                for item in data_list:
-                    if isinstance(item, dict):
-                        text_parts.extend(item.values())
-            return ". ".join([str(t) for t in text_parts])
-        except:
-            return str(desc_col_data)
+            if size_col_data is None or pd.isna(size_col_data): return []
+        except (TypeError, ValueError):
+            pass
+        sizes = parse_list_cell(size_col_data)
+        if isinstance(sizes, str) and sizes.startswith("["):
+            # Chuỗi "[...]" không parse được
+            return []
+        if not isinstance(sizes, (list, tuple)):
+            sizes = [sizes]
+        return [str(s).strip() for s in sizes if str(s).strip() != ""]
 
     def process_and_ingest(self, batch_size=50):
+        """Giữ lại cho code cũ: chạy pipeline batch (ghi qua _upsert_vectors, đúng với cả layout "split" lẫn "named")"""
+        return self.process_and_ingest_batched(batch_size=batch_size)
+
+    def _build_record(self, row):
+        """Chuẩn hoá 1 dòng CSV thành record (id, payload, text, đường dẫn ảnh). Trả về None nếu SKU lỗi"""
+        sku = str(row['sku']).replace(".0", "")
+        try:
+            p_id = int(sku)
+        except Exception:
+            return None
+
+        brand = str(row['brand']) if not pd.isna(row['brand']) else ""
+        color = str(row['color']) if not pd.isna(row['color']) else ""
+        payload = {
+            "product_id": p_id,
+            "brand": brand,
+            "color": color,
+            # Bản chuẩn hoá (lowercase) để lọc không phân biệt hoa thường
+            "brand_norm": normalize_keyword(brand),
+            "color_norm": normalize_keyword(color),
+            "in_stock_size": self.extract_sizes(row.get('in_stock_size')),
+        }
+        price = pd.to_numeric(row.get('price'), errors="coerce")
+        if not pd.isna(price):
+            payload["price"] = float(price)
+
+        return {
+            "id": p_id,
+            "payload": payload,
+            "text": product_text(row),
+            "image_path": os.path.join(self.images_folder, f"{sku}.jpg"),
+        }
+
+    def _report_bad(self, stage, error, **info):
+        if self.dead_letter is not None:
+            self.dead_letter.write(stage, error, **info)
+
+    @staticmethod
+    def _iter_frame_rows(df, chunk_size=1024):
+        """Dòng của DataFrame dạng dict, chuyển từng đoạn chunk_size dòng thay vì cả catalogue 1 lần"""
+        for begin in range(0, len(df), chunk_size):
+            yield from df.iloc[begin:begin + chunk_size].to_dict(orient="records")
+
+    def _iter_record_batches(self, batch_size, rows=None, start=0):
+        """
+        Duyệt CSV (hoặc các dòng `rows` đọc dần từ file) theo từng batch record hợp lệ.
+        Mỗi record giữ số thứ tự dòng trong catalogue ("row", đếm từ start) để ghi checkpoint.
+        """
+        batch = []
+        rows = self._iter_frame_rows(self.df) if rows is None else rows
+        for index, row in enumerate(rows, start):
+            try:
+                record = self._build_record(row)
+            except Exception as e:
+                print(f"[ERR] Row {index}: {e}")
+                self._report_bad("row", e, row=index, sku=row.get('sku'))
+                continue
+            if record is None:
+                self._report_bad("row", "invalid sku", row=index, sku=row.get('sku'))
+                continue
+            record["row"] = index
+            batch.append(record)
+            if len(batch) >= batch_size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
+    @staticmethod
+    def _load_image(image_path, data=None, on_error=None):
+        """Decode + resize ảnh về cỡ input của CLIP (chạy trên worker thread)"""
+        if data is None and not os.path.exists(image_path):
+            return None
+        try:
+            img = Image.open(image_path if data is None else io.BytesIO(data))
+            # draft() cho phép JPEG decoder giảm độ phân giải ngay lúc decode
+            img.draft("RGB", (CLIP_IMAGE_SIZE, CLIP_IMAGE_SIZE))
+            img = img.convert("RGB")
+            # Giữ cạnh ngắn >= 224 để center-crop của CLIP cho kết quả như ảnh gốc
+            scale = CLIP_IMAGE_SIZE / min(img.size)
+            if scale < 1:
+                new_size = (max(CLIP_IMAGE_SIZE, round(img.width * scale)), max(CLIP_IMAGE_SIZE, round(img.height * scale)))
+                img = img.resize(new_size, Image.BICUBIC)
+            return img
+        except Exception as img_err:
+            print(f"[WARN] Corrupt image {image_path}: {img_err}")
+            if on_error is not None:
+                on_error(image_path, img_err)
+            return None
+
+    def _prepare_image(self, image_path, row=None):
+        """
+        Worker: trả về (cache key, ảnh đã decode).
+        Ảnh đã có trong cache thì bỏ qua bước decode -> (key, None). Ảnh thiếu/lỗi -> (None, None).
+        """
+        if not os.path.exists(image_path):
+            self._report_bad("image", "missing", row=row, image_path=image_path)
+            return None, None
+
+        def on_error(path, error):
+            self._report_bad("image", error, row=row, image_path=path)
+
+        if self.cache is None:
+            return None, self._load_image(image_path, on_error=on_error)
+        with open(image_path, "rb") as f:
+            data = f.read()
+        key = self.cache.image_key(data)
+        if self.cache.contains(key):
+            return key, None
+        img = self._load_image(image_path, data=data, on_error=on_error)
+        return (key, img) if img is not None else (None, None)
+
+    def _encode_texts(self, texts):
+        if self.cache is None:
+            return self.text_prep.encode(texts)
+        # Vector text đã pool phụ thuộc cấu hình chia đoạn -> đưa signature vào key
+        keys = [self.cache.text_key(f"{self.text_prep.signature}\n{t}") for t in texts]
+        return self.cache.get_or_encode_many(keys, lambda idx: self.text_prep.encode([texts[i] for i in idx]))
+
+    def _encode_images(self, items):
+        """items: list (cache key, ảnh). Chỉ các ảnh chưa có trong cache mới qua model"""
+        if self.cache is None:
+            return self.model.encode([img for _, img in items], batch_size=len(items))
+        return self.cache.get_or_encode_many(
+            [key for key, _ in items],
+            lambda idx: self.model.encode([items[i][1] for i in idx], batch_size=len(idx))
+        )
+
+    def _encode_and_upsert(self, records, image_futures, stats):
+        """Encode cả batch text và batch ảnh bằng 1 lần gọi model.encode mỗi loại, rồi upsert"""
+        texts = [r["text"] for r in records]
+        text_vectors = self._encode_texts(texts)
+
+        loaded = [f.result() for f in image_futures]
+        image_records = [(r, (key, img)) for r, (key, img) in zip(records, loaded) if key is not None or img is not None]
+        image_vectors = self._encode_images([item for _, item in image_records]) if image_records else []
+        for r, _ in image_records:
+            # Ảnh đã được encode (không thiếu / lỗi decode), incremental ingest dựa vào đây để ghi manifest
+            r["image_indexed"] = True
+
+        self._upsert_vectors(records, text_vectors, [r["id"] for r, _ in image_records], image_vectors)
+
+        stats["products"] += len(records)
+        stats["images"] += len(image_records)
+
+    def _upsert(self, handler, points):
+        if self.uploader is None:
+            handler.upsert_points(points)
+        else:
+            self.uploader.submit(handler, points)
+
+    def _upsert_vectors(self, records, text_vectors, image_ids, image_vectors):
+        if self.layout == "named":
+            image_by_id = dict(zip(image_ids, image_vectors))
+            points = []
+            for r, text_vec in zip(records, text_vectors):
+                vector = {"text": text_vec.tolist()}
+                if r["id"] in image_by_id:
+                    vector["image"] = image_by_id[r["id"]].tolist()
+                points.append(models.PointStruct(id=r["id"], vector=vector, payload=r["payload"]))
+            self._upsert(self.products_db, points)
+            return
+
+        self._upsert(self.text_db, [
+            models.PointStruct(id=r["id"], vector=vec.tolist(), payload=r["payload"])
+            for r, vec in zip(records, text_vectors)
+        ])
+        if image_ids:
+            payload_by_id = {r["id"]: r["payload"] for r in records}
+            self._upsert(self.image_db, [
+                models.PointStruct(id=p_id, vector=vec.tolist(), payload=payload_by_id[p_id])
+                for p_id, vec in zip(image_ids, image_vectors)
+            ])
+
+    def _delete_products(self, point_ids):
+        if self.layout == "named":
+            self.products_db.delete_points(point_ids)
+        else:
+            self.text_db.delete_points(point_ids)
+            self.image_db.delete_points(point_ids)
+
+    def _delete_images(self, point_ids):
+        if self.layout == "named":
+            self.products_db.delete_vectors(point_ids, ["image"])
+        else:
+            self.image_db.delete_points(point_ids)
+
+    def _handlers(self):
+        return [self.products_db] if self.layout == "named" else [self.text_db, self.image_db]
+
+    def _flush(self):
+        """Ghi xuống đĩa với backend có đệm (VECTOR_BACKEND=numpy), ghi nốt dead-letter và đánh dấu index đã thay đổi"""
+        for handler in self._handlers():
+            handler.flush()
+        if self.dead_letter is not None:
+            self.dead_letter.flush()
+        # Báo cho API biết index đã đổi -> xoá cache kết quả search
+        mark_index_updated()
+
+    @staticmethod
+    def _report_throughput(stats, elapsed):
+        """In thống kê tốc độ ingest"""
+        elapsed = max(elapsed, 1e-9)
+        stats["seconds"] = round(elapsed, 2)
+        stats["products_per_sec"] = round(stats["products"] / elapsed, 2)
+        stats["images_per_sec"] = round(stats["images"] / elapsed, 2)
+        print(f"[STATS] {stats['products']} products, {stats['images']} images in {stats['seconds']}s "
+              f"-> {stats['products_per_sec']} products/sec, {stats['images_per_sec']} images/sec")
+        return stats
+
+    def process_and_ingest_batched(self, batch_size=64, num_workers=4):
+        """
+        Ingest theo batch: mỗi batch chỉ gọi model.encode 1 lần cho text và 1 lần cho ảnh.
+        Ảnh của batch kế tiếp được decode trên thread pool trong lúc model đang encode batch hiện tại.
+        """
         total_rows = len(self.df)
-        print(f"[INFO] Start processing {total_rows} products (Local Images)...")
+        print(f"[INFO] Start batched processing {total_rows} products (batch={batch_size}, workers={num_workers})...")
 
-        text_batch = []
-        image_batch = []
-        success_img_count = 0
+        stats = self._run_bulk_load(self._iter_record_batches(batch_size), num_workers, total_rows)
+        self._flush()
+        print(f"[SUCCESS] Ingest Done! Processed Images: {stats['images']}/{total_rows}")
+        return stats
 
-        for index, row in self.df.iterrows():
+    def _iter_source_rows(self, chunk_size):
+        """Đọc catalogue theo từng chunk (CSV hoặc Parquet), chỉ giữ 1 chunk trong RAM"""
+        if self.csv_path.endswith((".parquet", ".pq")):
             try:
-                # 1. Lấy thông tin cơ bản
-                sku = str(row['sku']).replace(".0", "") # Xử lý nếu pandas đọc thành 12345.0
+                import pyarrow.parquet as pq
+            except ImportError:
+                raise ImportError("Streaming a Parquet catalogue requires pyarrow (pip install pyarrow)")
+            for batch in pq.ParquetFile(self.csv_path).iter_batches(batch_size=chunk_size):
+                for row in batch.to_pylist():
+                    row['sku'] = str(row['sku'])
+                    yield row
+        else:
+            for chunk in pd.read_csv(self.csv_path, chunksize=chunk_size, dtype={'sku': str}):
+                yield from chunk.to_dict(orient="records")
+
+    def _iter_streaming_batches(self, batch_size, chunk_size, max_pending_batches):
+        """
+        Đọc + parse catalogue trên 1 thread riêng, chuyển batch record sang pipeline qua queue có giới hạn:
+        khi encode / upsert chậm, queue đầy và thread đọc bị chặn lại (backpressure) -> RAM không tăng theo file.
+        """
+        batches = queue.Queue(maxsize=max_pending_batches)
+        stop = threading.Event()
+        done = object()
+
+        def put(item):
+            while not stop.is_set():
                 try:
-                    p_id = int(sku)
-                except:
-                    continue # Bỏ qua nếu SKU không phải số
-
-                brand = str(row['brand']) if not pd.isna(row['brand']) else ""
-                color = str(row['color']) if not pd.isna(row['color']) else ""
-                
-                payload = {
-                    "product_id": p_id,
-                    "brand": brand,
-                    "color": color
-                }
-
-                # --- 2. Xử lý TEXT (Dùng CLIP Text Encoder) ---
-                name = str(row['name']) if not pd.isna(row['name']) else ""
-                clean_desc = self.extract_clean_description(row['description'])
-                full_text = f"{name}. {clean_desc}"[:77] # CLIP giới hạn token text, cắt ngắn để tối ưu (hoặc để thư viện tự cắt)
-                
-                # Encode Text bằng CLIP
-                text_vector = self.model.encode(full_text).tolist()
-                text_batch.append(models.PointStruct(id=p_id, vector=text_vector, payload=payload))
-
-                # --- 3. Xử lý ẢNH (Đọc từ Local Folder) ---
-                # Giả định tên file ảnh là {sku}.jpg. Nếu file ảnh của bạn tên khác, hãy sửa dòng này.
-                image_path = os.path.join(self.images_folder, f"{sku}.jpg")
-                
-                if os.path.exists(image_path):
-                    try:
-                        img_obj = Image.open(image_path).convert("RGB")
-                        # Encode Ảnh bằng CLIP
-                        image_vector = self.model.encode(img_obj).tolist()
-                        
-                        image_batch.append(models.PointStruct(id=p_id, vector=image_vector, payload=payload))
-                        success_img_count += 1
-                    except Exception as img_err:
-                        print(f"[WARN] Corrupt image {image_path}: {img_err}")
-                else:
-                    # Uncomment dòng dưới nếu muốn debug xem ảnh nào thiếu
-                    # print(f"[MISSING] Image not found: {image_path}")
-                    pass
-
-                # --- 4. Upload Batch ---
-                if len(text_batch) >= batch_size:
-                    self.text_db.upsert_points(text_batch)
-                    text_batch = []
-
-                if len(image_batch) >= batch_size:
-                    self.image_db.upsert_points(image_batch)
-                    image_batch = []
-                    print(f"--> [Batch {index}] Image Count: {success_img_count}")
+                    batches.put(item, timeout=0.5)
+                    return True
+                except queue.Full:
+                    continue
+            return False
 
+        def produce():
+            try:
+                for batch in self._iter_record_batches(batch_size, self._iter_source_rows(chunk_size)):
+                    if not put(batch):
+                        return
+                put(done)
             except Exception as e:
-                print(f"[ERR] Row {index}: {e}")
-                continue
+                put(e)
 
-        # Upload phần dư
-        if text_batch: self.text_db.upsert_points(text_batch)
-        if image_batch: self.image_db.upsert_points(image_batch)
+        reader = threading.Thread(target=produce, name="ingest-reader", daemon=True)
+        reader.start()
+        try:
+            while True:
+                item = batches.get()
+                if item is done:
+                    return
+                if isinstance(item, Exception):
+                    raise item
+                yield item
+        finally:
+            # Pipeline dừng giữa chừng (lỗi / Ctrl+C) thì báo thread đọc dừng theo
+            stop.set()
+            reader.join(timeout=5)
+
+    def process_and_ingest_streaming(self, batch_size=64, num_workers=4, chunk_size=10000, max_pending_batches=4):
+        """
+        Ingest catalogue rất lớn với RAM cố định: đọc file theo chunk (CSV / Parquet), parse trên thread riêng,
+        tối đa max_pending_batches batch chờ encode. Dùng với DataIngestion(..., streaming=True) (không dùng cache embedding).
+        """
+        print(f"[INFO] Start streaming ingest from {self.csv_path} "
+              f"(chunk={chunk_size}, batch={batch_size}, workers={num_workers}, queue={max_pending_batches})...")
+
+        stats = self._run_bulk_load(
+            self._iter_streaming_batches(batch_size, chunk_size, max_pending_batches), num_workers, total=None
+        )
+        self._flush()
+        print(f"[SUCCESS] Streaming ingest done! Products: {stats['products']}, Images: {stats['images']}")
+        return stats
+
+    def _run_bulk_load(self, record_batches, num_workers, total):
+        """Full rebuild: tạm tắt build index của vector store trong lúc upload, build lại 1 lần ở cuối"""
+        for handler in self._handlers():
+            handler.begin_bulk_load()
+        try:
+            stats = self._run_pipeline(record_batches, num_workers, total)
+        except BaseException:
+            # Lỗi giữa chừng: vẫn bật lại index nhưng không chờ build xong
+            for handler in self._handlers():
+                try:
+                    handler.end_bulk_load(wait=False)
+                except Exception as e:
+                    print(f"[WARN] Could not re-enable indexing: {e}")
+            raise
+        for handler in self._handlers():
+            handler.end_bulk_load()
+        return stats
+
+    def _run_pipeline(self, record_batches, num_workers, total, on_commit=None):
+        """
+        Encode + upsert các batch record, decode ảnh của batch kế tiếp song song với lúc encode.
+        Upsert chạy trên các thread upload nền (BulkUploader) song song với lúc encode batch kế tiếp.
+        on_commit(records, số sản phẩm, số ảnh) được gọi sau khi 1 batch đã upload xong (dùng để ghi checkpoint).
+        """
+        stats = {"products": 0, "images": 0}
+        start = time.perf_counter()
+
+        def commit(records, futures):
+            products, images = stats["products"], stats["images"]
+            self._encode_and_upsert(records, futures, stats)
+            if on_commit is not None:
+                products, images = stats["products"] - products, stats["images"] - images
+                self.uploader.after_uploaded(lambda: on_commit(records, products, images))
+            elif self.dead_letter is not None:
+                # Không có checkpoint thì chạy lại là làm từ đầu, ghi dead-letter luôn sau mỗi batch
+                self.dead_letter.flush()
+
+        self.uploader = BulkUploader()
+        try:
+            with ThreadPoolExecutor(max_workers=num_workers) as pool:
+                pending = None
+                for records in record_batches:
+                    futures = [pool.submit(self._prepare_image, r["image_path"], r.get("row")) for r in records]
+                    if pending:
+                        commit(*pending)
+                        print(f"--> Products: {stats['products']}/{total if total is not None else '?'} | Images: {stats['images']}")
+                    pending = (records, futures)
+                if pending:
+                    commit(*pending)
+        finally:
+            # Chờ upload nốt các batch còn trong queue (lỗi upload được raise ở đây)
+            uploader, self.uploader = self.uploader, None
+            uploader.close()
+
+        return self._report_throughput(stats, time.perf_counter() - start)
+
+    def process_and_ingest_checkpointed(self, checkpoint, batch_size=64, num_workers=4):
+        """
+        Ingest các dòng [checkpoint.start, checkpoint.stop) của catalogue (1 shard), tiếp tục từ checkpoint.next_row.
+        Checkpoint được ghi sau mỗi batch đã upsert xong -> process chết giữa chừng chỉ phải làm lại batch dở.
+        """
+        begin = checkpoint.next_row
+        rows = self._iter_frame_rows(self.df.iloc[begin:checkpoint.stop])
+        print(f"[INFO] Ingesting rows {begin}-{checkpoint.stop} (shard {checkpoint.start}-{checkpoint.stop})...")
+
+        def on_commit(records, products, images):
+            next_row = records[-1]["row"] + 1
+            # Ghi dead-letter trước checkpoint: chết giữa 2 bước thì có thể trùng, nhưng không mất record lỗi
+            if self.dead_letter is not None:
+                self.dead_letter.flush(next_row)
+            checkpoint.commit(next_row, products, images)
+
+        stats = self._run_pipeline(
+            self._iter_record_batches(batch_size, rows, start=begin), num_workers, checkpoint.stop - begin,
+            on_commit=on_commit
+        )
+        # _flush() ghi nốt dead-letter: các dòng lỗi ở cuối shard không tạo ra record nào, vẫn tính là đã xử lý
+        self._flush()
+        checkpoint.commit(checkpoint.stop)
+        return stats
+
+    # --- Incremental ingest ---
+    def _text_fingerprint(self, record):
+        """Hash của text được embed (kèm cấu hình chia đoạn) + payload, đổi 1 trong các thứ đó thì phải upsert lại"""
+        raw = json.dumps([record["text"], self.text_prep.signature, record["payload"]], sort_keys=True, ensure_ascii=False)
+        return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+    @staticmethod
+    def _image_fingerprint(image_path, previous=None):
+        """mtime/size của file ảnh, chỉ đọc lại nội dung để hash khi mtime/size thay đổi"""
+        if not os.path.exists(image_path):
+            return None
+        st = os.stat(image_path)
+        if previous and previous.get("mtime") == st.st_mtime and previous.get("size") == st.st_size:
+            return previous
+        with open(image_path, "rb") as f:
+            digest = hashlib.sha1(f.read()).hexdigest()
+        return {"mtime": st.st_mtime, "size": st.st_size, "sha1": digest}
+
+    @staticmethod
+    def _load_manifest(manifest_path):
+        if not os.path.exists(manifest_path):
+            return {}
+        with open(manifest_path, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    @staticmethod
+    def _save_manifest(manifest, manifest_path):
+        # Ghi ra file tạm rồi replace để không bị hỏng manifest nếu process chết giữa chừng
+        tmp_path = f"{manifest_path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(manifest, f)
+        os.replace(tmp_path, manifest_path)
+
+    def process_and_ingest_incremental(self, manifest_path=DEFAULT_MANIFEST_PATH, batch_size=64, num_workers=4):
+        """
+        Chỉ embed lại các SKU mới hoặc bị thay đổi (text/payload hoặc file ảnh) so với manifest lần trước,
+        và xoá khỏi Qdrant các SKU không còn trong CSV.
+        """
+        old_manifest = self._load_manifest(manifest_path)
+        new_manifest = {}
+        seen_keys = set()
+        changed = []
+        fingerprints = {}
+        lost_image_ids = []
+
+        for batch in self._iter_record_batches(batch_size):
+            for record in batch:
+                key = str(record["id"])
+                seen_keys.add(key)
+                previous = old_manifest.get(key, {})
+                fingerprint = {
+                    "text": self._text_fingerprint(record),
+                    "image": self._image_fingerprint(record["image_path"], previous.get("image")),
+                }
 
-        print(f"[SUCCESS] Ingest Done! Processed Images: {success_img_count}/{total_rows}")
+                old_image = (previous.get("image") or {}).get("sha1")
+                new_image = (fingerprint["image"] or {}).get("sha1")
+                if previous.get("text") != fingerprint["text"] or old_image != new_image:
+                    changed.append(record)
+                    fingerprints[key] = fingerprint
+                    # Manifest chỉ được cập nhật sau khi record đã upsert xong (on_commit)
+                    if previous:
+                        new_manifest[key] = previous
+                else:
+                    new_manifest[key] = fingerprint
+
+        def on_commit(records, products, images):
+            for record in records:
+                key = str(record["id"])
+                fingerprint = dict(fingerprints[key])
+                if not record.get("image_indexed"):
+                    # Ảnh thiếu / lỗi decode: không ghi sha1 -> lần sau thử lại; vector ảnh cũ (nếu có) phải xoá
+                    fingerprint["image"] = None
+                    if (old_manifest.get(key, {}).get("image") or {}).get("sha1"):
+                        lost_image_ids.append(record["id"])
+                new_manifest[key] = fingerprint
+            if self.dead_letter is not None:
+                self.dead_letter.flush()
+
+        removed_ids = [int(k) for k in old_manifest if k not in seen_keys]
+        print(f"[INFO] Incremental ingest: {len(changed)} new/changed, {len(removed_ids)} removed, "
+              f"{len(seen_keys) - len(changed)} unchanged")
+
+        stats = self._run_pipeline(
+            (changed[i:i + batch_size] for i in range(0, len(changed), batch_size)), num_workers, len(changed),
+            on_commit=on_commit
+        )
+
+        if removed_ids:
+            self._delete_products(removed_ids)
+        if lost_image_ids:
+            self._delete_images(lost_image_ids)
+        self._flush()
+
+        self._save_manifest(new_manifest, manifest_path)
+        stats["removed"] = len(removed_ids)
+        # SKU bị đổi / xoá, để các job offline (vd. bảng neighbor) chỉ cập nhật phần liên quan
+        stats["changed_ids"] = [r["id"] for r in changed]
+        stats["removed_ids"] = removed_ids
+        print(f"[SUCCESS] Incremental ingest done! Upserted: {stats['products']}, Removed: {len(removed_ids)}")
+        return stats
 
 # Bản 2:
 # import pandas as pd
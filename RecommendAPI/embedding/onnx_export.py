@@ -0,0 +1,119 @@
+import os
+import numpy as np
+from PIL import Image
+from embedding.encoder import (
+    LazyClipEncoder, onnx_model_path, CLIP_HF_REPO, CLIP_HF_SUBFOLDER, CLIP_ONNX_DIR, CLIP_IMAGE_SIZE
+)
+
+ONNX_OPSET = 17
+# Ngưỡng cosine (nhỏ nhất trên các mẫu) giữa vector ONNX và vector torch
+PARITY_TOLERANCE = {"fp32": 0.9999, "int8": 0.99}
+PARITY_TEXTS = [
+    "red dress",
+    "ASOS DESIGN Curve borg aviator jacket in dark brown",
+    "men's slim fit black jeans with ripped knees",
+    "white leather trainers",
+    "floral print midi skirt with pleated hem and elasticated waist, perfect for summer",
+]
+
+
+def _parity_images(count: int = 4, seed: int = 0):
+    # Ảnh nhiễu + ảnh màu trơn: không cần file ảnh thật để so 2 backend
+    rng = np.random.default_rng(seed)
+    images = [Image.fromarray(rng.integers(0, 256, (CLIP_IMAGE_SIZE, CLIP_IMAGE_SIZE, 3), dtype=np.uint8))
+              for _ in range(count - 1)]
+    images.append(Image.new("RGB", (CLIP_IMAGE_SIZE, CLIP_IMAGE_SIZE), (180, 30, 40)))
+    return images
+
+
+def export_clip_onnx(output_dir: str = CLIP_ONNX_DIR, quantize: bool = True, hf_repo: str = CLIP_HF_REPO,
+                     hf_subfolder: str = CLIP_HF_SUBFOLDER, opset: int = ONNX_OPSET):
+    """
+    Export text tower và vision tower của CLIP ra {text,image}_fp32.onnx (batch / độ dài câu dynamic), kèm tokenizer
+    + image processor. quantize=True: thêm bản {text,image}_int8.onnx (quantize dynamic weight của MatMul / Gemm).
+    """
+    import torch
+    from transformers import (
+        CLIPTokenizer, CLIPImageProcessor, CLIPTextModelWithProjection, CLIPVisionModelWithProjection
+    )
+
+    class TextEmbeds(torch.nn.Module):
+        def __init__(self, model):
+            super().__init__()
+            self.model = model
+
+        def forward(self, input_ids, attention_mask):
+            return self.model(input_ids=input_ids, attention_mask=attention_mask).text_embeds
+
+    class ImageEmbeds(torch.nn.Module):
+        def __init__(self, model):
+            super().__init__()
+            self.model = model
+
+        def forward(self, pixel_values):
+            return self.model(pixel_values=pixel_values).image_embeds
+
+    os.makedirs(output_dir, exist_ok=True)
+    tokenizer = CLIPTokenizer.from_pretrained(hf_repo, subfolder=hf_subfolder)
+    processor = CLIPImageProcessor.from_pretrained(hf_repo, subfolder=hf_subfolder)
+    tokenizer.save_pretrained(output_dir)
+    processor.save_pretrained(output_dir)
+
+    print(f"[INFO] Exporting CLIP text tower to {output_dir}...")
+    text_model = TextEmbeds(CLIPTextModelWithProjection.from_pretrained(hf_repo, subfolder=hf_subfolder).eval())
+    sample = tokenizer(["a photo of a dress", "jeans"], padding=True, return_tensors="pt")
+    with torch.inference_mode():
+        torch.onnx.export(
+            text_model, (sample["input_ids"], sample["attention_mask"]), onnx_model_path(output_dir, "text", "fp32"),
+            input_names=["input_ids", "attention_mask"], output_names=["text_embeds"],
+            dynamic_axes={"input_ids": {0: "batch", 1: "sequence"}, "attention_mask": {0: "batch", 1: "sequence"},
+                          "text_embeds": {0: "batch"}},
+            opset_version=opset,
+        )
+
+    print(f"[INFO] Exporting CLIP vision tower to {output_dir}...")
+    image_model = ImageEmbeds(CLIPVisionModelWithProjection.from_pretrained(hf_repo, subfolder=hf_subfolder).eval())
+    pixel_values = processor(images=_parity_images(2), return_tensors="pt")["pixel_values"]
+    with torch.inference_mode():
+        torch.onnx.export(
+            image_model, (pixel_values,), onnx_model_path(output_dir, "image", "fp32"),
+            input_names=["pixel_values"], output_names=["image_embeds"],
+            dynamic_axes={"pixel_values": {0: "batch"}, "image_embeds": {0: "batch"}},
+            opset_version=opset,
+        )
+
+    if quantize:
+        from onnxruntime.quantization import quantize_dynamic, QuantType
+        for kind in ("text", "image"):
+            print(f"[INFO] Quantizing CLIP {kind} tower to int8...")
+            # Chỉ quantize MatMul / Gemm (phần lớn FLOPs của transformer); Conv patch embedding giữ fp32
+            quantize_dynamic(
+                onnx_model_path(output_dir, kind, "fp32"), onnx_model_path(output_dir, kind, "int8"),
+                op_types_to_quantize=["MatMul", "Gemm"], weight_type=QuantType.QInt8,
+            )
+    print(f"[SUCCESS] Exported CLIP ONNX models to {output_dir}")
+
+
+def _min_cosine(a: np.ndarray, b: np.ndarray) -> float:
+    a = a / np.linalg.norm(a, axis=1, keepdims=True)
+    b = b / np.linalg.norm(b, axis=1, keepdims=True)
+    return float(np.min(np.sum(a * b, axis=1)))
+
+
+def check_parity(reference: LazyClipEncoder, candidate: LazyClipEncoder, tolerance: float = None,
+                 texts=None, images=None):
+    """
+    So vector của 2 encoder (thường là torch và onnx) trên cùng các text / ảnh mẫu.
+    Trả về {"text": cosine nhỏ nhất, "image": ..., "tolerance": ..., "ok": cả 2 >= tolerance}.
+    """
+    if tolerance is None:
+        tolerance = PARITY_TOLERANCE.get(candidate.onnx_precision, PARITY_TOLERANCE["int8"])
+    texts = texts or PARITY_TEXTS
+    images = images or _parity_images()
+    report = {
+        "text": _min_cosine(reference.encode(texts), candidate.encode(texts)),
+        "image": _min_cosine(reference.encode(images), candidate.encode(images)),
+        "tolerance": tolerance,
+    }
+    report["ok"] = report["text"] >= tolerance and report["image"] >= tolerance
+    return report
@@ -0,0 +1,125 @@
+import multiprocessing as mp
+import os
+import time
+from embedding.checkpoint import (
+    IngestCheckpoint, ShardCheckpoint, DeadLetterLog, DEFAULT_CHECKPOINT_DIR, DEFAULT_DEAD_LETTER_PATH
+)
+from embedding.cache import mark_index_updated
+from embedding.preprocess import load_catalog
+from vectordb.qdrant_client_handler import QDRANT_URL, QDRANT_LAYOUT, VECTOR_BACKEND
+
+# Mặc định: mỗi shard 1 process + 1 bản model, dùng 2 core
+DEFAULT_NUM_SHARDS = max(1, (os.cpu_count() or 1) // 2)
+
+
+def supports_parallel_writers() -> bool:
+    """Chỉ Qdrant server nhận upsert đồng thời từ nhiều process; :memory: / local path / numpy chỉ 1 process ghi"""
+    return VECTOR_BACKEND == "qdrant" and QDRANT_URL.startswith(("http://", "https://"))
+
+
+def _ingest_shard(spec):
+    """Chạy trong process con: 1 bản model riêng, ingest 1 shard từ checkpoint của nó"""
+    from embedding.encoder import CLIP_BACKEND
+    if CLIP_BACKEND == "torch":
+        import torch
+        # Chia core cho các process, tránh mỗi bản model giành hết thread
+        torch.set_num_threads(spec["threads"])
+    from embedding.ingest import DataIngestion
+
+    ingestor = DataIngestion(csv_path=spec["source"], images_folder=spec["images_folder"], layout=spec["layout"],
+                             intra_op_threads=spec["threads"], dead_letter_path=None)
+    # Dead-letter riêng của shard: record ghi kèm số shard, flush theo checkpoint của shard
+    ingestor.dead_letter = DeadLetterLog(spec["dead_letter_path"], shard=spec["shard"])
+    checkpoint = ShardCheckpoint(spec["checkpoint_path"], spec["start"], spec["stop"])
+    ingestor.process_and_ingest_checkpointed(checkpoint, batch_size=spec["batch_size"], num_workers=spec["num_workers"])
+
+
+def _count_lines(path):
+    if not os.path.exists(path):
+        return 0
+    with open(path, "rb") as f:
+        return sum(1 for _ in f)
+
+
+def run_parallel_ingest(source: str, images_folder: str, num_shards: int = DEFAULT_NUM_SHARDS, batch_size: int = 64,
+                        num_workers: int = 4, checkpoint_dir: str = DEFAULT_CHECKPOINT_DIR,
+                        dead_letter_path: str = DEFAULT_DEAD_LETTER_PATH, max_restarts: int = 2,
+                        layout: str = QDRANT_LAYOUT):
+    """
+    Full rebuild chia catalogue thành num_shards đoạn liên tiếp, mỗi đoạn chạy trên 1 process riêng (model riêng,
+    upsert đồng thời). Tiến độ từng shard được checkpoint sau mỗi batch: shard lỗi được chạy lại tối đa max_restarts
+    lần từ checkpoint, và chạy lại cả lệnh (sau khi crash / Ctrl+C) thì chỉ làm tiếp phần còn thiếu.
+    Dòng / ảnh lỗi được ghi vào dead_letter_path (JSON Lines).
+    """
+    if num_shards > 1 and not supports_parallel_writers():
+        print(f"[WARN] VECTOR_BACKEND={VECTOR_BACKEND}, QDRANT_URL={QDRANT_URL} only supports a single writer "
+              f"-> running 1 shard instead of {num_shards}")
+        num_shards = 1
+
+    # Build artifact catalogue + tạo collection 1 lần ở process cha, tránh các shard làm đồng thời
+    total_rows = len(load_catalog(source))
+    from embedding.ingest import open_collections
+    handlers = list(open_collections(layout).values())
+
+    checkpoint = IngestCheckpoint(checkpoint_dir, source, total_rows, num_shards, layout)
+    pending = checkpoint.pending_shards()
+    if checkpoint.resumed:
+        print(f"[INFO] Resuming from checkpoint: {num_shards - len(pending)}/{num_shards} shards done, "
+              f"{checkpoint.totals()['products']} products already ingested")
+    elif os.path.exists(dead_letter_path):
+        # Lần rebuild mới -> dead-letter của lần trước không còn đúng
+        os.remove(dead_letter_path)
+
+    threads = max(1, (os.cpu_count() or 1) // num_shards)
+
+    def spec(index):
+        _, start, stop = checkpoint.shards[index]
+        return {
+            "shard": index, "start": start, "stop": stop, "checkpoint_path": checkpoint.shard_path(index),
+            "source": source, "images_folder": images_folder, "layout": layout, "threads": threads,
+            "batch_size": batch_size, "num_workers": num_workers, "dead_letter_path": dead_letter_path,
+        }
+
+    print(f"[INFO] Start parallel ingest: {total_rows} rows, {num_shards} shards, {threads} threads/shard...")
+    start_time = time.perf_counter()
+    # Tắt build HNSW trong lúc các shard upload, build lại 1 lần khi tất cả xong
+    for handler in handlers:
+        handler.begin_bulk_load()
+    ctx = mp.get_context("spawn")
+    for attempt in range(max_restarts + 1):
+        pending = checkpoint.pending_shards()
+        if not pending:
+            break
+        if attempt:
+            print(f"[WARN] Restarting {len(pending)} shard(s) from checkpoint ({attempt}/{max_restarts})...")
+        if num_shards == 1:
+            # 1 shard thì chạy luôn trong process này (QDRANT_URL=:memory: / local path chỉ mở được từ 1 process)
+            try:
+                _ingest_shard(spec(pending[0]))
+            except Exception as e:
+                print(f"[ERR] Shard {pending[0]} failed: {e}")
+            continue
+        processes = [ctx.Process(target=_ingest_shard, args=(spec(i),), name=f"ingest-shard-{i}") for i in pending]
+        for p in processes:
+            p.start()
+        for i, p in zip(pending, processes):
+            p.join()
+            if p.exitcode != 0:
+                print(f"[ERR] Shard {i} exited with code {p.exitcode}")
+
+    pending = checkpoint.pending_shards()
+    for handler in handlers:
+        handler.end_bulk_load(wait=not pending)
+    if pending:
+        raise RuntimeError(f"Shards {pending} did not finish; run again to resume from {checkpoint_dir}")
+
+    mark_index_updated()
+    stats = checkpoint.totals()
+    stats["shards"] = num_shards
+    stats["dead_letters"] = _count_lines(dead_letter_path)
+    stats["seconds"] = round(time.perf_counter() - start_time, 2)
+    # Rebuild xong -> lần chạy sau là rebuild mới, không resume nữa
+    checkpoint.clear()
+    print(f"[SUCCESS] Parallel ingest done! Products: {stats['products']}, Images: {stats['images']}, "
+          f"dead letters: {stats['dead_letters']} ({dead_letter_path}), {stats['seconds']}s")
+    return stats
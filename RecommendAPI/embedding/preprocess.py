@@ -0,0 +1,162 @@
+import ast
+import json
+import os
+import re
+import pandas as pd
+
+# Các cột trong CSV được lưu dưới dạng chuỗi literal của Python: "[4, 6]", "[{'Brand': '...'}]", "['https://...']"
+LIST_COLUMNS = ['in_stock_size', 'out_stock_size', 'description', 'images']
+
+# Bản catalogue đã parse sẵn (cột list thật) nằm cạnh file CSV, dùng chung cho ingest và API
+ARTIFACT_EXTENSIONS = (".parquet", ".pq", ".pkl")
+
+# Chuỗi '...' / "..." và True / False / None của Python; còn lại ([ ] { } : , số) đã đúng cú pháp JSON
+_PY_TOKEN = re.compile(r"'([^'\\]*(?:\\.[^'\\]*)*)'|\"([^\"\\]*(?:\\.[^\"\\]*)*)\"|\b(True|False|None)\b")
+_PY_CONSTANTS = {"True": "true", "False": "false", "None": "null"}
+# Escape trong chuỗi Python: \' không có trong JSON, \xNN đổi thành \u00NN, " trần phải escape
+_PY_ESCAPE = re.compile(r'\\(x[0-9a-fA-F]{2}|.)|"')
+_JSON_ESCAPES = set('\\"/bfnrtu')
+
+
+def _to_json_escape(match):
+    escape = match.group(1)
+    if escape is None:
+        return '\\"'
+    if escape == "'":
+        return "'"
+    if escape[0] == "x":
+        return "\\u00" + escape[1:]
+    if escape in _JSON_ESCAPES:
+        return match.group(0)
+    # \a, \v, \0, octal... JSON không có -> để ast parse cả chuỗi
+    raise ValueError("Unsupported escape")
+
+
+def _to_json_token(match):
+    single, double, constant = match.groups()
+    if constant is not None:
+        return _PY_CONSTANTS[constant]
+    value = single if single is not None else double
+    if "\\" in value or '"' in value:
+        value = _PY_ESCAPE.sub(_to_json_escape, value)
+    return '"' + value + '"'
+
+
+def parse_literal(value):
+    """
+    Parse chuỗi literal của Python (list / dict / số / chuỗi) nhanh hơn ast.literal_eval:
+    đổi các chuỗi sang cú pháp JSON bằng regex rồi dùng json.loads (C). Cú pháp JSON không biểu diễn được
+    (tuple, key không phải chuỗi...) thì mới dùng ast.literal_eval. Không parse được -> ValueError.
+    """
+    text = value.strip()
+    try:
+        if not any(s in text for s in ('"', "\\", "True", "False", "None")):
+            # Trường hợp phổ biến: mọi chuỗi đều '...' không chứa escape -> chỉ cần đổi dấu nháy
+            return json.loads(text.replace("'", '"'))
+        return json.loads(_PY_TOKEN.sub(_to_json_token, text))
+    except (ValueError, SyntaxError):
+        pass
+    try:
+        return ast.literal_eval(text)
+    except (ValueError, SyntaxError, TypeError, MemoryError, RecursionError) as e:
+        raise ValueError(f"Not a Python literal: {text[:80]!r}") from e
+
+
+def parse_list_cell(value):
+    """Ô của cột list: chuỗi "[...]" -> list; đã là list thì giữ nguyên; NaN / lỗi -> giữ nguyên giá trị gốc"""
+    if isinstance(value, str) and value.startswith("[") and value.endswith("]"):
+        try:
+            return parse_literal(value)
+        except ValueError:
+            return value
+    return value
+
+
+def description_text(description) -> str:
+    """[{'Product Details': '...'}, {'Brand': '...'}] -> 'giá trị 1. giá trị 2' (text thuần để embed)"""
+    if description is None:
+        return ""
+    if isinstance(description, str):
+        description = parse_list_cell(description)
+        if isinstance(description, str):
+            return description
+    if not isinstance(description, list):
+        return "" if pd.isna(description) else str(description)
+    parts = []
+    for item in description:
+        if isinstance(item, dict):
+            parts.extend(v for v in item.values() if v is not None)
+    return ". ".join(str(p) for p in parts)
+
+
+def parse_catalog_columns(df: pd.DataFrame) -> pd.DataFrame:
+    for col in LIST_COLUMNS:
+        if col in df.columns:
+            df[col] = df[col].map(parse_list_cell)
+    return df
+
+
+def _drop_null_keys(value):
+    # Parquet lưu list dict thành list<struct> với đủ mọi key, key không có trong dòng gốc bị điền null
+    if isinstance(value, list):
+        return [{k: v for k, v in item.items() if v is not None} if isinstance(item, dict) else item
+                for item in value]
+    return value
+
+
+def _has_pyarrow() -> bool:
+    try:
+        import pyarrow  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+
+def artifact_path_for(csv_path: str) -> str:
+    """data/asos_products.csv -> data/asos_products.parquet (không có pyarrow thì .pkl, vẫn giữ list thật)"""
+    return os.path.splitext(csv_path)[0] + (".parquet" if _has_pyarrow() else ".pkl")
+
+
+def read_catalog_artifact(path: str) -> pd.DataFrame:
+    if path.endswith(".pkl"):
+        return pd.read_pickle(path)
+    df = pd.read_parquet(path)
+    for col in LIST_COLUMNS:
+        if col in df.columns:
+            # pyarrow trả về numpy array cho cột list -> đổi lại thành list Python như lúc parse CSV
+            df[col] = df[col].map(lambda v: _drop_null_keys(v.tolist()) if hasattr(v, "tolist") else v)
+    return df
+
+
+def build_catalog_artifact(csv_path: str, artifact_path: str = None) -> pd.DataFrame:
+    """Đọc CSV, parse các cột list 1 lần, ghi ra file columnar để các lần sau chỉ cần load"""
+    print(f"[INFO] Preprocessing catalogue {csv_path}...")
+    df = parse_catalog_columns(pd.read_csv(csv_path))
+    artifact_path = artifact_path or artifact_path_for(csv_path)
+    # API worker và ingest có thể cùng build lần đầu -> file tạm riêng cho mỗi process, os.replace là atomic
+    tmp_path = f"{artifact_path}.{os.getpid()}.tmp"
+    try:
+        if artifact_path.endswith(".pkl"):
+            df.to_pickle(tmp_path)
+        else:
+            df.to_parquet(tmp_path, index=False)
+        os.replace(tmp_path, artifact_path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    print(f"[SUCCESS] Wrote catalogue artifact: {artifact_path} ({len(df)} rows)")
+    return df
+
+
+def load_catalog(source: str) -> pd.DataFrame:
+    """
+    Catalogue đã parse (cột list là list thật). source là CSV thì dùng artifact cạnh nó nếu còn mới hơn CSV,
+    không thì build lại; source là artifact thì đọc thẳng.
+    """
+    if source.endswith(ARTIFACT_EXTENSIONS):
+        return read_catalog_artifact(source)
+    path = artifact_path_for(source)
+    if os.path.exists(path) and os.path.getmtime(path) >= os.path.getmtime(source):
+        return read_catalog_artifact(path)
+    return build_catalog_artifact(source, path)
@@ -0,0 +1,92 @@
+import os
+import numpy as np
+import pandas as pd
+from embedding.encoder import CLIP_MAX_TOKENS, CLIP_DIM
+from embedding.preprocess import parse_list_cell
+
+# Các trường ghép thành text để embed, theo thứ tự: tên cột của catalogue (name, brand, color)
+# hoặc tên mục trong description (Product Details, About Me, Brand, Size & Fit, Look After Me)
+TEXT_FIELDS = [f.strip() for f in os.getenv("TEXT_FIELDS", "name,Product Details,About Me,Brand").split(",") if f.strip()]
+# Text dài hơn 1 cửa sổ token của CLIP được chia thành tối đa TEXT_MAX_CHUNKS đoạn, vector các đoạn gộp lại
+# bằng TEXT_POOLING ("mean" / "max"); TEXT_MAX_CHUNKS=1 = chỉ cắt theo token như trước
+TEXT_MAX_CHUNKS = int(os.getenv("TEXT_MAX_CHUNKS", "4"))
+TEXT_POOLING = os.getenv("TEXT_POOLING", "mean").lower()
+
+
+def product_text(row, fields=None) -> str:
+    """Ghép các trường được chọn của 1 dòng catalogue thành text, bỏ trường trống"""
+    description = row.get("description")
+    if isinstance(description, str):
+        description = parse_list_cell(description)
+    sections = {}
+    if isinstance(description, list):
+        for item in description:
+            if isinstance(item, dict):
+                sections.update(item)
+
+    parts = []
+    for field in fields or TEXT_FIELDS:
+        value = sections[field] if field in sections else row.get(field)
+        if value is None or (not isinstance(value, str) and pd.isna(value)):
+            continue
+        value = str(value).strip()
+        if value:
+            parts.append(value)
+    return ". ".join(parts)
+
+
+class TextPreparer:
+    """
+    Chia text theo token của tokenizer CLIP (không phải theo ký tự): mỗi đoạn vừa 1 cửa sổ CLIP_MAX_TOKENS token.
+    encode() đưa mọi đoạn của cả batch qua model trong 1 lần gọi, rồi pool vector các đoạn của từng text
+    (mỗi vector đoạn được L2-normalize trước khi pool để đoạn nào cũng có trọng số như nhau).
+    """
+
+    def __init__(self, encoder, max_chunks: int = TEXT_MAX_CHUNKS, pooling: str = TEXT_POOLING,
+                 max_tokens: int = CLIP_MAX_TOKENS):
+        if pooling not in ("mean", "max"):
+            raise ValueError(f"Unknown pooling: {pooling} (expected 'mean' or 'max')")
+        self.encoder = encoder
+        self.max_chunks = max(1, max_chunks)
+        self.pooling = pooling
+        # Trừ token <start> / <end> mà tokenizer thêm vào mỗi đoạn
+        self.window = max_tokens - 2
+        self._tokenizer = None
+
+    @property
+    def signature(self) -> str:
+        """Cấu hình chia đoạn, đưa vào cache key: đổi cấu hình thì không dùng lại vector cũ"""
+        return f"chunks={self.max_chunks};pool={self.pooling};window={self.window}"
+
+    @property
+    def tokenizer(self):
+        if self._tokenizer is None:
+            self._tokenizer = self.encoder.tokenizer
+        return self._tokenizer
+
+    def chunks(self, text: str):
+        tokenizer = self.tokenizer
+        if tokenizer is None:
+            # Không lấy được tokenizer -> để model tự cắt ở CLIP_MAX_TOKENS
+            return [text]
+        ids = tokenizer(text, add_special_tokens=False)["input_ids"]
+        if len(ids) <= self.window:
+            return [text]
+        stop = min(len(ids), self.window * self.max_chunks)
+        return [tokenizer.decode(ids[i:i + self.window]) for i in range(0, stop, self.window)]
+
+    def encode(self, texts, batch_size: int = None) -> np.ndarray:
+        """batch_size: số đoạn mỗi forward pass, mặc định = tất cả các đoạn của batch text"""
+        if not texts:
+            return np.zeros((0, CLIP_DIM), dtype=np.float32)
+        chunks_per_text = [self.chunks(t) for t in texts]
+        flat = [chunk for chunks in chunks_per_text for chunk in chunks]
+        vectors = np.asarray(self.encoder.encode(flat, batch_size=batch_size or len(flat)), dtype=np.float32)
+        vectors /= np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+        pool = np.mean if self.pooling == "mean" else np.max
+        result = np.empty((len(texts), vectors.shape[1]), dtype=np.float32)
+        start = 0
+        for i, chunks in enumerate(chunks_per_text):
+            result[i] = pool(vectors[start:start + len(chunks)], axis=0)
+            start += len(chunks)
+        return result
@@ -0,0 +1,31 @@
+from embedding.encoder import LazyClipEncoder, CLIP_ONNX_DIR
+from embedding.onnx_export import export_clip_onnx, check_parity
+import argparse
+import sys
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export CLIP (text + vision tower) ra ONNX cho CLIP_BACKEND=onnx, kiểm tra lệch so với torch")
+    parser.add_argument("--output", default=CLIP_ONNX_DIR)
+    parser.add_argument("--no-int8", action="store_true", help="Chỉ export fp32, không quantize int8")
+    parser.add_argument("--tolerance", type=float, default=None,
+                        help="Cosine nhỏ nhất chấp nhận được so với torch (mặc định: fp32 0.9999, int8 0.99)")
+    parser.add_argument("--check-only", action="store_true", help="Không export lại, chỉ kiểm tra model đã có")
+    parser.add_argument("--threads", type=int, default=0, help="Số thread intra-op của ONNX Runtime")
+    args = parser.parse_args()
+
+    if not args.check_only:
+        export_clip_onnx(args.output, quantize=not args.no_int8)
+
+    reference = LazyClipEncoder(backend="torch")
+    failed = False
+    for precision in (["fp32"] if args.no_int8 else ["fp32", "int8"]):
+        candidate = LazyClipEncoder(backend="onnx", onnx_dir=args.output, onnx_precision=precision,
+                                    intra_op_threads=args.threads)
+        report = check_parity(reference, candidate, tolerance=args.tolerance)
+        status = "OK" if report["ok"] else "FAILED"
+        print(f"[{'SUCCESS' if report['ok'] else 'ERR'}] Parity {precision}: {status} "
+              f"(min cosine text {report['text']:.5f}, image {report['image']:.5f}, tolerance {report['tolerance']})")
+        failed = failed or not report["ok"]
+
+    if failed:
+        sys.exit(1)
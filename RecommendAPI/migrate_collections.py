@@ -0,0 +1,84 @@
+from vectordb.qdrant_client_handler import (
+    QdrantHandler, get_client, QDRANT_URL, PRODUCTS_COLLECTION, PRODUCT_VECTORS, PRODUCT_PAYLOAD_INDEXES
+)
+from qdrant_client.http import models
+import argparse
+
+# Chuyển layout cũ (2 collection products_text / products_image) sang 1 collection "products"
+# với 2 named vector "text" / "image" và payload dùng chung. Không cần encode lại.
+
+TEXT_COLLECTION = "products_text"
+IMAGE_COLLECTION = "products_image"
+
+
+def _merge_points(text_points, image_vectors):
+    points = []
+    for p in text_points:
+        vector = {"text": p.vector}
+        if p.id in image_vectors:
+            vector["image"] = image_vectors[p.id]
+        points.append(models.PointStruct(id=p.id, vector=vector, payload=p.payload))
+    return points
+
+
+def migrate(batch_size: int = 256, drop_old: bool = False):
+    print(f"[INFO] Connecting to Qdrant at {QDRANT_URL}...")
+    client = get_client()
+    target = QdrantHandler(
+        collection_name=PRODUCTS_COLLECTION, vector_size=512,
+        vector_names=PRODUCT_VECTORS, payload_indexes=PRODUCT_PAYLOAD_INDEXES
+    )
+
+    # 1. Duyệt products_text, lấy vector ảnh tương ứng theo id rồi ghi 1 point gộp
+    migrated_ids = set()
+    offset = None
+    while True:
+        text_points, offset = client.scroll(
+            TEXT_COLLECTION, limit=batch_size, offset=offset, with_vectors=True, with_payload=True
+        )
+        if not text_points:
+            break
+        ids = [p.id for p in text_points]
+        image_vectors = {p.id: p.vector for p in client.retrieve(IMAGE_COLLECTION, ids=ids, with_vectors=True)}
+        target.upsert_points(_merge_points(text_points, image_vectors))
+        migrated_ids.update(ids)
+        print(f"--> Migrated: {len(migrated_ids)}")
+        if offset is None:
+            break
+
+    # 2. Point chỉ có ảnh (không có text) - bình thường ingest luôn ghi text nên hiếm khi xảy ra
+    image_only = 0
+    offset = None
+    while True:
+        image_points, offset = client.scroll(
+            IMAGE_COLLECTION, limit=batch_size, offset=offset, with_vectors=True, with_payload=True
+        )
+        leftovers = [p for p in image_points if p.id not in migrated_ids]
+        if leftovers:
+            target.upsert_points([
+                models.PointStruct(id=p.id, vector={"image": p.vector}, payload=p.payload) for p in leftovers
+            ])
+            image_only += len(leftovers)
+        if offset is None:
+            break
+
+    # 3. Kiểm tra số lượng trước khi xoá layout cũ
+    total = client.count(PRODUCTS_COLLECTION, exact=True).count
+    expected = len(migrated_ids) + image_only
+    print(f"[SUCCESS] Migrated {expected} products into '{PRODUCTS_COLLECTION}' (count: {total})")
+
+    if drop_old:
+        if total < expected:
+            print("[ERR] Count mismatch, keeping old collections.")
+            return
+        for col_name in (TEXT_COLLECTION, IMAGE_COLLECTION):
+            client.delete_collection(collection_name=col_name)
+            print(f"[SUCCESS] Deleted collection: {col_name}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Migrate products_text + products_image -> products (named vectors)")
+    parser.add_argument("--batch-size", type=int, default=256)
+    parser.add_argument("--drop-old", action="store_true", help="Xoá 2 collection cũ sau khi migrate xong")
+    args = parser.parse_args()
+    migrate(batch_size=args.batch_size, drop_old=args.drop_old)
@@ -0,0 +1,11 @@
+from embedding.preprocess import build_catalog_artifact, artifact_path_for
+import argparse
+import os
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Parse sẵn các cột list của catalogue CSV, ghi ra artifact dùng chung cho ingest và API")
+    parser.add_argument("--source", default=os.path.join("data", "asos_products.csv"))
+    parser.add_argument("--output", default=None, help="Mặc định: cạnh file CSV (.parquet, không có pyarrow thì .pkl)")
+    args = parser.parse_args()
+
+    build_catalog_artifact(args.source, args.output or artifact_path_for(args.source))
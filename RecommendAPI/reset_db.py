@@ -1,11 +1,33 @@
-from qdrant_client import QdrantClient
+from vectordb.qdrant_client_handler import get_client, QDRANT_URL, PRODUCTS_COLLECTION, VECTOR_BACKEND
+from vectordb.local_index import LOCAL_INDEX_DIR
+import os
+import shutil
+
+# Giống DEFAULT_MANIFEST_PATH trong embedding/ingest.py (không import để tránh phải load torch)
+MANIFEST_PATH = os.path.join("data", "ingest_manifest.json")
 
 def reset_database():
-    # Kết nối tới Qdrant đang chạy trên Docker
-    print("[INFO] Connecting to Qdrant at http://localhost:6333...")
-    client = QdrantClient(url="http://localhost:6333")
+    if VECTOR_BACKEND == "numpy":
+        # Backend NumPy: toàn bộ index nằm trong 1 thư mục trên đĩa
+        if os.path.exists(LOCAL_INDEX_DIR):
+            shutil.rmtree(LOCAL_INDEX_DIR)
+            print(f"[SUCCESS] Deleted local index: {LOCAL_INDEX_DIR}")
+        else:
+            print(f"[INFO] Local index '{LOCAL_INDEX_DIR}' not found (already deleted).")
+    else:
+        reset_qdrant()
+
+    # Manifest của incremental ingest không còn đúng sau khi xoá collection
+    if os.path.exists(MANIFEST_PATH):
+        os.remove(MANIFEST_PATH)
+        print(f"[SUCCESS] Deleted ingest manifest: {MANIFEST_PATH}")
+
+def reset_qdrant():
+    # Kết nối tới Qdrant (mặc định Docker ở localhost, đổi bằng env QDRANT_URL)
+    print(f"[INFO] Connecting to Qdrant at {QDRANT_URL}...")
+    client = get_client()
 
-    collections_to_delete = ["products_text", "products_image"]
+    collections_to_delete = ["products_text", "products_image", PRODUCTS_COLLECTION]
 
     for col_name in collections_to_delete:
         try:
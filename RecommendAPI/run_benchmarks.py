@@ -0,0 +1,120 @@
+import argparse
+import asyncio
+import json
+import os
+import platform
+import shutil
+import subprocess
+import tempfile
+import time
+
+SUITES = ("micro", "ingest", "load")
+
+
+def _int_list(value):
+    return [int(v) for v in value.split(",") if v.strip()]
+
+
+def _str_list(value):
+    return [v.strip() for v in value.split(",") if v.strip()]
+
+
+def _git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        return None
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark encode / parse / catalogue, ingest và load test API trên catalogue giả, kết quả ra JSON")
+    parser.add_argument("--suites", type=_str_list, default=list(SUITES), help="micro,ingest,load")
+    parser.add_argument("--output", default=None, help="Mặc định: data/benchmarks/bench-<thời gian>.json")
+    parser.add_argument("--workdir", default=None,
+                        help="Thư mục chứa catalogue giả, ảnh, Qdrant local, cache (mặc định: thư mục tạm, xoá khi xong)")
+    parser.add_argument("--products", type=int, default=2000, help="Số sản phẩm của catalogue giả")
+    parser.add_argument("--image-ratio", type=float, default=1.0, help="Tỉ lệ sản phẩm có ảnh")
+    parser.add_argument("--encode-batch-sizes", type=_int_list, default=[1, 8, 32, 64])
+    parser.add_argument("--ingest-modes", type=_str_list, default=["batched"], help="batched,streaming")
+    parser.add_argument("--batch-size", type=int, default=64)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--concurrency", type=_int_list, default=[1, 16], help="Số request đồng thời của load test")
+    parser.add_argument("--requests", type=int, default=200, help="Số request mỗi scenario, mỗi mức concurrency")
+    parser.add_argument("--scenarios", type=_str_list, default=None,
+                        help="search_text,search_image,preference,products_by_brand (mặc định: tất cả)")
+    parser.add_argument("--url", default=None,
+                        help="Load test API đang chạy ở url thay vì chạy API trong process (SKU / brand lấy từ --catalog)")
+    parser.add_argument("--catalog", default=os.path.join("data", "asos_products.csv"),
+                        help="Catalogue của API ở --url, dùng để chọn SKU / brand cho request")
+    args = parser.parse_args()
+
+    output = os.path.abspath(args.output or os.path.join("data", "benchmarks", f"bench-{time.strftime('%Y%m%d-%H%M%S')}.json"))
+    remote_catalog = os.path.abspath(args.catalog)
+    workdir = os.path.abspath(args.workdir or tempfile.mkdtemp(prefix="recsys-bench-"))
+    os.makedirs(os.path.join(workdir, "data"), exist_ok=True)
+
+    # Qdrant chế độ local (in-process, lưu trong workdir) thay cho server; cache / index_version / artifact
+    # dùng đường dẫn tương đối "data/..." -> chạy trong workdir để không đụng dữ liệu thật
+    os.environ["VECTOR_BACKEND"] = "qdrant"
+    os.environ["QDRANT_URL"] = os.path.join(workdir, "qdrant")
+    os.environ.setdefault("CLIP_ONNX_DIR", os.path.abspath(os.path.join("data", "clip_onnx")))
+    os.chdir(workdir)
+
+    from benchmark.synthetic import generate_catalog
+    from benchmark.micro import bench_encoder, bench_parsing, bench_catalog
+    from benchmark.ingest_bench import bench_ingest
+    from benchmark.load_test import load_test_in_process, load_test_remote, SCENARIOS
+    from embedding.encoder import CLIP_BACKEND, CLIP_ONNX_PRECISION
+    from embedding.preprocess import load_catalog
+    from embedding.text_prep import TEXT_MAX_CHUNKS, TEXT_POOLING
+    from vectordb.qdrant_client_handler import QDRANT_LAYOUT
+
+    report = {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "git_commit": _git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "config": {
+                "clip_backend": CLIP_BACKEND, "clip_onnx_precision": CLIP_ONNX_PRECISION,
+                "qdrant_layout": QDRANT_LAYOUT, "text_max_chunks": TEXT_MAX_CHUNKS, "text_pooling": TEXT_POOLING,
+            },
+            "args": vars(args),
+        }
+    }
+
+    try:
+        csv_path, images_dir = generate_catalog(os.path.join(workdir, "data"), args.products, args.image_ratio)
+        report["meta"]["catalog"] = {"products": args.products, "image_ratio": args.image_ratio}
+
+        if "micro" in args.suites:
+            report["micro"] = {
+                "parsing": bench_parsing(csv_path),
+                "catalog": bench_catalog(csv_path),
+                "encode": bench_encoder(args.encode_batch_sizes),
+            }
+        if "ingest" in args.suites:
+            report["ingest"] = bench_ingest(csv_path, images_dir, modes=args.ingest_modes,
+                                            batch_size=args.batch_size, num_workers=args.workers)
+        if "load" in args.suites:
+            df = load_catalog(remote_catalog if args.url else csv_path)
+            skus = [int(s) for s in df["sku"]]
+            brands = df["brand"].dropna().unique().tolist()
+            options = {"scenarios": args.scenarios or SCENARIOS, "concurrency": args.concurrency,
+                       "num_requests": args.requests}
+            if args.url:
+                report["load"] = asyncio.run(load_test_remote(args.url, skus, brands, **options))
+            else:
+                if "ingest" not in args.suites:
+                    print("[WARN] Load test without the ingest suite: the local vector store is empty")
+                report["load"] = asyncio.run(load_test_in_process(skus, brands, **options))
+    finally:
+        if args.workdir is None:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    os.makedirs(os.path.dirname(output), exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+    print(f"[SUCCESS] Benchmark results written to {output}")
@@ -1,20 +1,71 @@
-from embedding.ingest import DataIngestion
+from embedding.ingest import DataIngestion, DEFAULT_MANIFEST_PATH
+from embedding.parallel_ingest import run_parallel_ingest, DEFAULT_NUM_SHARDS
+from embedding.checkpoint import DEFAULT_CHECKPOINT_DIR, DEFAULT_DEAD_LETTER_PATH
+from vectordb.neighbor_table import build_neighbor_table, refresh_neighbor_table
+import argparse
 import os
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Ingest ASOS products vào Qdrant")
+    parser.add_argument("--incremental", action="store_true",
+                        help="Chỉ embed lại SKU mới/thay đổi và xoá SKU không còn trong CSV")
+    parser.add_argument("--manifest", default=DEFAULT_MANIFEST_PATH)
+    parser.add_argument("--batch-size", type=int, default=100)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--stream", action="store_true",
+                        help="Đọc catalogue theo chunk thay vì load cả file (catalogue rất lớn, RAM cố định)")
+    parser.add_argument("--source", default=os.path.join("data", "asos_products.csv"),
+                        help="File catalogue: .csv, hoặc artifact của prepare_catalog.py (.parquet cần pyarrow; --stream chỉ đọc .csv/.parquet)")
+    parser.add_argument("--chunk-size", type=int, default=10000)
+    parser.add_argument("--parallel", action="store_true",
+                        help="Full rebuild chia shard chạy song song trên nhiều process, có checkpoint để chạy tiếp khi lỗi")
+    parser.add_argument("--shards", type=int, default=DEFAULT_NUM_SHARDS,
+                        help="Số process (mỗi process 1 bản model); chỉ Qdrant server mới chạy được > 1")
+    parser.add_argument("--checkpoint-dir", default=DEFAULT_CHECKPOINT_DIR)
+    parser.add_argument("--dead-letter", default=DEFAULT_DEAD_LETTER_PATH,
+                        help="File JSON Lines ghi các dòng / ảnh lỗi (mọi chế độ ingest)")
+    parser.add_argument("--neighbors", action="store_true",
+                        help="Cập nhật bảng neighbor của /preference sau khi ingest (incremental: chỉ các hàng bị ảnh hưởng)")
+    args = parser.parse_args()
+
     # Đường dẫn file CSV
-    csv_file = os.path.join("data", "asos_products.csv")
+    csv_file = args.source
     
     # Đường dẫn thư mục chứa ảnh
     images_dir = os.path.join("data", "images")
     
     print(f"--- Starting Ingest (CSV: {csv_file}, Images: {images_dir}) ---")
-    
-    # Khởi tạo với đường dẫn folder ảnh
-    ingestor = DataIngestion(csv_path=csv_file, images_folder=images_dir)
-    
-    # Chạy xử lý
-    ingestor.process_and_ingest(batch_size=100) # Local nhanh nên tăng batch size lên 100
+
+    if args.parallel and not args.incremental:
+        # Mỗi shard tự load model trong process riêng
+        run_parallel_ingest(
+            csv_file, images_dir, num_shards=args.shards, batch_size=args.batch_size, num_workers=args.workers,
+            checkpoint_dir=args.checkpoint_dir, dead_letter_path=args.dead_letter
+        )
+        if args.neighbors:
+            build_neighbor_table()
+    else:
+        # Khởi tạo với đường dẫn folder ảnh
+        ingestor = DataIngestion(csv_path=csv_file, images_folder=images_dir, streaming=args.stream and not args.incremental,
+                                 dead_letter_path=args.dead_letter)
+
+        if args.stream and not args.incremental:
+            ingestor.process_and_ingest_streaming(
+                batch_size=args.batch_size, num_workers=args.workers, chunk_size=args.chunk_size
+            )
+            if args.neighbors:
+                build_neighbor_table()
+        elif args.incremental:
+            stats = ingestor.process_and_ingest_incremental(
+                manifest_path=args.manifest, batch_size=args.batch_size, num_workers=args.workers
+            )
+            if args.neighbors:
+                refresh_neighbor_table(stats["changed_ids"], stats["removed_ids"])
+        else:
+            # Chạy xử lý theo batch (1 lần encode cho cả batch, decode ảnh song song)
+            ingestor.process_and_ingest_batched(batch_size=args.batch_size, num_workers=args.workers)
+            if args.neighbors:
+                build_neighbor_table()
 
 # Bản 2:
 # from embedding.ingest import DataIngestion
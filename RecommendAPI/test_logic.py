@@ -1,7 +1,8 @@
 import ast
 import numpy as np
 from PIL import Image
-from sentence_transformers import SentenceTransformer
+from embedding.encoder import LazyClipEncoder
+from embedding.text_prep import TextPreparer
 import os
 
 # ==========================================
@@ -50,7 +51,7 @@ def run_test():
     print("\n" + "="*30)
     print("\n[MODEL] Đang tải model clip-ViT-B-32 (Vui lòng đợi)...")
     try:
-        model = SentenceTransformer('clip-ViT-B-32')
+        model = LazyClipEncoder('clip-ViT-B-32')
         print("-> Model tải thành công!")
     except Exception as e:
         print(f"-> Lỗi tải model: {e}")
@@ -58,11 +59,12 @@ def run_test():
 
     # --- Embedding Text ---
     print(f"\n3. TEST EMBEDDING TEXT:")
-    # Mô phỏng việc cắt ngắn text để fit vào CLIP (thường CLIP nhận tối đa 77 tokens)
-    input_text_for_model = cleaned_text[:300] 
-    vector_text = model.encode(input_text_for_model)
+    # Giống lúc ingest: chia text theo token CLIP (tối đa 77 token / đoạn), vector các đoạn pool lại
+    text_prep = TextPreparer(model)
+    chunks = text_prep.chunks(cleaned_text)
+    vector_text = text_prep.encode([cleaned_text])[0]
     
-    print(f"   -> Input cho model: '{input_text_for_model[:50]}...'")
+    print(f"   -> Input cho model: {len(chunks)} đoạn, đoạn đầu '{chunks[0][:50]}...'")
     print(f"   -> Kích thước Vector (Dimension): {vector_text.shape}")
     print(f"   -> 5 giá trị đầu tiên: {vector_text[:5]}")
 
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# Các module được import theo kiểu "api.xxx" / "embedding.xxx" / "vectordb.xxx" (chạy từ thư mục RecommendAPI)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
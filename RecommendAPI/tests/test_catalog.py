@@ -0,0 +1,34 @@
+import numpy as np
+import pandas as pd
+from api.catalog import ProductCatalog
+
+
+def make_catalog():
+    return ProductCatalog(pd.DataFrame({
+        "sku": [10, 11, 12, 10, 13],
+        "brand": ["Nike", "nike", "ASOS DESIGN", "Adidas", None],
+        "price": [10.0, np.nan, 30.0, 40.0, 50.0],
+    }))
+
+
+def test_duplicate_sku_keeps_first_row_and_nan_becomes_none():
+    catalog = make_catalog()
+    assert len(catalog) == 4
+    assert catalog.get(10)["brand"] == "Nike"
+    assert catalog.get(11)["price"] is None
+    assert catalog.get(999) is None
+    assert 12 in catalog and 999 not in catalog
+
+
+def test_take_keeps_ranking_order_and_drops_duplicates_and_unknown():
+    catalog = make_catalog()
+    assert [r["sku"] for r in catalog.take([12, 999, 10, 12, 11])] == [12, 10, 11]
+
+
+def test_by_brand_is_case_insensitive_with_limit():
+    catalog = make_catalog()
+    assert catalog.skus_by_brand("NIKE") == [10, 11]
+    assert [r["sku"] for r in catalog.by_brand("nike", limit=1)] == [10]
+    # Dòng trùng sku (Adidas) bị bỏ nên brand đó không có sản phẩm
+    assert catalog.by_brand("adidas") == []
+    assert catalog.by_brand("unknown") == []
@@ -0,0 +1,99 @@
+import json
+import os
+from embedding.checkpoint import DeadLetterLog, IngestCheckpoint, ShardCheckpoint
+
+
+def read_lines(path):
+    with open(path, "r", encoding="utf-8") as f:
+        return [json.loads(line) for line in f]
+
+
+def test_shard_checkpoint_resumes_from_committed_row(tmp_path):
+    path = str(tmp_path / "shard_0.json")
+    checkpoint = ShardCheckpoint(path, 0, 100)
+    assert checkpoint.next_row == 0 and not checkpoint.done
+    checkpoint.commit(32, products=30, images=20)
+    checkpoint.commit(64, products=32, images=10)
+    # Commit lệch thứ tự không làm lùi tiến độ
+    checkpoint.commit(40)
+
+    resumed = ShardCheckpoint(path, 0, 100)
+    assert (resumed.next_row, resumed.products, resumed.images) == (64, 62, 30)
+    resumed.commit(100, products=36)
+    assert ShardCheckpoint(path, 0, 100).done
+
+
+def test_shard_checkpoint_ignores_state_of_other_range(tmp_path):
+    path = str(tmp_path / "shard_0.json")
+    ShardCheckpoint(path, 0, 100).commit(50, products=50)
+    checkpoint = ShardCheckpoint(path, 0, 80)
+    assert (checkpoint.next_row, checkpoint.products) == (0, 0)
+
+
+def test_ingest_checkpoint_resume_and_reset(tmp_path):
+    source = tmp_path / "catalog.csv"
+    source.write_text("sku\n1\n2\n")
+    directory = str(tmp_path / "checkpoints")
+
+    run = IngestCheckpoint(directory, str(source), total_rows=10, num_shards=3, layout="split")
+    assert not run.resumed
+    assert run.shards == [(0, 0, 4), (1, 4, 8), (2, 8, 10)]
+    run.shard(0).commit(4, products=4, images=2)
+    run.shard(1).commit(6, products=2)
+
+    resumed = IngestCheckpoint(directory, str(source), total_rows=10, num_shards=3, layout="split")
+    assert resumed.resumed
+    assert resumed.pending_shards() == [1, 2]
+    assert resumed.shard(1).next_row == 6
+    assert resumed.totals() == {"products": 6, "images": 2}
+
+    # Đổi số shard (hoặc catalogue) -> checkpoint cũ bị bỏ, làm lại từ đầu
+    reshard = IngestCheckpoint(directory, str(source), total_rows=10, num_shards=2, layout="split")
+    assert not reshard.resumed
+    assert reshard.pending_shards() == [0, 1]
+    assert reshard.totals() == {"products": 0, "images": 0}
+
+    source.write_text("sku\n1\n2\n3\n")
+    changed = IngestCheckpoint(directory, str(source), total_rows=10, num_shards=2, layout="split")
+    assert not changed.resumed
+
+
+def test_dead_letters_are_written_only_up_to_the_checkpoint(tmp_path):
+    path = str(tmp_path / "dead_letter.jsonl")
+    log = DeadLetterLog(path, shard=0)
+    log.write("row", ValueError("bad sku"), row=3, sku="abc")
+    log.write("image", "corrupt", row=40, sku=40)
+    log.write("row", "no row info")
+
+    # Batch [0, 32) đã upsert xong: chỉ ghi record của dòng < 32 (và record không có dòng)
+    log.flush(upto_row=32)
+    records = read_lines(path)
+    assert [(r["stage"], r["row"]) for r in records] == [("row", 3), ("row", None)]
+    assert records[0]["error"] == "bad sku" and records[0]["shard"] == 0 and records[0]["sku"] == "abc"
+
+    log.flush()
+    assert [r["row"] for r in read_lines(path)] == [3, None, 40]
+    assert log.count == 3
+
+
+def test_dead_letters_not_duplicated_after_resume(tmp_path):
+    """Process chết sau khi encode batch nhưng trước checkpoint: chạy lại từ checkpoint không ghi trùng"""
+    path = str(tmp_path / "dead_letter.jsonl")
+    checkpoint_path = str(tmp_path / "shard_0.json")
+
+    checkpoint = ShardCheckpoint(checkpoint_path, 0, 64)
+    log = DeadLetterLog(path)
+    log.write("image", "corrupt", row=5)
+    log.flush(upto_row=32)
+    checkpoint.commit(32)
+    log.write("image", "corrupt", row=40)
+    # crash: batch [32, 64) chưa commit, record của dòng 40 vẫn đang giữ trong RAM
+
+    checkpoint = ShardCheckpoint(checkpoint_path, 0, 64)
+    assert checkpoint.next_row == 32
+    log = DeadLetterLog(path)
+    log.write("image", "corrupt", row=40)
+    log.flush(upto_row=64)
+    checkpoint.commit(64)
+    assert [r["row"] for r in read_lines(path)] == [5, 40]
+    assert not any(name.endswith(".tmp") for name in os.listdir(tmp_path))
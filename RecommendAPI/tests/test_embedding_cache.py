@@ -0,0 +1,57 @@
+import os
+import numpy as np
+from embedding.cache import EmbeddingCache
+
+
+def vectors(n, dim=8, seed=0):
+    return np.random.default_rng(seed).normal(size=(n, dim)).astype(np.float32)
+
+
+def test_put_many_writes_repeated_keys_once(tmp_path):
+    cache = EmbeddingCache("model", dim=8, cache_dir=str(tmp_path))
+    a, b = cache.text_key("a"), cache.text_key("b")
+    cache.put_many([a, b, a, a], vectors(4))
+    assert cache.stats()["rows"] == 2
+    assert os.path.getsize(cache.path) == 2 * cache._dtype.itemsize
+    np.testing.assert_allclose(cache.get(b), vectors(4)[1])
+
+    cache.put_many([a, b], vectors(2, seed=1))
+    assert cache.stats()["rows"] == 2
+
+
+def test_records_from_other_process_are_visible_after_refresh(tmp_path):
+    reader = EmbeddingCache("model", dim=8, cache_dir=str(tmp_path), refresh_on_miss=False)
+    writer = EmbeddingCache("model", dim=8, cache_dir=str(tmp_path))
+    key = writer.image_key(b"jpeg bytes")
+    writer.put(key, vectors(1)[0])
+
+    # Miss không quét lại file
+    assert reader.get(key) is None
+    assert not reader.contains(key)
+    reader.refresh()
+    np.testing.assert_allclose(reader.get(key), vectors(1)[0])
+
+    # Mặc định (ingest): miss đọc lại file ngay
+    other = writer.text_key("new")
+    writer.put(other, vectors(1, seed=2)[0])
+    assert EmbeddingCache("model", dim=8, cache_dir=str(tmp_path)).contains(other)
+    eager = EmbeddingCache("model", dim=8, cache_dir=str(tmp_path))
+    late = writer.text_key("late")
+    writer.put(late, vectors(1, seed=3)[0])
+    np.testing.assert_allclose(eager.get(late), vectors(1, seed=3)[0])
+
+
+def test_get_or_encode_many_encodes_only_missing_keys(tmp_path):
+    cache = EmbeddingCache("model", dim=8, cache_dir=str(tmp_path))
+    keys = [cache.text_key(t) for t in ("a", "b", "c")]
+    cache.put(keys[1], vectors(1)[0])
+    calls = []
+
+    def encode(idx):
+        calls.append(list(idx))
+        return vectors(len(idx), seed=5)
+
+    out = cache.get_or_encode_many(keys, encode)
+    assert calls == [[0, 2]]
+    np.testing.assert_allclose(out[1], vectors(1)[0])
+    assert cache.stats()["rows"] == 3
@@ -0,0 +1,48 @@
+import pytest
+from qdrant_client.http import models
+from vectordb.fusion import RRF_K, fuse, reciprocal_rank_fusion, weighted_score_fusion
+
+
+def hits(*items):
+    """items: (product_id, score); product_id None -> hit không có payload"""
+    return [
+        models.ScoredPoint(id=i, version=0, score=score,
+                           payload={"product_id": p_id} if p_id is not None else None)
+        for i, (p_id, score) in enumerate(items)
+    ]
+
+
+def test_rrf_sums_reciprocal_ranks_and_dedupes():
+    image = hits((1, 0.9), (2, 0.8), (3, 0.7))
+    text = hits((3, 0.5), (1, 0.4))
+    fused = dict(reciprocal_rank_fusion([image, text], limit=10))
+    assert set(fused) == {1, 2, 3}
+    assert fused[1] == pytest.approx(1 / (RRF_K + 1) + 1 / (RRF_K + 2))
+    assert fused[3] == pytest.approx(1 / (RRF_K + 3) + 1 / (RRF_K + 1))
+    assert fused[2] == pytest.approx(1 / (RRF_K + 2))
+
+
+def test_rrf_ignores_score_scale_and_respects_weights():
+    a = hits((1, 1000.0), (2, 999.0))
+    b = hits((2, 0.01), (1, 0.001))
+    assert [p for p, _ in reciprocal_rank_fusion([a, b], weights=[1.0, 3.0])] == [2, 1]
+    assert [p for p, _ in reciprocal_rank_fusion([a, b], weights=[3.0, 1.0])] == [1, 2]
+
+
+def test_weighted_fusion_missing_counts_as_zero():
+    a = hits((1, 0.9), (2, 0.5))
+    b = hits((2, 0.6))
+    fused = dict(weighted_score_fusion([a, b], weights=[1.0, 0.5]))
+    assert fused[1] == pytest.approx(0.9)
+    assert fused[2] == pytest.approx(0.5 + 0.5 * 0.6)
+
+
+def test_fuse_limit_skips_hits_without_product_id():
+    a = hits((1, 0.9), (None, 0.8), (2, 0.7), (3, 0.6))
+    result = fuse([a], method="weighted", limit=2)
+    assert [p for p, _ in result] == [1, 2]
+
+
+def test_fuse_rejects_unknown_method():
+    with pytest.raises(ValueError):
+        fuse([], method="borda")
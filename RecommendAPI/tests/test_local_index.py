@@ -0,0 +1,97 @@
+import numpy as np
+import pytest
+from qdrant_client.http import models
+from vectordb import local_index
+from vectordb.local_index import NumpyVectorIndex
+
+
+def unit(vector):
+    vector = np.asarray(vector, dtype=np.float32)
+    return vector / np.linalg.norm(vector)
+
+
+def point(p_id, vector, brand="Nike", color="Red", price=10.0, sizes=("M",)):
+    return models.PointStruct(id=p_id, vector=list(map(float, vector)), payload={
+        "product_id": p_id, "brand": brand, "brand_norm": brand.lower(), "color": color,
+        "color_norm": color.lower(), "price": price, "in_stock_size": list(sizes),
+    })
+
+
+@pytest.fixture
+def small_index(tmp_path):
+    index = NumpyVectorIndex("products", 4, index_dir=str(tmp_path))
+    index.upsert_points([
+        point(1, [1, 0, 0, 0], brand="Nike", price=10, sizes=("S", "M")),
+        point(2, [0.9, 0.1, 0, 0], brand="Adidas", color="Blue", price=20, sizes=("L",)),
+        point(3, [0.8, 0.2, 0, 0], brand="Nike", color="Blue", price=30, sizes=("M",)),
+        point(4, [0, 1, 0, 0], brand="Puma", price=40, sizes=()),
+    ])
+    return index
+
+
+def ids(results):
+    return [hit.id for hit in results]
+
+
+def test_search_ranks_by_cosine(small_index):
+    assert ids(small_index.search([1, 0, 0, 0], limit=3)) == [1, 2, 3]
+
+
+def test_keyword_filters_are_case_insensitive_any_of(small_index):
+    assert ids(small_index.search([1, 0, 0, 0], filter_criteria={"brand": "NIKE"})) == [1, 3]
+    assert ids(small_index.search([1, 0, 0, 0], filter_criteria={"brand": ["puma", "Adidas"]})) == [2, 4]
+    assert ids(small_index.search([1, 0, 0, 0], filter_criteria={"brand": "nike", "color": "blue"})) == [3]
+
+
+def test_range_and_array_filters(small_index):
+    assert ids(small_index.search([1, 0, 0, 0], filter_criteria={"price": {"gte": 20, "lt": 40}})) == [2, 3]
+    assert ids(small_index.search([1, 0, 0, 0], filter_criteria={"in_stock_size": ["M"]})) == [1, 3]
+    # Điều kiện rỗng bị bỏ qua giống QdrantHandler
+    assert ids(small_index.search([1, 0, 0, 0], limit=4, filter_criteria={"brand": [], "price": {}})) == [1, 2, 3, 4]
+
+
+def test_exclude_delete_and_recommend(small_index):
+    assert ids(small_index.search([1, 0, 0, 0], limit=2, exclude_ids=[1])) == [2, 3]
+    assert ids(small_index.recommend_by_id(1, limit=2)) == [2, 3]
+    small_index.delete_points([2])
+    assert ids(small_index.recommend_by_id(1, limit=2)) == [3, 4]
+    assert small_index.recommend_by_id(2) is None
+    assert small_index.count() == 3
+
+
+def test_flush_and_reload(tmp_path, small_index):
+    small_index.flush()
+    reloaded = NumpyVectorIndex("products", 4, index_dir=str(tmp_path))
+    assert reloaded.count() == 4
+    assert ids(reloaded.search([1, 0, 0, 0], limit=2, filter_criteria={"color": "blue"})) == [2, 3]
+    np.testing.assert_allclose(reloaded.retrieve_vectors([4])[4], [0, 1, 0, 0])
+
+
+def test_ivf_recall_matches_brute_force(tmp_path, monkeypatch):
+    monkeypatch.setattr(local_index, "IVF_MIN_POINTS", 0)
+    rng = np.random.default_rng(0)
+    dim, n_clusters, per_cluster = 32, 40, 50
+    centers = rng.normal(size=(n_clusters, dim))
+    vectors = np.repeat(centers, per_cluster, axis=0) + 0.3 * rng.normal(size=(n_clusters * per_cluster, dim))
+
+    index = NumpyVectorIndex("products", dim, index_dir=str(tmp_path), collection_config={"ivf": True, "nprobe": 8})
+    index.upsert_points([point(i, v) for i, v in enumerate(vectors)])
+    index.flush()
+    assert "" in index._ivf_lists
+
+    queries = vectors[rng.choice(len(vectors), 50, replace=False)] + 0.1 * rng.normal(size=(50, dim))
+    recalls = []
+    for query in queries:
+        exact = set(ids(index.search(query, limit=10, exact=True)))
+        approx = set(ids(index.search(query, limit=10)))
+        recalls.append(len(exact & approx) / 10)
+    assert np.mean(recalls) >= 0.95
+
+    # Brute-force khớp với tính tay
+    normalized = np.stack([unit(v) for v in vectors])
+    expected = np.argsort(-(normalized @ unit(queries[0])))[:10]
+    assert ids(index.search(queries[0], limit=10, exact=True)) == list(expected)
+
+    # IVF vẫn áp dụng filter
+    filtered = index.search(queries[0], limit=5, filter_criteria={"price": {"gt": 100}})
+    assert filtered == []
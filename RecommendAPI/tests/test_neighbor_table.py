@@ -0,0 +1,147 @@
+import numpy as np
+import pytest
+from qdrant_client.http import models
+from vectordb.local_index import NumpyVectorIndex
+from vectordb.neighbor_table import (
+    NeighborTable, build_neighbor_table, fuse_neighbor_lists, load_neighbor_arrays, refresh_neighbor_table
+)
+from vectordb.fusion import reciprocal_rank_fusion
+
+DIM = 16
+K = 8
+
+
+def upsert(index, vectors):
+    index.upsert_points([
+        models.PointStruct(id=int(p_id), vector=list(map(float, v)), payload={"product_id": int(p_id)})
+        for p_id, v in vectors.items()
+    ])
+
+
+def make_sources(tmp_path, image, text):
+    sources = {}
+    for kind, vectors in (("image", image), ("text", text)):
+        index = NumpyVectorIndex(f"products_{kind}", DIM, index_dir=str(tmp_path / "index"))
+        upsert(index, vectors)
+        sources[kind] = (index, None)
+    return sources
+
+
+def random_vectors(rng, skus):
+    return {sku: rng.normal(size=DIM) for sku in skus}
+
+
+def brute_force(vectors, sku, k=K):
+    ids = np.array(sorted(vectors))
+    matrix = np.stack([vectors[i] / np.linalg.norm(vectors[i]) for i in ids])
+    scores = matrix @ (vectors[sku] / np.linalg.norm(vectors[sku]))
+    order = [i for i in np.argsort(-scores) if ids[i] != sku][:k]
+    return [int(ids[i]) for i in order]
+
+
+def tables_equal(path_a, path_b):
+    a, b = load_neighbor_arrays(str(path_a)), load_neighbor_arrays(str(path_b))
+    np.testing.assert_array_equal(a["skus"], b["skus"])
+    for kind in ("image", "text", "fused"):
+        np.testing.assert_array_equal(a[f"{kind}_ids"], b[f"{kind}_ids"], err_msg=kind)
+        np.testing.assert_allclose(a[f"{kind}_scores"].astype(np.float32), b[f"{kind}_scores"].astype(np.float32),
+                                   atol=2e-3, err_msg=kind)
+
+
+def test_build_matches_brute_force_and_serves_lookups(tmp_path):
+    rng = np.random.default_rng(0)
+    image = random_vectors(rng, range(100, 160))
+    # SKU 160-169 chỉ có vector text, 100-104 không có vector text
+    text = random_vectors(rng, range(105, 170))
+    path = tmp_path / "neighbors"
+    build_neighbor_table(make_sources(tmp_path, image, text), path=str(path), k=K)
+
+    table = NeighborTable(str(path), check_interval=0)
+    assert table.available and table.k == K
+    for sku in (100, 120, 159):
+        assert table.neighbors(sku, "image", K) == brute_force(image, sku)
+    assert table.neighbors(165, "image", K) == []
+    assert table.neighbors(165, "text", K) == brute_force(text, 165)
+    assert table.neighbors(100, "text", K) == []
+    assert table.neighbors(999) is None
+
+
+def test_fused_rows_match_rrf():
+    image_ids = np.array([[1, 2, 3, -1], [4, 5, -1, -1]])
+    text_ids = np.array([[3, 1, 6, 7], [-1, -1, -1, -1]])
+    fused_ids, _ = fuse_neighbor_lists(image_ids, text_ids, k=4)
+
+    def hits(row):
+        return [models.ScoredPoint(id=0, version=0, score=0, payload={"product_id": int(i)}) for i in row if i >= 0]
+
+    for row in range(2):
+        expected = [p for p, _ in reciprocal_rank_fusion([hits(image_ids[row]), hits(text_ids[row])], limit=4)]
+        assert [int(i) for i in fused_ids[row] if i >= 0] == expected
+
+
+@pytest.mark.parametrize("seed", range(6))
+def test_incremental_refresh_equals_full_rebuild(tmp_path, seed):
+    rng = np.random.default_rng(seed)
+    skus = list(range(1000, 1200))
+    image, text = random_vectors(rng, skus), random_vectors(rng, skus)
+    sources = make_sources(tmp_path, image, text)
+    refreshed_path = tmp_path / "refreshed"
+    build_neighbor_table(sources, path=str(refreshed_path), k=K)
+    before = load_neighbor_arrays(str(refreshed_path))
+
+    # Đổi vector, thêm SKU mới, xoá SKU (kể cả SKU đang là neighbor của nhiều hàng) và xoá riêng vector ảnh
+    counts = np.bincount(before["image_ids"][before["image_ids"] >= 0].astype(np.int64) - 1000)
+    popular = [int(s) + 1000 for s in counts.argsort()[-5:]]
+    changed = [int(s) for s in rng.choice(skus, 15, replace=False)] + [1200, 1201, 1202]
+    removed = [s for s in popular if s not in changed][:3]
+    lost_image = [int(s) for s in rng.choice(skus, 3, replace=False) if s not in changed and s not in removed]
+
+    new_vectors = {sku: rng.normal(size=DIM) for sku in changed}
+    for kind, vectors in (("image", image), ("text", text)):
+        index = sources[kind][0]
+        vectors.update(new_vectors)
+        upsert(index, new_vectors)
+        index.delete_points(removed)
+        for sku in removed:
+            vectors.pop(sku)
+    sources["image"][0].delete_vectors(lost_image, [""])
+    for sku in lost_image:
+        image.pop(sku)
+
+    # Giống stats của incremental ingest: SKU mất ảnh nằm trong changed_ids, removed_ids chỉ gồm SKU bị xoá hẳn
+    refresh_neighbor_table(changed + lost_image, removed, sources=sources, path=str(refreshed_path))
+    rebuilt_path = tmp_path / "rebuilt"
+    build_neighbor_table(sources, path=str(rebuilt_path), k=K)
+    tables_equal(refreshed_path, rebuilt_path)
+
+    after = load_neighbor_arrays(str(refreshed_path))
+    assert after["version"] != before["version"]
+    assert not np.isin(after["image_ids"], removed + lost_image).any()
+    assert not np.isin(after["text_ids"], removed).any()
+
+
+def test_refresh_without_table_builds_from_scratch(tmp_path):
+    rng = np.random.default_rng(3)
+    image, text = random_vectors(rng, range(30)), random_vectors(rng, range(30))
+    sources = make_sources(tmp_path, image, text)
+    path = tmp_path / "neighbors"
+    refresh_neighbor_table([1], [], sources=sources, path=str(path))
+    table = NeighborTable(str(path), check_interval=0)
+    assert table.neighbors(5, "text", 5) == brute_force(text, 5, 5)
+
+
+def test_neighbor_table_reloads_new_version(tmp_path):
+    rng = np.random.default_rng(4)
+    image, text = random_vectors(rng, range(20)), random_vectors(rng, range(20))
+    sources = make_sources(tmp_path, image, text)
+    path = tmp_path / "neighbors"
+    build_neighbor_table(sources, path=str(path), k=K)
+    table = NeighborTable(str(path), check_interval=0)
+    assert table.neighbors(25) is None
+
+    new = {25: rng.normal(size=DIM)}
+    for kind, vectors in (("image", image), ("text", text)):
+        vectors.update(new)
+        upsert(sources[kind][0], new)
+    refresh_neighbor_table([25], [], sources=sources, path=str(path))
+    assert table.neighbors(25, "image", K) == brute_force(image, 25)
@@ -0,0 +1,64 @@
+import numpy as np
+import pytest
+from api.personalization import ProfileStore, UserProfile
+
+HALF_LIFE = 100.0
+
+
+def test_profile_decays_older_events():
+    profile = UserProfile()
+    profile.add(np.array([1.0, 0.0]), 1.0, timestamp=0.0, half_life=HALF_LIFE)
+    profile.add(np.array([0.0, 1.0]), 1.0, timestamp=HALF_LIFE, half_life=HALF_LIFE)
+    np.testing.assert_allclose(profile.vector, [0.5, 1.0])
+    assert profile.ref_time == HALF_LIFE
+
+    # Event đến trễ được decay riêng, kết quả giống như cộng theo đúng thứ tự thời gian
+    late = UserProfile()
+    late.add(np.array([0.0, 1.0]), 1.0, timestamp=HALF_LIFE, half_life=HALF_LIFE)
+    late.add(np.array([1.0, 0.0]), 1.0, timestamp=0.0, half_life=HALF_LIFE)
+    np.testing.assert_allclose(late.vector, profile.vector)
+
+    query = np.array(profile.query_vector())
+    assert np.linalg.norm(query) == pytest.approx(1.0)
+    assert UserProfile().query_vector() is None
+
+
+def test_pending_events_dedupes_resent_history():
+    store = ProfileStore(half_life=HALF_LIFE)
+    profile = store.get("u1", "image")
+    events = [(1, 10.0, 1.0), (2, None, 1.0), (1, 20.0, 2.0)]
+
+    pending = store.pending_events(profile, events)
+    assert [(sku, weight) for sku, _, weight, _ in pending] == [(1, 1.0), (2, 1.0), (1, 2.0)]
+    # Event không có timestamp được tính là lúc nhận nhưng key ổn định
+    assert pending[1][1] > 20.0 and pending[1][3] == (2, None)
+
+    # Client gửi lại cả lịch sử: chỉ event mới được cộng
+    assert store.pending_events(profile, events + [(3, 30.0, 1.0)]) == [(3, 30.0, 1.0, (3, 30.0))]
+
+
+def test_release_allows_retry_after_failure():
+    store = ProfileStore(half_life=HALF_LIFE)
+    profile = store.get("u1", "text")
+    pending = store.pending_events(profile, [(1, 10.0, 1.0), (2, None, 1.0)])
+    store.release(profile, pending)
+    retry = store.pending_events(profile, [(1, 10.0, 1.0), (2, None, 1.0)])
+    assert [key for _, _, _, key in retry] == [(1, 10.0), (2, None)]
+
+
+def test_apply_marks_seen_and_skips_unindexed_products():
+    store = ProfileStore(half_life=HALF_LIFE)
+    profile = store.get("u1", "image")
+    pending = store.pending_events(profile, [(2, 20.0, 1.0), (1, 10.0, 1.0), (3, 30.0, 1.0)])
+    store.apply(profile, pending, {1: np.array([1.0, 0.0]), 2: np.array([0.0, 1.0])})
+    assert list(profile.seen) == [1, 2, 3]
+    assert profile.ref_time == 20.0
+    np.testing.assert_allclose(profile.vector, [2 ** -0.1, 1.0], rtol=1e-6)
+
+
+def test_profiles_are_cached_per_user_and_kind():
+    store = ProfileStore()
+    assert store.get("u1", "image") is store.get("u1", "image")
+    assert store.get("u1", "image") is not store.get("u1", "text")
+    # User ẩn danh: profile tạm, không lưu
+    assert store.get(None, "image") is not store.get(None, "image")
@@ -0,0 +1,52 @@
+import ast
+import pytest
+from embedding.preprocess import description_text, parse_list_cell, parse_literal
+
+LITERALS = [
+    "[4, 6, 8]",
+    "['S', 'M', 'L']",
+    "[]",
+    "[{'Product Details': 'Coats & Jackets by Nike'}, {'Brand': 'Nike'}]",
+    # Dấu nháy / escape bên trong chuỗi
+    "[{'Size & Fit': 'Model\\'s height: 174cm/5\\'8.5\"'}]",
+    '["it\'s", "say \\"hi\\""]',
+    "['tab\\there', 'new\\nline', 'back\\\\slash', 'slash/ok']",
+    "['caf\\xe9', '\\u00e9t\\u00e9']",
+    "['Tiếng Việt', '日本語']",
+    "[True, False, None, 'None', 'True story']",
+    "[-1, 2.5, 1e3, 0]",
+    "{'a': [1, {'b': None}], 'c': 'd'}",
+    "'plain string'",
+    "12",
+    # Cú pháp JSON không biểu diễn được -> fallback sang ast
+    "[(1, 2), (3, 4)]",
+    "{1: 'int key'}",
+    "['bell\\a', 'nul\\0']",
+]
+
+
+@pytest.mark.parametrize("text", LITERALS)
+def test_parse_literal_matches_ast_literal_eval(text):
+    assert parse_literal(text) == ast.literal_eval(text)
+
+
+@pytest.mark.parametrize("text", ["[1, 2", "[foo]", "", "['a' 'b'", "__import__('os')"])
+def test_parse_literal_rejects_invalid_input(text):
+    with pytest.raises(ValueError):
+        parse_literal(text)
+
+
+def test_parse_list_cell_keeps_non_list_values():
+    assert parse_list_cell("['S', 'M']") == ["S", "M"]
+    assert parse_list_cell(["S"]) == ["S"]
+    assert parse_list_cell("[broken") == "[broken"
+    assert parse_list_cell("[not valid]") == "[not valid]"
+    assert parse_list_cell(None) is None
+
+
+def test_description_text_joins_values():
+    raw = "[{'Product Details': 'Hoodie'}, {'Brand': 'Nike'}, {'About Me': None}]"
+    assert description_text(raw) == "Hoodie. Nike"
+    assert description_text(ast.literal_eval(raw)) == "Hoodie. Nike"
+    assert description_text(None) == ""
+    assert description_text(float("nan")) == ""
@@ -0,0 +1,64 @@
+from types import SimpleNamespace
+import pytest
+from api import query_cache
+from api.query_cache import QueryCache, TTLCache
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(query_cache, "time", SimpleNamespace(monotonic=clock))
+    return clock
+
+
+def test_ttl_cache_expires_entries(clock):
+    cache = TTLCache(max_size=10, ttl_seconds=5)
+    cache.put("a", 1)
+    clock.now += 4
+    assert cache.get("a") == 1
+    clock.now += 2
+    assert cache.get("a") is None
+    assert cache.stats()["hits"] == 1 and cache.stats()["misses"] == 1
+
+
+def test_ttl_cache_evicts_least_recently_used():
+    cache = TTLCache(max_size=2, ttl_seconds=60)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    cache.get("a")
+    cache.put("c", 3)
+    assert cache.get("b") is None
+    assert cache.get("a") == 1 and cache.get("c") == 3
+    assert cache.stats()["evictions"] == 1
+
+
+def test_normalize_query_and_result_key_ignore_formatting():
+    assert QueryCache.normalize_query("  Red   DRESS ") == "red dress"
+    key_a = QueryCache.result_key("text", "red dress", {"brand": ["nike"], "price": {"gte": 1}}, 12)
+    key_b = QueryCache.result_key("text", "red dress", {"price": {"gte": 1}, "brand": ["nike"]}, 12)
+    assert key_a == key_b
+    assert key_a != QueryCache.result_key("text", "red dress", None, 12)
+    assert key_a != QueryCache.result_key("text", "red dress", {"brand": ["nike"], "price": {"gte": 1}}, 24)
+
+
+def test_index_version_change_clears_results_but_keeps_embeddings(tmp_path):
+    version_path = tmp_path / "index_version"
+    version_path.write_text("1")
+    cache = QueryCache(version_path=str(version_path), check_interval=0)
+    cache.put_embedding("red dress", [0.1, 0.2])
+    key = QueryCache.result_key("text", "red dress", None, 12)
+    cache.put_results(key, [1, 2, 3])
+    assert cache.get_results(key) == [1, 2, 3]
+
+    version_path.write_text("2")
+    assert cache.get_results(key) is None
+    assert cache.get_embedding("red dress") == [0.1, 0.2]
+    assert cache.stats()["invalidations"] == 1
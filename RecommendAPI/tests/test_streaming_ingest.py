@@ -0,0 +1,107 @@
+import json
+import tracemalloc
+import numpy as np
+from embedding import ingest
+
+
+class FakeEncoder:
+    cache_name = "fake-clip"
+
+    def __init__(self, *args, **kwargs):
+        pass
+
+    def load(self, kind):
+        return self
+
+    def encode(self, inputs, batch_size=32, **_):
+        return np.zeros((len(inputs), 512), dtype=np.float32)
+
+
+class FakeTextPreparer:
+    signature = "fake"
+
+    def __init__(self, encoder):
+        self.encoder = encoder
+
+    def encode(self, texts, batch_size=None):
+        return self.encoder.encode(texts)
+
+
+class FakeHandler:
+    """Vector store chỉ đếm số point, không giữ lại point nào"""
+
+    def __init__(self):
+        self.count = 0
+
+    def begin_bulk_load(self):
+        pass
+
+    def end_bulk_load(self, wait=True):
+        pass
+
+    def upload_points(self, points):
+        self.count += len(points)
+
+    def flush(self):
+        pass
+
+
+def make_ingestor(monkeypatch, tmp_path, csv_path):
+    monkeypatch.setattr(ingest, "LazyClipEncoder", FakeEncoder)
+    monkeypatch.setattr(ingest, "TextPreparer", FakeTextPreparer)
+    monkeypatch.setattr(ingest, "open_collections", lambda layout: {"text_db": FakeHandler(), "image_db": FakeHandler()})
+    monkeypatch.setattr(ingest, "mark_index_updated", lambda: None)
+    return ingest.DataIngestion(
+        csv_path=str(csv_path), images_folder=str(tmp_path / "images"), layout="split", streaming=True,
+        dead_letter_path=str(tmp_path / "dead_letter.jsonl")
+    )
+
+
+def write_catalog(path, rows):
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("sku,name,brand,color,price,in_stock_size,description\n")
+        for i in range(rows):
+            f.write(f"{100000 + i},Dress {i},Brand {i % 50},Red,{10 + i % 90}.5,\"['S', 'M']\",Soft cotton dress {i}\n")
+    return path
+
+
+def peak_streaming_memory(monkeypatch, tmp_path, rows):
+    source = write_catalog(tmp_path / f"catalog_{rows}.csv", rows)
+    ingestor = make_ingestor(monkeypatch, tmp_path, source)
+    tracemalloc.start()
+    try:
+        stats = ingestor.process_and_ingest_streaming(batch_size=64, num_workers=2, chunk_size=250)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    assert stats["products"] == rows
+    assert ingestor.text_db.count == rows
+    return peak
+
+
+def test_streaming_ingest_disables_embedding_cache(monkeypatch, tmp_path):
+    source = write_catalog(tmp_path / "catalog.csv", 3)
+    ingestor = make_ingestor(monkeypatch, tmp_path, source)
+    assert ingestor.cache is None and ingestor.df is None
+
+
+def test_streaming_ingest_memory_flat_across_chunk_counts(monkeypatch, tmp_path):
+    # 4 chunk so với 20 chunk: RAM chỉ phụ thuộc chunk / batch đang xử lý, không tăng theo số dòng
+    # (bật cache embedding thì index key của cache làm peak tăng ~2 lần)
+    small = peak_streaming_memory(monkeypatch, tmp_path, 1000)
+    large = peak_streaming_memory(monkeypatch, tmp_path, 5000)
+    assert large < small * 1.3
+
+
+def test_streaming_ingest_records_failures_in_dead_letter(monkeypatch, tmp_path):
+    source = write_catalog(tmp_path / "catalog.csv", 3)
+    with open(source, "a", encoding="utf-8") as f:
+        f.write("not-a-sku,Broken,Brand,Red,1.0,[],Broken row\n")
+    ingestor = make_ingestor(monkeypatch, tmp_path, source)
+    stats = ingestor.process_and_ingest_streaming(batch_size=2, num_workers=1, chunk_size=2)
+    assert stats["products"] == 3
+
+    with open(tmp_path / "dead_letter.jsonl", "r", encoding="utf-8") as f:
+        records = [json.loads(line) for line in f]
+    assert sorted((r["stage"], r["row"]) for r in records) == [("image", 0), ("image", 1), ("image", 2), ("row", 3)]
+    assert next(r for r in records if r["stage"] == "row")["error"] == "invalid sku"
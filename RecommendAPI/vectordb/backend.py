@@ -0,0 +1,57 @@
+from abc import ABC, abstractmethod
+from typing import Dict, List, Optional
+
+
+class VectorBackend(ABC):
+    """
+    Interface chung của vector store mà ingest / API dùng (QdrantHandler, NumpyVectorIndex).
+    Kết quả search trả về danh sách hit có .id, .score, .payload (giống ScoredPoint của Qdrant).
+    """
+
+    @abstractmethod
+    def upsert_points(self, points: List):
+        ...
+
+    @abstractmethod
+    def delete_points(self, point_ids: List[int]):
+        ...
+
+    @abstractmethod
+    def delete_vectors(self, point_ids: List[int], vector_names: List[str]):
+        ...
+
+    @abstractmethod
+    def search(self, query_vector: List[float], limit: int = 12, filter_criteria: Optional[Dict] = None,
+               using: Optional[str] = None, **search_kwargs):
+        ...
+
+    @abstractmethod
+    def recommend_by_id(self, point_id: int, limit: int = 12, filter_criteria: Optional[Dict] = None,
+                        using: Optional[str] = None):
+        ...
+
+    @abstractmethod
+    def retrieve_vectors(self, point_ids: List[int], using: Optional[str] = None):
+        """Vector đã lưu của 1 nhóm point -> {id: vector}"""
+        ...
+
+    @abstractmethod
+    def fetch_vectors(self, using: Optional[str] = None):
+        """Toàn bộ vector đang lưu -> (ids int64, ma trận float32), dùng cho các job offline"""
+        ...
+
+    def upload_points(self, points: List):
+        """Upsert không chờ ghi xong (bulk load). Mặc định giống upsert_points"""
+        self.upsert_points(points)
+
+    def begin_bulk_load(self):
+        """Bắt đầu full rebuild: backend có thể tạm tắt việc build index cho đến end_bulk_load()"""
+        pass
+
+    def end_bulk_load(self, wait: bool = True):
+        """Bật lại index; wait=True thì chờ index build xong"""
+        pass
+
+    def flush(self):
+        """Ghi phần dữ liệu còn đệm xuống storage. Qdrant ghi ngay khi upsert nên không cần làm gì."""
+        pass
@@ -0,0 +1,85 @@
+import queue
+import threading
+from typing import Callable, List
+from vectordb.qdrant_client_handler import QDRANT_UPLOAD_WORKERS
+
+
+class BulkUploader:
+    """
+    Upload point lên vector store trên các thread nền (handler.upload_points, wait=False), để thread encode không
+    phải chờ round-trip mạng của từng batch. Queue có giới hạn: upload chậm hơn encode thì submit() bị chặn lại
+    (backpressure) thay vì dồn point trong RAM.
+
+    after_uploaded(callback) chạy callback khi mọi batch đã submit trước đó upload xong (theo đúng thứ tự submit),
+    dùng để ghi checkpoint chỉ cho phần đã thực sự lên vector store.
+    """
+
+    def __init__(self, num_workers: int = QDRANT_UPLOAD_WORKERS, max_pending: int = None):
+        self._queue = queue.Queue(maxsize=max_pending or 2 * num_workers)
+        self._lock = threading.Lock()
+        self._error = None
+        self._submitted = 0
+        self._done = set()
+        self._done_upto = 0
+        self._callbacks = []
+        self._workers = [
+            threading.Thread(target=self._work, name=f"bulk-upload-{i}", daemon=True) for i in range(num_workers)
+        ]
+        for worker in self._workers:
+            worker.start()
+
+    def _work(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            seq, handler, points = item
+            try:
+                if self._error is None:
+                    handler.upload_points(points)
+            except Exception as e:
+                self._error = self._error or e
+            finally:
+                self._complete(seq)
+
+    def _complete(self, seq):
+        with self._lock:
+            self._done.add(seq)
+            while self._done_upto + 1 in self._done:
+                self._done_upto += 1
+                self._done.discard(self._done_upto)
+            ready = [cb for upto, cb in self._callbacks if upto <= self._done_upto]
+            self._callbacks = [(upto, cb) for upto, cb in self._callbacks if upto > self._done_upto]
+            # Chạy trong lock để các callback (ghi checkpoint) không chạy chồng / đảo thứ tự
+            if self._error is None:
+                for callback in ready:
+                    callback()
+
+    def _raise_error(self):
+        if self._error is not None:
+            raise self._error
+
+    def submit(self, handler, points: List):
+        self._raise_error()
+        if not points:
+            return
+        with self._lock:
+            self._submitted += 1
+            seq = self._submitted
+        self._queue.put((seq, handler, points))
+
+    def after_uploaded(self, callback: Callable[[], None]):
+        with self._lock:
+            if self._done_upto >= self._submitted:
+                if self._error is None:
+                    callback()
+                return
+            self._callbacks.append((self._submitted, callback))
+
+    def close(self):
+        """Chờ upload hết các batch còn trong queue, dừng worker; có batch lỗi thì raise lỗi đầu tiên"""
+        for _ in self._workers:
+            self._queue.put(None)
+        for worker in self._workers:
+            worker.join()
+        self._raise_error()
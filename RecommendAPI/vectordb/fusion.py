@@ -0,0 +1,55 @@
+from collections import defaultdict
+from typing import Dict, List, Optional, Sequence, Tuple
+
+# Hằng số k chuẩn của RRF (Cormack et al.), làm mượt chênh lệch giữa các hạng đầu
+RRF_K = 60
+
+
+def _hit_id(hit):
+    if hit.payload and 'product_id' in hit.payload:
+        return hit.payload['product_id']
+    return None
+
+
+def reciprocal_rank_fusion(result_lists: Sequence[List], weights: Optional[Sequence[float]] = None,
+                           limit: int = 12, k: int = RRF_K) -> List[Tuple[int, float]]:
+    """
+    Gộp nhiều danh sách kết quả Qdrant theo thứ hạng: score = sum(w / (k + rank)).
+    Không phụ thuộc thang điểm của từng collection. Trả về [(product_id, score)] đã bỏ trùng.
+    """
+    weights = weights or [1.0] * len(result_lists)
+    scores: Dict[int, float] = defaultdict(float)
+    for hits, weight in zip(result_lists, weights):
+        for rank, hit in enumerate(hits, start=1):
+            product_id = _hit_id(hit)
+            if product_id is not None:
+                scores[product_id] += weight / (k + rank)
+    return sorted(scores.items(), key=lambda item: item[1], reverse=True)[:limit]
+
+
+def weighted_score_fusion(result_lists: Sequence[List], weights: Optional[Sequence[float]] = None,
+                          limit: int = 12) -> List[Tuple[int, float]]:
+    """
+    Gộp theo điểm cosine: score = sum(w * score). Sản phẩm không có trong 1 danh sách được tính 0 ở danh sách đó.
+    """
+    weights = weights or [1.0] * len(result_lists)
+    scores: Dict[int, float] = defaultdict(float)
+    for hits, weight in zip(result_lists, weights):
+        for hit in hits:
+            product_id = _hit_id(hit)
+            if product_id is not None:
+                scores[product_id] += weight * hit.score
+    return sorted(scores.items(), key=lambda item: item[1], reverse=True)[:limit]
+
+
+FUSION_METHODS = {
+    "rrf": reciprocal_rank_fusion,
+    "weighted": weighted_score_fusion,
+}
+
+
+def fuse(result_lists: Sequence[List], method: str = "rrf", weights: Optional[Sequence[float]] = None,
+         limit: int = 12) -> List[Tuple[int, float]]:
+    if method not in FUSION_METHODS:
+        raise ValueError(f"Unknown fusion method '{method}', expected one of {list(FUSION_METHODS)}")
+    return FUSION_METHODS[method](result_lists, weights=weights, limit=limit)
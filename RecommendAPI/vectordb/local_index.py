@@ -0,0 +1,400 @@
+import asyncio
+import json
+import os
+import threading
+from typing import Dict, List, Optional
+import numpy as np
+from qdrant_client.http import models
+from vectordb.backend import VectorBackend
+from vectordb.qdrant_client_handler import NORMALIZED_FIELDS, RANGE_OPERATORS, normalize_keyword
+
+LOCAL_INDEX_DIR = os.getenv("LOCAL_INDEX_DIR", os.path.join("data", "local_index"))
+# IVF chỉ có lợi khi catalogue đủ lớn, dưới ngưỡng này brute-force 1 phép nhân ma trận đã đủ nhanh
+IVF_MIN_POINTS = int(os.getenv("LOCAL_INDEX_IVF_MIN_POINTS", "50000"))
+DEFAULT_VECTOR = ""  # tên vector của collection 1 vector không tên
+
+
+def _normalize_rows(matrix: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return (matrix / norms).astype(np.float32)
+
+
+def _save_array(path: str, array: np.ndarray):
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as f:
+        np.save(f, array)
+    os.replace(tmp_path, path)
+
+
+class NumpyVectorIndex(VectorBackend):
+    """
+    Vector index thuần NumPy, không cần Qdrant server (edge deploy / CI).
+    - Mỗi named vector là 1 ma trận float32 đã L2-normalize, lưu file .npy và load lại bằng mmap.
+    - Top-k: 1 phép nhân ma trận + argpartition; filter payload bằng boolean mask
+      (cùng cú pháp filter_criteria với QdrantHandler: giá trị đơn, list any-of, dict range).
+    - IVF (tuỳ chọn, collection_config={"ivf": True}): chia vector thành sqrt(N) cluster bằng k-means,
+      lúc search chỉ chấm điểm `nprobe` cluster gần query nhất.
+    Upsert được đệm trong RAM và gộp lại khi search / flush; flush() ghi xuống đĩa.
+    """
+
+    def __init__(self, collection_name: str, vector_size: int, vector_names: Optional[List[str]] = None,
+                 vector_name: Optional[str] = None, collection_config: Optional[Dict] = None,
+                 index_dir: str = LOCAL_INDEX_DIR, **_):
+        config = collection_config or {}
+        self.collection_name = collection_name
+        self.vector_size = vector_size
+        self.vector_names = list(vector_names) if vector_names else [DEFAULT_VECTOR]
+        self.vector_name = vector_name
+        self.ivf = config.get("ivf", os.getenv("LOCAL_INDEX_IVF", "false").lower() in ("1", "true", "yes"))
+        self.nprobe = config.get("nprobe", 8)
+        self.path = os.path.join(index_dir, collection_name)
+
+        self._lock = threading.RLock()
+        self._pending: Dict[int, tuple] = {}
+        self._deleted = set()
+        self._load()
+
+    # --- Storage ---
+    def _file(self, name: str) -> str:
+        return os.path.join(self.path, name)
+
+    def _vector_file(self, name: str, prefix: str = "vectors") -> str:
+        return self._file(f"{prefix}_{name or 'default'}.npy")
+
+    def _reset_state(self, ids, payloads, vectors, present):
+        self._ids = ids
+        self._payloads = payloads
+        self._vectors = vectors
+        self._present = present
+        self._row = {int(p_id): row for row, p_id in enumerate(ids)}
+        self._columns = {}
+        self._inverted = {}
+        self._ivf_lists = {}
+
+    def _load(self):
+        meta_path = self._file("meta.json")
+        if not os.path.exists(meta_path):
+            empty = {name: np.zeros((0, self.vector_size), dtype=np.float32) for name in self.vector_names}
+            self._reset_state(np.zeros(0, dtype=np.int64), [], empty,
+                              {name: np.zeros(0, dtype=bool) for name in self.vector_names})
+            return
+
+        with open(meta_path, "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        with open(self._file("payloads.json"), "r", encoding="utf-8") as f:
+            payloads = json.load(f)
+        self._reset_state(
+            np.load(self._file("ids.npy")),
+            payloads,
+            {name: np.load(self._vector_file(name), mmap_mode="r") for name in meta["vector_names"]},
+            {name: np.load(self._vector_file(name, "present")) for name in meta["vector_names"]},
+        )
+        for name in meta["vector_names"]:
+            ivf_path = self._vector_file(name, "ivf").replace(".npy", ".npz")
+            if os.path.exists(ivf_path):
+                data = np.load(ivf_path)
+                self._ivf_lists[name] = (data["centroids"], data["order"], data["offsets"])
+        print(f"[INFO] Loaded local index '{self.collection_name}': {len(self._ids)} points")
+
+    def flush(self):
+        with self._lock:
+            self._consolidate()
+            if self.ivf and len(self._ids) >= IVF_MIN_POINTS:
+                for name in self.vector_names:
+                    self._build_ivf(name)
+
+            os.makedirs(self.path, exist_ok=True)
+            for name in self.vector_names:
+                _save_array(self._vector_file(name), np.ascontiguousarray(self._vectors[name]))
+                _save_array(self._vector_file(name, "present"), self._present[name])
+                ivf_path = self._vector_file(name, "ivf").replace(".npy", ".npz")
+                if name in self._ivf_lists:
+                    centroids, order, offsets = self._ivf_lists[name]
+                    np.savez(ivf_path, centroids=centroids, order=order, offsets=offsets)
+                elif os.path.exists(ivf_path):
+                    os.remove(ivf_path)
+            _save_array(self._file("ids.npy"), self._ids)
+            with open(self._file("payloads.json"), "w", encoding="utf-8") as f:
+                json.dump(self._payloads, f, ensure_ascii=False)
+            # meta.json ghi cuối cùng: có meta nghĩa là các file khác đã ghi xong
+            with open(self._file("meta.json"), "w", encoding="utf-8") as f:
+                json.dump({"vector_size": self.vector_size, "vector_names": self.vector_names,
+                           "count": int(len(self._ids))}, f)
+
+    # --- Ghi ---
+    def upsert_points(self, points: List[models.PointStruct]):
+        with self._lock:
+            for point in points:
+                vectors = point.vector if isinstance(point.vector, dict) else {DEFAULT_VECTOR: point.vector}
+                self._pending[int(point.id)] = (vectors, point.payload or {})
+                self._deleted.discard(int(point.id))
+
+    def delete_points(self, point_ids: List[int]):
+        with self._lock:
+            for p_id in point_ids:
+                self._pending.pop(int(p_id), None)
+                self._deleted.add(int(p_id))
+
+    def delete_vectors(self, point_ids: List[int], vector_names: List[str]):
+        with self._lock:
+            self._consolidate()
+            for name in vector_names:
+                present = np.array(self._present[name])
+                for p_id in point_ids:
+                    row = self._row.get(int(p_id))
+                    if row is not None:
+                        present[row] = False
+                self._present[name] = present
+
+    def _consolidate(self):
+        """Gộp các upsert / delete đang đệm vào ma trận (1 lần vstack cho cả nhóm)"""
+        if not self._pending and not self._deleted:
+            return
+        replaced = self._deleted | set(self._pending)
+        keep = np.fromiter((int(p_id) not in replaced for p_id in self._ids), dtype=bool, count=len(self._ids))
+
+        new_ids = list(self._pending)
+        ids = np.concatenate([self._ids[keep], np.asarray(new_ids, dtype=np.int64)])
+        payloads = [p for p, k in zip(self._payloads, keep) if k] + [self._pending[i][1] for i in new_ids]
+
+        vectors, present = {}, {}
+        for name in self.vector_names:
+            block = np.zeros((len(new_ids), self.vector_size), dtype=np.float32)
+            block_present = np.zeros(len(new_ids), dtype=bool)
+            for i, p_id in enumerate(new_ids):
+                vector = self._pending[p_id][0].get(name)
+                if vector is not None:
+                    block[i] = vector
+                    block_present[i] = True
+            vectors[name] = np.vstack([np.asarray(self._vectors[name])[keep], _normalize_rows(block)])
+            present[name] = np.concatenate([self._present[name][keep], block_present])
+
+        self._pending = {}
+        self._deleted = set()
+        self._reset_state(ids, payloads, vectors, present)
+
+    # --- IVF ---
+    def _build_ivf(self, name: str, n_lists: Optional[int] = None, iterations: int = 10, seed: int = 0):
+        """Spherical k-means trên 1 mẫu dữ liệu, sau đó gán toàn bộ vector vào cluster gần nhất"""
+        matrix = self._vectors[name]
+        rows = np.flatnonzero(self._present[name])
+        if len(rows) == 0:
+            return
+        n_lists = n_lists or max(1, int(np.sqrt(len(rows))))
+        rng = np.random.default_rng(seed)
+        sample = np.asarray(matrix[rng.choice(rows, size=min(len(rows), n_lists * 64), replace=False)])
+        centroids = sample[rng.choice(len(sample), size=min(n_lists, len(sample)), replace=False)].copy()
+
+        for _ in range(iterations):
+            assign = np.argmax(sample @ centroids.T, axis=1)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, assign, sample)
+            filled = np.bincount(assign, minlength=len(centroids)) > 0
+            centroids[filled] = _normalize_rows(sums[filled])
+
+        assignments = np.full(len(matrix), len(centroids), dtype=np.int32)  # vector không có -> list "rỗng" cuối
+        for start in range(0, len(rows), 65536):
+            block = rows[start:start + 65536]
+            assignments[block] = np.argmax(np.asarray(matrix[block]) @ centroids.T, axis=1)
+        order = np.argsort(assignments, kind="stable").astype(np.int64)
+        offsets = np.searchsorted(assignments[order], np.arange(len(centroids) + 1)).astype(np.int64)
+        self._ivf_lists[name] = (centroids, order, offsets)
+
+    def _ivf_candidates(self, name: str, query: np.ndarray) -> Optional[np.ndarray]:
+        if name not in self._ivf_lists:
+            return None
+        centroids, order, offsets = self._ivf_lists[name]
+        nprobe = min(self.nprobe, len(centroids))
+        probes = np.argpartition(-(centroids @ query), nprobe - 1)[:nprobe]
+        return np.concatenate([order[offsets[c]:offsets[c + 1]] for c in probes])
+
+    # --- Filter ---
+    def _column(self, field: str) -> list:
+        if field not in self._columns:
+            self._columns[field] = [p.get(field) if p else None for p in self._payloads]
+        return self._columns[field]
+
+    def _inverted_index(self, field: str) -> Dict:
+        """value -> các row có value đó (với field dạng mảng như in_stock_size thì index từng phần tử)"""
+        if field not in self._inverted:
+            index: Dict = {}
+            for row, value in enumerate(self._column(field)):
+                for v in (value if isinstance(value, list) else [value]):
+                    try:
+                        index.setdefault(v, []).append(row)
+                    except TypeError:
+                        continue  # giá trị không hash được (dict, ...) thì không lọc theo được
+            self._inverted[field] = {v: np.asarray(rows, dtype=np.int64) for v, rows in index.items()}
+        return self._inverted[field]
+
+    def _condition_mask(self, key: str, value) -> Optional[np.ndarray]:
+        n = len(self._ids)
+        if isinstance(value, dict):
+            bounds = {op: value[op] for op in RANGE_OPERATORS if value.get(op) is not None}
+            if not bounds:
+                return None
+            column = np.array([v if isinstance(v, (int, float)) else np.nan for v in self._column(key)], dtype=float)
+            mask = ~np.isnan(column)
+            for op, bound in bounds.items():
+                mask &= {"gt": np.greater, "gte": np.greater_equal, "lt": np.less, "lte": np.less_equal}[op](
+                    np.nan_to_num(column), bound
+                )
+            return mask
+
+        values = list(value) if isinstance(value, (list, tuple, set)) else [value]
+        values = [v for v in values if v is not None and str(v).strip() != ""]
+        if not values:
+            return None
+        if key in NORMALIZED_FIELDS:
+            key = NORMALIZED_FIELDS[key]
+            values = [normalize_keyword(v) for v in values]
+        index = self._inverted_index(key)
+        mask = np.zeros(n, dtype=bool)
+        for v in values:
+            rows = index.get(v)
+            if rows is not None:
+                mask[rows] = True
+        return mask
+
+    def _filter_mask(self, filter_criteria: Optional[Dict]) -> Optional[np.ndarray]:
+        mask = None
+        for key, value in (filter_criteria or {}).items():
+            condition = self._condition_mask(key, value)
+            if condition is not None:
+                mask = condition if mask is None else mask & condition
+        return mask
+
+    # --- Search ---
+    def _resolve_name(self, using: Optional[str]) -> str:
+        name = using or self.vector_name or DEFAULT_VECTOR
+        if name not in self._vectors:
+            raise ValueError(f"Vector '{name}' does not exist in local index '{self.collection_name}'")
+        return name
+
+    def _top_k(self, name: str, query: np.ndarray, limit: int, filter_criteria: Optional[Dict],
+               exact: bool = False, exclude_rows: Optional[List[int]] = None):
+        matrix = self._vectors[name]
+        mask = self._present[name]
+        filter_mask = self._filter_mask(filter_criteria)
+        if filter_mask is not None:
+            mask = mask & filter_mask
+        if exclude_rows:
+            mask = mask.copy()
+            mask[exclude_rows] = False
+
+        candidates = None if exact else self._ivf_candidates(name, query)
+        if candidates is not None:
+            rows = candidates[mask[candidates]]
+        elif mask.all():
+            rows = None
+        else:
+            rows = np.flatnonzero(mask)
+
+        if rows is None:
+            scores = np.asarray(matrix) @ query
+            rows = np.arange(len(scores))
+        else:
+            if rows.size == 0:
+                return []
+            scores = np.asarray(matrix[rows]) @ query
+        if scores.size == 0:
+            return []
+
+        k = min(limit, scores.size)
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [
+            models.ScoredPoint(id=int(self._ids[rows[i]]), version=0, score=float(scores[i]),
+                               payload=self._payloads[rows[i]])
+            for i in top
+        ]
+
+    def search(self, query_vector: List[float], limit: int = 12, filter_criteria: Optional[Dict] = None,
+               using: Optional[str] = None, exact: bool = False, exclude_ids: Optional[List[int]] = None, **_):
+        """ef / oversampling / rescore là tham số của Qdrant, ở đây bỏ qua; exact=True bỏ qua IVF"""
+        with self._lock:
+            self._consolidate()
+            name = self._resolve_name(using)
+            query = np.asarray(query_vector, dtype=np.float32)
+            query = query / (np.linalg.norm(query) or 1.0)
+            exclude_rows = [self._row[int(p_id)] for p_id in exclude_ids or [] if int(p_id) in self._row]
+            return self._top_k(name, query, limit, filter_criteria, exact=exact, exclude_rows=exclude_rows)
+
+    def recommend_by_id(self, point_id: int, limit: int = 12, filter_criteria: Optional[Dict] = None,
+                        using: Optional[str] = None):
+        with self._lock:
+            self._consolidate()
+            name = self._resolve_name(using)
+            row = self._row.get(int(point_id))
+            if row is None or not self._present[name][row]:
+                return None
+            query = np.asarray(self._vectors[name][row], dtype=np.float32)
+            return self._top_k(name, query, limit, filter_criteria, exclude_rows=[row])
+
+    def retrieve_vectors(self, point_ids: List[int], using: Optional[str] = None) -> Dict[int, np.ndarray]:
+        with self._lock:
+            self._consolidate()
+            name = self._resolve_name(using)
+            vectors = {}
+            for p_id in point_ids:
+                row = self._row.get(int(p_id))
+                if row is not None and self._present[name][row]:
+                    vectors[int(p_id)] = np.array(self._vectors[name][row], dtype=np.float32)
+            return vectors
+
+    def fetch_vectors(self, using: Optional[str] = None):
+        with self._lock:
+            self._consolidate()
+            name = self._resolve_name(using)
+            present = self._present[name]
+            return self._ids[present].copy(), np.asarray(self._vectors[name])[present]
+
+    def count(self) -> int:
+        with self._lock:
+            self._consolidate()
+            return len(self._ids)
+
+
+# 1 instance cho mỗi collection: layout "named" có text_db / image_db cùng trỏ vào 1 collection
+_local_indexes: Dict[tuple, NumpyVectorIndex] = {}
+
+
+def get_local_index(collection_name: str, vector_size: int, index_dir: str = LOCAL_INDEX_DIR, **kwargs):
+    key = (os.path.abspath(index_dir), collection_name)
+    if key not in _local_indexes:
+        _local_indexes[key] = NumpyVectorIndex(collection_name, vector_size, index_dir=index_dir, **kwargs)
+    return _local_indexes[key]
+
+
+class AsyncNumpyVectorIndex:
+    """Bọc NumpyVectorIndex theo interface của AsyncQdrantHandler, phép tính chạy trên thread pool"""
+
+    def __init__(self, index: NumpyVectorIndex, vector_name: Optional[str] = None):
+        self.index = index
+        self.collection_name = index.collection_name
+        self.vector_name = vector_name
+
+    async def ensure_collection(self):
+        pass
+
+    async def upsert_points(self, points: List[models.PointStruct]):
+        await asyncio.to_thread(self.index.upsert_points, points)
+
+    async def delete_points(self, point_ids: List[int]):
+        await asyncio.to_thread(self.index.delete_points, point_ids)
+
+    async def search(self, query_vector: List[float], limit: int = 12, filter_criteria: Optional[Dict] = None,
+                     using: Optional[str] = None, **search_kwargs):
+        return await asyncio.to_thread(
+            self.index.search, query_vector, limit, filter_criteria, using or self.vector_name, **search_kwargs
+        )
+
+    async def recommend_by_id(self, point_id: int, limit: int = 12, filter_criteria: Optional[Dict] = None,
+                              using: Optional[str] = None):
+        return await asyncio.to_thread(
+            self.index.recommend_by_id, point_id, limit, filter_criteria, using or self.vector_name
+        )
+
+    async def retrieve_vectors(self, point_ids: List[int], using: Optional[str] = None):
+        return await asyncio.to_thread(self.index.retrieve_vectors, point_ids, using or self.vector_name)
@@ -0,0 +1,324 @@
+import json
+import os
+import shutil
+import time
+from typing import Dict, Iterable, List, Optional
+import numpy as np
+from vectordb.fusion import RRF_K
+from vectordb.qdrant_client_handler import create_handler, QDRANT_LAYOUT, PRODUCTS_COLLECTION, PRODUCT_VECTORS
+
+DEFAULT_NEIGHBORS_DIR = os.path.join("data", "neighbors")
+# /preference lấy 12, /preference/hybrid lấy top_k * 2 ứng viên mỗi danh sách -> lưu sẵn 24
+DEFAULT_NEIGHBOR_K = 24
+VECTOR_KINDS = ("image", "text")
+# Số phần tử float32 tối đa của 1 block điểm (block query x toàn bộ catalogue), ~256MB
+BLOCK_BUDGET = 1 << 26
+
+
+def vector_sources(layout: str = QDRANT_LAYOUT) -> Dict:
+    """kind -> (handler, named vector) theo layout lưu trữ hiện tại"""
+    if layout == "named":
+        db = create_handler(collection_name=PRODUCTS_COLLECTION, vector_size=512, vector_names=PRODUCT_VECTORS)
+        return {"image": (db, "image"), "text": (db, "text")}
+    return {
+        "image": (create_handler(collection_name="products_image", vector_size=512), None),
+        "text": (create_handler(collection_name="products_text", vector_size=512), None),
+    }
+
+
+def _fetch(sources: Dict) -> Dict:
+    vectors = {}
+    for kind in VECTOR_KINDS:
+        db, using = sources[kind]
+        ids, matrix = db.fetch_vectors(using=using)
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        vectors[kind] = (ids, (matrix / norms).astype(np.float32))
+        print(f"[INFO] Loaded {len(ids)} {kind} vectors")
+    return vectors
+
+
+def _positions(values: np.ndarray, reference: np.ndarray) -> np.ndarray:
+    """Vị trí của từng value trong reference, -1 nếu không có"""
+    if len(reference) == 0:
+        return np.full(len(values), -1, dtype=np.int64)
+    sorter = np.argsort(reference)
+    idx = np.clip(np.searchsorted(reference, values, sorter=sorter), 0, len(reference) - 1)
+    pos = sorter[idx]
+    return np.where(reference[pos] == values, pos, -1)
+
+
+def blocked_top_k(queries: np.ndarray, query_ids: np.ndarray, matrix: np.ndarray, ids: np.ndarray, k: int,
+                  block_size: Optional[int] = None):
+    """
+    Top-k cosine của từng query trên matrix (đã L2-normalize), tính theo block query để giới hạn RAM.
+    Bỏ chính nó (query_id == id). Trả về (ids int64, scores float32) shape (n, k), thiếu thì -1 / -inf.
+    """
+    n = len(queries)
+    out_ids = np.full((n, k), -1, dtype=np.int64)
+    out_scores = np.full((n, k), -np.inf, dtype=np.float32)
+    if n == 0 or len(ids) == 0:
+        return out_ids, out_scores
+
+    block_size = block_size or max(1, min(4096, BLOCK_BUDGET // len(ids)))
+    kk = min(k, len(ids))
+    self_pos = _positions(query_ids, ids)
+    for start in range(0, n, block_size):
+        end = min(start + block_size, n)
+        scores = queries[start:end] @ matrix.T
+        rows = np.flatnonzero(self_pos[start:end] >= 0)
+        scores[rows, self_pos[start:end][rows]] = -np.inf
+
+        top = np.argpartition(-scores, kk - 1, axis=1)[:, :kk]
+        top_scores = np.take_along_axis(scores, top, axis=1)
+        order = np.argsort(-top_scores, axis=1)
+        top = np.take_along_axis(top, order, axis=1)
+        top_scores = np.take_along_axis(top_scores, order, axis=1)
+
+        valid = np.isfinite(top_scores)
+        out_ids[start:end, :kk] = np.where(valid, ids[top], -1)
+        out_scores[start:end, :kk] = np.where(valid, top_scores, -np.inf)
+    return out_ids, out_scores
+
+
+def _rescore(queries: np.ndarray, neighbor_ids: np.ndarray, matrix: np.ndarray, ids: np.ndarray,
+             block_size: int = 1024) -> np.ndarray:
+    """Tính lại chính xác (float32) điểm của các neighbor đang có; điểm lưu trong bảng chỉ là float16"""
+    scores = np.full(neighbor_ids.shape, -np.inf, dtype=np.float32)
+    pos = _positions(neighbor_ids.ravel(), ids).reshape(neighbor_ids.shape)
+    for start in range(0, len(queries), block_size):
+        block_pos = pos[start:start + block_size]
+        block = np.einsum("nd,nkd->nk", queries[start:start + block_size], matrix[np.maximum(block_pos, 0)])
+        scores[start:start + block_size] = np.where(block_pos >= 0, block, -np.inf)
+    return scores
+
+
+def _merge_top_k(ids_a, scores_a, ids_b, scores_b, k: int):
+    ids = np.concatenate([ids_a, ids_b], axis=1)
+    scores = np.concatenate([scores_a, scores_b], axis=1)
+    order = np.argsort(-scores, axis=1, kind="stable")[:, :k]
+    return np.take_along_axis(ids, order, axis=1), np.take_along_axis(scores, order, axis=1)
+
+
+def fuse_neighbor_lists(image_ids: np.ndarray, text_ids: np.ndarray, k: int, rrf_k: int = RRF_K):
+    """
+    RRF cho từng hàng (giống fusion.reciprocal_rank_fusion với trọng số 1), vector hoá trên cả bảng.
+    Mỗi id xuất hiện tối đa 1 lần trong mỗi danh sách nên sau khi sort chỉ cần gộp các cặp liền kề.
+    """
+    ids = np.concatenate([image_ids, text_ids], axis=1)
+    ranks = np.concatenate([np.arange(1, image_ids.shape[1] + 1), np.arange(1, text_ids.shape[1] + 1)])
+    contrib = np.where(ids >= 0, 1.0 / (rrf_k + ranks), 0.0)
+    # Vị trí xuất hiện đầu tiên: hoà điểm thì xếp như fusion.py (thứ tự gặp trong danh sách ảnh rồi text)
+    first_seen = np.broadcast_to(np.arange(ids.shape[1]), ids.shape)
+
+    order = np.argsort(ids, axis=1, kind="stable")
+    ids = np.take_along_axis(ids, order, axis=1)
+    contrib = np.take_along_axis(contrib, order, axis=1)
+    first_seen = np.take_along_axis(first_seen, order, axis=1)
+    dup = (ids[:, 1:] == ids[:, :-1]) & (ids[:, 1:] >= 0)
+    contrib[:, :-1] += np.where(dup, contrib[:, 1:], 0)
+    contrib[:, 1:][dup] = 0
+    ids[:, 1:][dup] = -1
+
+    scores = np.where(ids >= 0, contrib, -np.inf)
+    top = np.lexsort((first_seen, -scores), axis=1)[:, :k]
+    return np.take_along_axis(ids, top, axis=1), np.take_along_axis(scores, top, axis=1)
+
+
+def _kind_table(skus, ids, matrix, k, block_size, old=None, changed=None, stale=None):
+    """
+    Bảng neighbor (theo thứ tự skus) cho 1 loại vector.
+    old = (old_skus, old_ids, old_scores): chỉ tính lại các hàng bị ảnh hưởng bởi `changed` / `stale`.
+    """
+    n = len(skus)
+    out_ids = np.full((n, k), -1, dtype=np.int64)
+    out_scores = np.full((n, k), -np.inf, dtype=np.float32)
+    store_pos = _positions(skus, ids)
+    has_vector = store_pos >= 0
+
+    if old is None:
+        full_rows = has_vector
+    else:
+        old_skus, old_ids, old_scores = old
+        old_pos = _positions(skus, old_skus)
+        # SKU mới hoặc vừa đổi vector: tính lại cả hàng
+        full_rows = has_vector & ((old_pos < 0) | np.isin(skus, changed))
+        keep = np.flatnonzero(has_vector & ~full_rows)
+        if keep.size:
+            prev_ids = np.asarray(old_ids[old_pos[keep]], dtype=np.int64)
+            queries = matrix[store_pos[keep]]
+            # Bỏ neighbor đã đổi / bị xoá, sau đó so với vector mới của các SKU thay đổi
+            dropped = np.isin(prev_ids, stale) & (prev_ids >= 0)
+            floor = np.asarray(old_scores[old_pos[keep]], dtype=np.float32)
+            # + 1 bước làm tròn float16 để ngưỡng luôn >= điểm thật
+            floor = np.where(prev_ids >= 0, floor, np.inf).min(axis=1) + 2 ** -10
+            prev_ids[dropped] = -1
+            prev_scores = _rescore(queries, prev_ids, matrix, ids)
+            order = np.argsort(-prev_scores, axis=1, kind="stable")
+            prev_ids = np.take_along_axis(prev_ids, order, axis=1)
+            prev_scores = np.take_along_axis(prev_scores, order, axis=1)
+
+            cand_pos = _positions(np.asarray(changed, dtype=np.int64), ids)
+            cand_pos = cand_pos[cand_pos >= 0]
+            if cand_pos.size:
+                cand_ids, cand_scores = blocked_top_k(
+                    queries, skus[keep], matrix[cand_pos], ids[cand_pos], k, block_size
+                )
+                prev_ids, prev_scores = _merge_top_k(prev_ids, prev_scores, cand_ids, cand_scores, k)
+
+            # Hàng mất neighbor mà phần bù có điểm thấp hơn danh sách cũ: có thể còn SKU cũ ngoài top-k
+            # đáng lẽ phải lên hạng -> không chắc chắn, tính lại cả hàng
+            uncertain = dropped.any(axis=1) & (prev_scores[:, -1] < floor)
+            out_ids[keep[~uncertain]] = prev_ids[~uncertain]
+            out_scores[keep[~uncertain]] = prev_scores[~uncertain]
+            full_rows = full_rows.copy()
+            full_rows[keep[uncertain]] = True
+
+    rows = np.flatnonzero(full_rows)
+    if rows.size:
+        out_ids[rows], out_scores[rows] = blocked_top_k(matrix[store_pos[rows]], skus[rows], matrix, ids, k, block_size)
+    return out_ids, out_scores, int(rows.size)
+
+
+def _finish(skus, tables, path, k, started):
+    tables["fused"] = fuse_neighbor_lists(tables["image"][0], tables["text"][0], k)
+    save_neighbor_table(path, skus, tables, k)
+    print(f"[SUCCESS] Neighbor table: {len(skus)} SKUs x {k} neighbors in {time.perf_counter() - started:.2f}s")
+
+
+def build_neighbor_table(sources: Optional[Dict] = None, path: str = DEFAULT_NEIGHBORS_DIR,
+                         k: int = DEFAULT_NEIGHBOR_K, block_size: Optional[int] = None):
+    """Tính top-k neighbor ảnh / text / fused cho toàn bộ SKU"""
+    started = time.perf_counter()
+    vectors = _fetch(sources or vector_sources())
+    skus = np.union1d(vectors["image"][0], vectors["text"][0])
+    tables = {}
+    for kind in VECTOR_KINDS:
+        ids, matrix = vectors[kind]
+        out_ids, out_scores, _ = _kind_table(skus, ids, matrix, k, block_size)
+        tables[kind] = (out_ids, out_scores)
+    _finish(skus, tables, path, k, started)
+
+
+def refresh_neighbor_table(changed_ids: Iterable[int], removed_ids: Iterable[int], sources: Optional[Dict] = None,
+                           path: str = DEFAULT_NEIGHBORS_DIR, block_size: Optional[int] = None):
+    """
+    Cập nhật bảng sau incremental ingest: hàng của SKU đổi / mới được tính lại, các hàng khác chỉ so thêm
+    với vector của SKU đổi (n x |changed|) và bỏ neighbor đã bị xoá. Chưa có bảng thì build toàn bộ.
+    """
+    old = load_neighbor_arrays(path)
+    if old is None:
+        print("[INFO] No neighbor table yet, building from scratch...")
+        return build_neighbor_table(sources, path, block_size=block_size)
+
+    started = time.perf_counter()
+    changed = np.unique(np.asarray(list(changed_ids), dtype=np.int64))
+    stale = np.union1d(changed, np.asarray(list(removed_ids), dtype=np.int64))
+    k = old["k"]
+    vectors = _fetch(sources or vector_sources())
+    skus = np.union1d(vectors["image"][0], vectors["text"][0])
+    tables = {}
+    for kind in VECTOR_KINDS:
+        ids, matrix = vectors[kind]
+        out_ids, out_scores, recomputed = _kind_table(
+            skus, ids, matrix, k, block_size,
+            old=(old["skus"], old[f"{kind}_ids"], old[f"{kind}_scores"]), changed=changed, stale=stale
+        )
+        tables[kind] = (out_ids, out_scores)
+        print(f"[INFO] {kind}: recomputed {recomputed}/{len(skus)} rows")
+    _finish(skus, tables, path, k, started)
+
+
+# --- Lưu trữ ---
+# Mỗi lần build ghi ra 1 thư mục version mới rồi mới đổi file "current" (đọc / ghi không bao giờ lẫn version)
+def _current_dir(path: str) -> Optional[str]:
+    try:
+        with open(os.path.join(path, "current"), "r", encoding="utf-8") as f:
+            return os.path.join(path, f.read().strip())
+    except FileNotFoundError:
+        return None
+
+
+def save_neighbor_table(path: str, skus: np.ndarray, tables: Dict, k: int):
+    # SKU vừa int32 thì lưu int32 (1/2 dung lượng), không thì int64
+    id_dtype = np.int32 if len(skus) == 0 or skus.max() < np.iinfo(np.int32).max else np.int64
+    version = str(time.time_ns())
+    version_dir = os.path.join(path, version)
+    os.makedirs(version_dir)
+    np.save(os.path.join(version_dir, "skus.npy"), skus.astype(np.int64))
+    for kind, (ids, scores) in tables.items():
+        np.save(os.path.join(version_dir, f"{kind}_ids.npy"), ids.astype(id_dtype))
+        np.save(os.path.join(version_dir, f"{kind}_scores.npy"), scores.astype(np.float16))
+    with open(os.path.join(version_dir, "meta.json"), "w", encoding="utf-8") as f:
+        json.dump({"k": k, "count": int(len(skus)), "kinds": list(tables)}, f)
+
+    tmp_path = os.path.join(path, "current.tmp")
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(version)
+    os.replace(tmp_path, os.path.join(path, "current"))
+
+    # Dọn version cũ (process đang mmap file cũ vẫn đọc được cho tới khi đóng)
+    for name in os.listdir(path):
+        old_dir = os.path.join(path, name)
+        if name != version and os.path.isdir(old_dir):
+            shutil.rmtree(old_dir, ignore_errors=True)
+
+
+def load_neighbor_arrays(path: str = DEFAULT_NEIGHBORS_DIR, mmap_mode: Optional[str] = None) -> Optional[Dict]:
+    version_dir = _current_dir(path)
+    if version_dir is None or not os.path.exists(os.path.join(version_dir, "meta.json")):
+        return None
+    with open(os.path.join(version_dir, "meta.json"), "r", encoding="utf-8") as f:
+        meta = json.load(f)
+    arrays = {"k": meta["k"], "version": os.path.basename(version_dir),
+              "skus": np.load(os.path.join(version_dir, "skus.npy"))}
+    for kind in meta["kinds"]:
+        arrays[f"{kind}_ids"] = np.load(os.path.join(version_dir, f"{kind}_ids.npy"), mmap_mode=mmap_mode)
+        arrays[f"{kind}_scores"] = np.load(os.path.join(version_dir, f"{kind}_scores.npy"), mmap_mode=mmap_mode)
+    return arrays
+
+
+class NeighborTable:
+    """
+    Bảng neighbor tính sẵn cho API: file .npy được mmap, tra 1 SKU = 1 lookup dict + đọc 1 hàng.
+    Tự load lại khi job build / refresh ghi version mới (kiểm tra tối đa 1 lần / check_interval giây).
+    """
+
+    def __init__(self, path: str = DEFAULT_NEIGHBORS_DIR, check_interval: float = 5.0):
+        self.path = path
+        self.check_interval = check_interval
+        self.k = 0
+        self.version = None
+        self._arrays = {}
+        self._row = {}
+        self._next_check = 0.0
+        self._maybe_reload()
+
+    def _maybe_reload(self):
+        now = time.monotonic()
+        if now < self._next_check:
+            return
+        self._next_check = now + self.check_interval
+        version_dir = _current_dir(self.path)
+        if version_dir is None or os.path.basename(version_dir) == self.version:
+            return
+        arrays = load_neighbor_arrays(self.path, mmap_mode="r")
+        if arrays is None:
+            return
+        self._row = {int(sku): row for row, sku in enumerate(arrays["skus"])}
+        self._arrays = arrays
+        self.k = arrays["k"]
+        self.version = arrays["version"]
+        print(f"[INFO] Loaded neighbor table {self.version}: {len(self._row)} SKUs x {self.k}")
+
+    @property
+    def available(self) -> bool:
+        return self.version is not None
+
+    def neighbors(self, sku: int, kind: str = "image", limit: int = 12) -> Optional[List[int]]:
+        """SKU neighbor đã xếp hạng, None nếu SKU chưa có trong bảng"""
+        self._maybe_reload()
+        row = self._row.get(int(sku))
+        if row is None:
+            return None
+        return [int(i) for i in self._arrays[f"{kind}_ids"][row, :limit] if i >= 0]
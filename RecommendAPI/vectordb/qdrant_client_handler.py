@@ -1,12 +1,267 @@
-from qdrant_client import QdrantClient
+from qdrant_client import QdrantClient, AsyncQdrantClient
 from qdrant_client.http import models
+from qdrant_client.http.exceptions import UnexpectedResponse
 from typing import List, Dict, Any, Optional
+import grpc
+import numpy as np
+import os
+import re
+import time
+from vectordb.backend import VectorBackend
 
-class QdrantHandler:
-    def __init__(self, collection_name: str, vector_size: int):
-        self.client = QdrantClient(url="http://localhost:6333")
+# --- Cấu hình kết nối (đọc từ env, mặc định là Qdrant chạy Docker ở local) ---
+# QDRANT_URL: "http://host:6333" (server), ":memory:" (in-memory, cho test) hoặc 1 đường dẫn thư mục (local on-disk)
+QDRANT_URL = os.getenv("QDRANT_URL", "http://localhost:6333")
+QDRANT_API_KEY = os.getenv("QDRANT_API_KEY") or None
+QDRANT_PREFER_GRPC = os.getenv("QDRANT_PREFER_GRPC", "true").lower() in ("1", "true", "yes")
+QDRANT_GRPC_PORT = int(os.getenv("QDRANT_GRPC_PORT", "6334"))
+QDRANT_POOL_SIZE = int(os.getenv("QDRANT_POOL_SIZE", "8"))
+
+# Bulk upload lúc ingest: số thread upload song song, số point mỗi request, thời gian tối đa chờ index build xong
+QDRANT_UPLOAD_WORKERS = int(os.getenv("QDRANT_UPLOAD_WORKERS", "4"))
+QDRANT_UPLOAD_BATCH_SIZE = int(os.getenv("QDRANT_UPLOAD_BATCH_SIZE", "256"))
+QDRANT_INDEXING_TIMEOUT = float(os.getenv("QDRANT_INDEXING_TIMEOUT", "3600"))
+# m mặc định của Qdrant, dùng khi bật lại HNSW mà không biết m cũ
+DEFAULT_HNSW_M = 16
+
+# Vector store dùng cho ingest / API:
+# - "qdrant": Qdrant server / local theo QDRANT_URL (mặc định)
+# - "numpy": index thuần NumPy trên đĩa (vectordb/local_index.py), không cần Qdrant, cho edge / CI
+VECTOR_BACKEND = os.getenv("VECTOR_BACKEND", "qdrant").lower()
+
+# Layout lưu trữ:
+# - "split": 2 collection products_text / products_image (mặc định, như cũ)
+# - "named": 1 collection "products" với 2 named vector "text" và "image", payload dùng chung
+QDRANT_LAYOUT = os.getenv("QDRANT_LAYOUT", "split").lower()
+PRODUCTS_COLLECTION = "products"
+PRODUCT_VECTORS = ("text", "image")
+
+# Payload index cho các field hay dùng để lọc
+PRODUCT_PAYLOAD_INDEXES = {
+    "product_id": models.PayloadSchemaType.INTEGER,
+    "brand": models.PayloadSchemaType.KEYWORD,
+    "color": models.PayloadSchemaType.KEYWORD,
+    "brand_norm": models.PayloadSchemaType.KEYWORD,
+    "color_norm": models.PayloadSchemaType.KEYWORD,
+    "price": models.PayloadSchemaType.FLOAT,
+    # keyword index trên mảng: MatchAny khớp nếu có ít nhất 1 phần tử trùng
+    "in_stock_size": models.PayloadSchemaType.KEYWORD,
+}
+
+# Lọc theo brand/color không phân biệt hoa thường: so sánh trên bản đã chuẩn hoá lưu trong payload
+NORMALIZED_FIELDS = {"brand": "brand_norm", "color": "color_norm"}
+RANGE_OPERATORS = ("gt", "gte", "lt", "lte")
+
+# Cấu hình lưu trữ / index khi tạo collection (áp dụng cho collection mới, hoặc qua update_collection_config)
+# - quantization: None | "int8" (scalar, ~4x ít RAM) | "binary" (~32x ít RAM, nên dùng kèm rescore + oversampling)
+# - on_disk: vector gốc nằm trên đĩa (mmap), chỉ vector đã quantize giữ trong RAM
+# - hnsw_m / hnsw_ef_construct: độ dày đồ thị HNSW (recall cao hơn <-> tốn RAM / build lâu hơn)
+# - search_ef / oversampling: giá trị mặc định cho tham số per-query của search()
+DEFAULT_COLLECTION_CONFIG = {
+    "quantization": os.getenv("QDRANT_QUANTIZATION") or None,
+    "on_disk": os.getenv("QDRANT_ON_DISK", "false").lower() in ("1", "true", "yes"),
+    "hnsw_m": int(os.getenv("QDRANT_HNSW_M")) if os.getenv("QDRANT_HNSW_M") else None,
+    "hnsw_ef_construct": int(os.getenv("QDRANT_HNSW_EF_CONSTRUCT")) if os.getenv("QDRANT_HNSW_EF_CONSTRUCT") else None,
+    "search_ef": int(os.getenv("QDRANT_SEARCH_EF")) if os.getenv("QDRANT_SEARCH_EF") else None,
+    "oversampling": float(os.getenv("QDRANT_OVERSAMPLING")) if os.getenv("QDRANT_OVERSAMPLING") else None,
+}
+
+# Client dùng chung cho mọi handler / collection có cùng location -> 1 connection pool duy nhất
+_clients: Dict[tuple, Any] = {}
+
+
+def _client_kwargs(location: str, prefer_grpc: bool) -> Dict[str, Any]:
+    if location == ":memory:":
+        return {"location": ":memory:"}
+    if location.startswith(("http://", "https://")):
+        return {
+            "url": location,
+            "api_key": QDRANT_API_KEY,
+            "prefer_grpc": prefer_grpc,
+            "grpc_port": QDRANT_GRPC_PORT,
+            "pool_size": QDRANT_POOL_SIZE,
+        }
+    return {"path": location}
+
+
+def get_client(location: Optional[str] = None, prefer_grpc: Optional[bool] = None) -> QdrantClient:
+    location = location or QDRANT_URL
+    prefer_grpc = QDRANT_PREFER_GRPC if prefer_grpc is None else prefer_grpc
+    key = ("sync", location, prefer_grpc)
+    if key not in _clients:
+        _clients[key] = QdrantClient(**_client_kwargs(location, prefer_grpc))
+    return _clients[key]
+
+
+def get_async_client(location: Optional[str] = None, prefer_grpc: Optional[bool] = None) -> AsyncQdrantClient:
+    location = location or QDRANT_URL
+    prefer_grpc = QDRANT_PREFER_GRPC if prefer_grpc is None else prefer_grpc
+    key = ("async", location, prefer_grpc)
+    if key not in _clients:
+        _clients[key] = AsyncQdrantClient(**_client_kwargs(location, prefer_grpc))
+    return _clients[key]
+
+
+async def close_async_clients():
+    for key in [k for k in _clients if k[0] == "async"]:
+        await _clients.pop(key).close()
+
+
+def close_sync_clients():
+    # Qdrant local (QDRANT_URL là đường dẫn) chỉ cho 1 client mở thư mục: đóng trước khi client khác mở
+    for key in [k for k in _clients if k[0] == "sync"]:
+        _clients.pop(key).close()
+
+
+def normalize_keyword(value) -> str:
+    """'  Miss  Selfridge ' -> 'miss selfridge'"""
+    return " ".join(str(value).split()).lower()
+
+
+def _field_condition(key: str, value):
+    """
+    Chuyển 1 điều kiện lọc sang FieldCondition:
+    - dict {"gte": 10, "lte": 50}  -> Range
+    - list / tuple / set           -> MatchAny (khớp 1 trong các giá trị)
+    - giá trị đơn                  -> MatchValue
+    brand / color được so sánh trên field đã chuẩn hoá (không phân biệt hoa thường, khoảng trắng).
+    """
+    if isinstance(value, dict):
+        bounds = {op: value[op] for op in RANGE_OPERATORS if value.get(op) is not None}
+        if not bounds:
+            return None
+        return models.FieldCondition(key=key, range=models.Range(**bounds))
+
+    values = list(value) if isinstance(value, (list, tuple, set)) else [value]
+    values = [v for v in values if v is not None and str(v).strip() != ""]
+    if not values:
+        return None
+    if key in NORMALIZED_FIELDS:
+        key = NORMALIZED_FIELDS[key]
+        values = [normalize_keyword(v) for v in values]
+
+    if isinstance(value, (list, tuple, set)):
+        return models.FieldCondition(key=key, match=models.MatchAny(any=values))
+    return models.FieldCondition(key=key, match=models.MatchValue(value=values[0]))
+
+
+def build_filter(filter_criteria: Optional[Dict] = None, exclude_ids: Optional[List[int]] = None):
+    """exclude_ids: bỏ các point này khỏi kết quả (vd. sản phẩm user đã xem)"""
+    must_conditions = []
+    for key, value in (filter_criteria or {}).items():
+        condition = _field_condition(key, value)
+        if condition is not None:
+            must_conditions.append(condition)
+    must_not = [models.HasIdCondition(has_id=list(exclude_ids))] if exclude_ids else None
+    if not must_conditions and not must_not:
+        return None
+    return models.Filter(must=must_conditions or None, must_not=must_not)
+
+
+def _merge_config(collection_config: Optional[Dict]) -> Dict:
+    config = dict(DEFAULT_COLLECTION_CONFIG)
+    config.update({k: v for k, v in (collection_config or {}).items() if v is not None})
+    return config
+
+
+def _vectors_config(vector_size: int, vector_names: Optional[List[str]] = None, on_disk: bool = False):
+    params = models.VectorParams(size=vector_size, distance=models.Distance.COSINE, on_disk=on_disk or None)
+    if vector_names:
+        return {name: params for name in vector_names}
+    return params
+
+
+def _quantization_config(quantization: Optional[str]):
+    if not quantization:
+        return None
+    if quantization == "int8":
+        return models.ScalarQuantization(
+            scalar=models.ScalarQuantizationConfig(type=models.ScalarType.INT8, quantile=0.99, always_ram=True)
+        )
+    if quantization == "binary":
+        return models.BinaryQuantization(binary=models.BinaryQuantizationConfig(always_ram=True))
+    raise ValueError(f"Unknown quantization '{quantization}', expected 'int8' or 'binary'")
+
+
+def _hnsw_config(config: Dict):
+    if config.get("hnsw_m") is None and config.get("hnsw_ef_construct") is None:
+        return None
+    return models.HnswConfigDiff(m=config.get("hnsw_m"), ef_construct=config.get("hnsw_ef_construct"))
+
+
+def _create_collection_kwargs(collection_name: str, vector_size: int, vector_names, config: Dict) -> Dict:
+    return {
+        "collection_name": collection_name,
+        "vectors_config": _vectors_config(vector_size, vector_names, config.get("on_disk", False)),
+        "hnsw_config": _hnsw_config(config),
+        "quantization_config": _quantization_config(config.get("quantization")),
+    }
+
+
+def _search_params(config: Dict, ef: Optional[int] = None, oversampling: Optional[float] = None,
+                   rescore: Optional[bool] = None, exact: bool = False):
+    """
+    Tham số per-query: ef (hnsw_ef, càng lớn recall càng cao nhưng chậm hơn), oversampling + rescore
+    (lấy dư ứng viên bằng vector quantize rồi chấm lại bằng vector gốc), exact (brute-force, dùng để đo recall).
+    """
+    ef = ef if ef is not None else config.get("search_ef")
+    oversampling = oversampling if oversampling is not None else config.get("oversampling")
+    quantization = None
+    if config.get("quantization") and (oversampling is not None or rescore is not None):
+        quantization = models.QuantizationSearchParams(
+            rescore=True if rescore is None else rescore, oversampling=oversampling
+        )
+    if ef is None and quantization is None and not exact:
+        return None
+    return models.SearchParams(hnsw_ef=ef, exact=exact, quantization=quantization)
+
+
+def _vectors_by_id(points, using: Optional[str]) -> Dict[int, np.ndarray]:
+    vectors = {}
+    for p in points:
+        vector = p.vector.get(using) if isinstance(p.vector, dict) else p.vector
+        if vector is not None:
+            vectors[p.id] = np.asarray(vector, dtype=np.float32)
+    return vectors
+
+
+def _missing_payload_indexes(collection_info, payload_indexes: Optional[Dict]) -> Dict:
+    existing = collection_info.payload_schema or {}
+    return {field: schema for field, schema in (payload_indexes or {}).items() if field not in existing}
+
+
+# Chỉ lỗi 'point không tồn tại'; sai tên vector / thiếu collection / sai cấu hình vẫn phải raise
+_POINT_NOT_FOUND = re.compile(r"\bpoint\b.*\b(not found|does not exist)\b|\bno point with id\b", re.IGNORECASE)
+
+
+def _is_not_found(e: Exception) -> bool:
+    """Lỗi 'point không tồn tại' khác nhau theo transport: local (ValueError), REST (404), gRPC (NOT_FOUND)"""
+    if isinstance(e, ValueError):
+        return bool(_POINT_NOT_FOUND.search(str(e)))
+    if isinstance(e, UnexpectedResponse):
+        content = e.content.decode("utf-8", "replace") if isinstance(e.content, bytes) else str(e.content)
+        return e.status_code == 404 and bool(_POINT_NOT_FOUND.search(content))
+    if isinstance(e, grpc.RpcError):
+        return e.code() == grpc.StatusCode.NOT_FOUND and bool(_POINT_NOT_FOUND.search(e.details() or ""))
+    return False
+
+
+class QdrantHandler(VectorBackend):
+    """
+    vector_names: tạo collection dạng named vectors (vd. PRODUCT_VECTORS), None = 1 vector không tên.
+    vector_name: named vector mặc định dùng khi search / recommend (tham số `using`).
+    """
+    def __init__(self, collection_name: str, vector_size: int, location: Optional[str] = None,
+                 prefer_grpc: Optional[bool] = None, vector_names: Optional[List[str]] = None,
+                 vector_name: Optional[str] = None, payload_indexes: Optional[Dict] = None,
+                 collection_config: Optional[Dict] = None):
+        self.client = get_client(location, prefer_grpc)
         self.collection_name = collection_name
         self.vector_size = vector_size
+        self.vector_names = list(vector_names) if vector_names else None
+        self.vector_name = vector_name
+        self.payload_indexes = payload_indexes
+        self.config = _merge_config(collection_config)
         self._create_collection_if_not_exists()
 
     def _create_collection_if_not_exists(self):
@@ -16,11 +271,32 @@ class QdrantHandler:
         if not exists:
             print(f"[INFO] Creating collection: {self.collection_name} (size: {self.vector_size})")
             self.client.create_collection(
-                collection_name=self.collection_name,
-                vectors_config=models.VectorParams(
-                    size=self.vector_size,
-                    distance=models.Distance.COSINE
-                )
+                **_create_collection_kwargs(self.collection_name, self.vector_size, self.vector_names, self.config)
+            )
+        self._create_payload_indexes()
+
+    def update_collection_config(self):
+        """Áp dụng quantization / on_disk / HNSW của self.config lên collection đã tồn tại (Qdrant rebuild ở nền)"""
+        on_disk = self.config.get("on_disk", False)
+        if self.vector_names:
+            vectors_config = {name: models.VectorParamsDiff(on_disk=on_disk) for name in self.vector_names}
+        else:
+            vectors_config = {"": models.VectorParamsDiff(on_disk=on_disk)}
+        self.client.update_collection(
+            collection_name=self.collection_name,
+            vectors_config=vectors_config,
+            hnsw_config=_hnsw_config(self.config),
+            quantization_config=_quantization_config(self.config.get("quantization")) or models.Disabled.DISABLED
+        )
+
+    def _create_payload_indexes(self):
+        if not self.payload_indexes:
+            return
+        info = self.client.get_collection(self.collection_name)
+        for field, schema in _missing_payload_indexes(info, self.payload_indexes).items():
+            print(f"[INFO] Creating payload index: {self.collection_name}.{field} ({schema})")
+            self.client.create_payload_index(
+                collection_name=self.collection_name, field_name=field, field_schema=schema
             )
 
     def upsert_points(self, points: List[models.PointStruct]):
@@ -29,28 +305,126 @@ class QdrantHandler:
             points=points
         )
 
-    def search(self, query_vector: List[float], limit: int = 12, filter_criteria: Optional[Dict] = None):
+    def upload_points(self, points: List[models.PointStruct]):
+        """Upsert với wait=False: Qdrant nhận vào WAL là trả về, không chờ ghi / index xong. Lỗi mạng thì tự retry"""
+        self.client.upload_points(
+            collection_name=self.collection_name,
+            points=points,
+            batch_size=QDRANT_UPLOAD_BATCH_SIZE,
+            wait=False
+        )
+
+    def begin_bulk_load(self):
+        """
+        Full rebuild: tắt build HNSW (m=0) để Qdrant chỉ ghi point, không phải cập nhật graph sau mỗi batch.
+        Graph được build 1 lần ở end_bulk_load().
+        """
+        m = self.client.get_collection(self.collection_name).config.hnsw_config.m
+        # m=0 nghĩa là lần rebuild trước chết giữa chừng -> bật lại theo config
+        self._hnsw_m = m or self.config.get("hnsw_m") or DEFAULT_HNSW_M
+        print(f"[INFO] Disabling HNSW indexing on {self.collection_name} during bulk load")
+        self.client.update_collection(
+            collection_name=self.collection_name, hnsw_config=models.HnswConfigDiff(m=0)
+        )
+
+    def end_bulk_load(self, wait: bool = True, timeout: float = QDRANT_INDEXING_TIMEOUT):
+        """Bật lại HNSW; wait=True thì chờ đến khi các upload wait=False đã được ghi và index build xong (green)"""
+        if wait:
+            self.flush()
+        m = getattr(self, "_hnsw_m", None) or self.config.get("hnsw_m") or DEFAULT_HNSW_M
+        print(f"[INFO] Rebuilding HNSW index on {self.collection_name} (m={m})...")
+        self.client.update_collection(
+            collection_name=self.collection_name, hnsw_config=models.HnswConfigDiff(m=m)
+        )
+        if not wait:
+            return
+        deadline = time.monotonic() + timeout
+        while self.client.get_collection(self.collection_name).status != models.CollectionStatus.GREEN:
+            if time.monotonic() > deadline:
+                print(f"[WARN] {self.collection_name} is still indexing after {timeout}s, continuing in background")
+                return
+            time.sleep(1.0)
+
+    def flush(self):
+        """
+        Các upload wait=False được Qdrant áp dụng theo thứ tự: 1 thao tác rỗng với wait=True chỉ trả về khi
+        mọi upload trước nó đã được ghi xong.
+        """
+        self.client.delete(
+            collection_name=self.collection_name,
+            points_selector=models.PointIdsList(points=[]),
+            wait=True
+        )
+
+    def delete_points(self, point_ids: List[int]):
+        self.client.delete(
+            collection_name=self.collection_name,
+            points_selector=models.PointIdsList(points=point_ids)
+        )
+
+    def delete_vectors(self, point_ids: List[int], vector_names: List[str]):
+        """Xoá riêng 1 số named vector của point (vd. ảnh bị xoá nhưng sản phẩm vẫn còn)"""
+        self.client.delete_vectors(
+            collection_name=self.collection_name,
+            vectors=vector_names,
+            points=models.PointIdsList(points=point_ids)
+        )
+
+    def retrieve_vectors(self, point_ids: List[int], using: Optional[str] = None) -> Dict[int, np.ndarray]:
+        """Vector đã lưu của 1 nhóm point -> {id: vector}, point không có vector thì bỏ qua"""
+        using = using or self.vector_name
+        points = self.client.retrieve(
+            collection_name=self.collection_name, ids=list(point_ids),
+            with_payload=False, with_vectors=[using] if using else True
+        )
+        return _vectors_by_id(points, using)
+
+    def fetch_vectors(self, using: Optional[str] = None, batch_size: int = 1024):
+        """Đọc toàn bộ vector của collection (scroll theo trang) -> (ids int64, ma trận float32)"""
+        using = using or self.vector_name
+        ids, vectors = [], []
+        offset = None
+        while True:
+            points, offset = self.client.scroll(
+                collection_name=self.collection_name, limit=batch_size, offset=offset,
+                with_payload=False, with_vectors=[using] if using else True
+            )
+            for p in points:
+                vector = p.vector.get(using) if isinstance(p.vector, dict) else p.vector
+                # Layout "named": sản phẩm không có ảnh thì không có vector "image"
+                if vector is not None:
+                    ids.append(p.id)
+                    vectors.append(vector)
+            if offset is None:
+                break
+        return np.asarray(ids, dtype=np.int64), np.asarray(vectors, dtype=np.float32).reshape(-1, self.vector_size)
+
+    def search(self, query_vector: List[float], limit: int = 12, filter_criteria: Optional[Dict] = None,
+               using: Optional[str] = None, ef: Optional[int] = None, oversampling: Optional[float] = None,
+               rescore: Optional[bool] = None, exact: bool = False, exclude_ids: Optional[List[int]] = None):
         # 1. Tạo bộ lọc (Filter)
-        query_filter = None
-        if filter_criteria:
-            must_conditions = []
-            for key, value in filter_criteria.items():
-                if value and str(value).strip() != "":
-                    must_conditions.append(
-                        models.FieldCondition(
-                            key=key,
-                            match=models.MatchValue(value=value)
-                        )
-                    )
-            if must_conditions:
-                query_filter = models.Filter(must=must_conditions)
+        query_filter = build_filter(filter_criteria, exclude_ids)
+        using = using or self.vector_name
+        search_params = _search_params(self.config, ef, oversampling, rescore, exact)
 
         # 2. Thực hiện Search (Fallback version cho tương thích)
+        if using:
+            # Collection named vectors: chỉ query_points hỗ trợ chọn vector bằng `using`
+            response = self.client.query_points(
+                collection_name=self.collection_name,
+                query=query_vector,
+                using=using,
+                query_filter=query_filter,
+                search_params=search_params,
+                limit=limit
+            )
+            return response.points
         try:
             return self.client.search(
                 collection_name=self.collection_name,
                 query_vector=query_vector,
                 query_filter=query_filter,
+                search_params=search_params,
                 limit=limit
             )
         except (AttributeError, TypeError):
@@ -58,10 +432,160 @@ class QdrantHandler:
                 collection_name=self.collection_name,
                 query=query_vector,
                 query_filter=query_filter,
+                search_params=search_params,
                 limit=limit
             )
             return response.points
 
+    def evaluate_recall(self, query_vectors: List[List[float]], limit: int = 12, **search_kwargs) -> Dict:
+        """
+        Đo trade-off recall/latency của cấu hình hiện tại: so kết quả ANN (với search_kwargs, vd. ef, oversampling)
+        với kết quả exact (brute-force) trên cùng query.
+        """
+        recalls, ann_times, exact_times = [], [], []
+        for query_vector in query_vectors:
+            start = time.perf_counter()
+            exact_ids = {hit.id for hit in self.search(query_vector, limit=limit, exact=True)}
+            exact_times.append(time.perf_counter() - start)
+
+            start = time.perf_counter()
+            ann_ids = {hit.id for hit in self.search(query_vector, limit=limit, **search_kwargs)}
+            ann_times.append(time.perf_counter() - start)
+
+            if exact_ids:
+                recalls.append(len(exact_ids & ann_ids) / len(exact_ids))
+        n = max(len(query_vectors), 1)
+        return {
+            "queries": len(query_vectors),
+            f"recall@{limit}": round(sum(recalls) / max(len(recalls), 1), 4),
+            "ann_ms": round(1000 * sum(ann_times) / n, 3),
+            "exact_ms": round(1000 * sum(exact_times) / n, 3),
+        }
+
+    def recommend_by_id(self, point_id: int, limit: int = 12, filter_criteria: Optional[Dict] = None,
+                        using: Optional[str] = None):
+        """
+        Tìm các điểm gần nhất với vector ĐÃ LƯU của point_id (không cần encode lại).
+        Qdrant tự lấy vector ở phía server và loại chính point_id khỏi kết quả.
+        Trả về None nếu point_id chưa có trong collection.
+        """
+        try:
+            response = self.client.query_points(
+                collection_name=self.collection_name,
+                query=point_id,
+                using=using or self.vector_name,
+                query_filter=build_filter(filter_criteria),
+                search_params=_search_params(self.config),
+                limit=limit
+            )
+        except Exception as e:
+            if _is_not_found(e):
+                return None
+            raise
+        return response.points
+
+
+class AsyncQdrantHandler:
+    """
+    Bản async của QdrantHandler cho API: dùng AsyncQdrantClient (ưu tiên gRPC), client được chia sẻ
+    giữa các handler nên mọi collection đi chung 1 connection pool.
+    Gọi `await ensure_collection()` 1 lần lúc startup thay cho việc tạo collection trong __init__.
+    """
+
+    def __init__(self, collection_name: str, vector_size: int, location: Optional[str] = None,
+                 prefer_grpc: Optional[bool] = None, vector_names: Optional[List[str]] = None,
+                 vector_name: Optional[str] = None, payload_indexes: Optional[Dict] = None,
+                 collection_config: Optional[Dict] = None):
+        self.client = get_async_client(location, prefer_grpc)
+        self.collection_name = collection_name
+        self.vector_size = vector_size
+        self.vector_names = list(vector_names) if vector_names else None
+        self.vector_name = vector_name
+        self.payload_indexes = payload_indexes
+        self.config = _merge_config(collection_config)
+
+    async def ensure_collection(self):
+        if not await self.client.collection_exists(self.collection_name):
+            print(f"[INFO] Creating collection: {self.collection_name} (size: {self.vector_size})")
+            await self.client.create_collection(
+                **_create_collection_kwargs(self.collection_name, self.vector_size, self.vector_names, self.config)
+            )
+        if self.payload_indexes:
+            info = await self.client.get_collection(self.collection_name)
+            for field, schema in _missing_payload_indexes(info, self.payload_indexes).items():
+                print(f"[INFO] Creating payload index: {self.collection_name}.{field} ({schema})")
+                await self.client.create_payload_index(
+                    collection_name=self.collection_name, field_name=field, field_schema=schema
+                )
+
+    async def upsert_points(self, points: List[models.PointStruct]):
+        await self.client.upsert(
+            collection_name=self.collection_name,
+            points=points
+        )
+
+    async def delete_points(self, point_ids: List[int]):
+        await self.client.delete(
+            collection_name=self.collection_name,
+            points_selector=models.PointIdsList(points=point_ids)
+        )
+
+    async def retrieve_vectors(self, point_ids: List[int], using: Optional[str] = None) -> Dict[int, np.ndarray]:
+        using = using or self.vector_name
+        points = await self.client.retrieve(
+            collection_name=self.collection_name, ids=list(point_ids),
+            with_payload=False, with_vectors=[using] if using else True
+        )
+        return _vectors_by_id(points, using)
+
+    async def search(self, query_vector: List[float], limit: int = 12, filter_criteria: Optional[Dict] = None,
+                     using: Optional[str] = None, ef: Optional[int] = None, oversampling: Optional[float] = None,
+                     rescore: Optional[bool] = None, exact: bool = False, exclude_ids: Optional[List[int]] = None):
+        response = await self.client.query_points(
+            collection_name=self.collection_name,
+            query=query_vector,
+            using=using or self.vector_name,
+            query_filter=build_filter(filter_criteria, exclude_ids),
+            search_params=_search_params(self.config, ef, oversampling, rescore, exact),
+            limit=limit
+        )
+        return response.points
+
+    async def recommend_by_id(self, point_id: int, limit: int = 12, filter_criteria: Optional[Dict] = None,
+                              using: Optional[str] = None):
+        """Giống QdrantHandler.recommend_by_id, trả về None nếu point_id chưa có trong collection"""
+        try:
+            response = await self.client.query_points(
+                collection_name=self.collection_name,
+                query=point_id,
+                using=using or self.vector_name,
+                query_filter=build_filter(filter_criteria),
+                search_params=_search_params(self.config),
+                limit=limit
+            )
+        except Exception as e:
+            if _is_not_found(e):
+                return None
+            raise
+        return response.points
+
+
+def create_handler(collection_name: str, vector_size: int, **kwargs) -> VectorBackend:
+    """Tạo handler đồng bộ theo VECTOR_BACKEND, nhận cùng tham số với QdrantHandler"""
+    if VECTOR_BACKEND == "numpy":
+        from vectordb.local_index import get_local_index
+        return get_local_index(collection_name, vector_size, **kwargs)
+    return QdrantHandler(collection_name, vector_size, **kwargs)
+
+
+def create_async_handler(collection_name: str, vector_size: int, **kwargs):
+    """Tạo handler async cho API theo VECTOR_BACKEND, nhận cùng tham số với AsyncQdrantHandler"""
+    if VECTOR_BACKEND == "numpy":
+        from vectordb.local_index import get_local_index, AsyncNumpyVectorIndex
+        return AsyncNumpyVectorIndex(get_local_index(collection_name, vector_size, **kwargs),
+                                     vector_name=kwargs.get("vector_name"))
+    return AsyncQdrantHandler(collection_name, vector_size, **kwargs)
+
 # Bản 2:
 # from qdrant_client import QdrantClient
 # from qdrant_client.http import models